@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import platform
+import subprocess
+import importlib.util
+
+"""
+Helpers shared by the benchmarks.
+
+The two labs have their own 'sub' package, so they cannot be imported in the
+same interpreter: each benchmark runs the cases of one lab in a separate
+worker process (started in the directory of the lab) and collects the results
+as JSON from its standard output.
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LABS = ["lab01", "lab02"]
+
+
+def loadLab(lab):
+    """
+    loadLab
+    ---
+    Import the simulator of a lab in the current (worker) process:
+    'queue_generic-ES.py' for lab01, 'main.py' for lab02.
+    """
+    lab_dir = os.path.join(ROOT, lab)
+    sys.path.insert(0, lab_dir)
+    os.chdir(lab_dir)
+    script = "queue_generic-ES.py" if lab == "lab01" else "main.py"
+    spec = importlib.util.spec_from_file_location(
+        lab + "_sim", os.path.join(lab_dir, script)
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def runWorker(script, lab, options):
+    """
+    runWorker
+    ---
+    Run 'script --worker lab' in a new interpreter, passing the options as JSON,
+    and return the decoded JSON output.
+    """
+    out = subprocess.run(
+        [sys.executable, script, "--worker", lab, json.dumps(options)],
+        stdout=subprocess.PIPE,
+        check=True,
+        text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def machineInfo():
+    """
+    machineInfo
+    ---
+    Description of the machine and interpreter (stored with the results).
+    """
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def writeJSON(path, content):
+    """
+    writeJSON
+    ---
+    Save the results as JSON ('-' for the standard output).
+    """
+    text = json.dumps(content, indent=2)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+
+
+def readJSON(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,174 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import linecache
+import tracemalloc
+import numpy as np
+from common import loadLab, runWorker, machineInfo, writeJSON
+
+"""
+Memory-footprint benchmark of 'lab02/main.py::run'.
+
+For each simulation time, two fresh worker processes are started:
+- plain run: peak RSS of the process (before and after the run) and the live
+breakdown 'Measure.memory_report()' of the two data centers at the end
+- traced run ('tracemalloc'): peak traced memory and the memory still
+allocated at the end, grouped by category:
+  - 'Measure.<attribute>': allocations at lines updating an attribute of a
+  'Measure' object (e.g., 'self.data.delaysList.append(...)')
+  - 'PacketRecords': per-packet records (sub/records.py)
+  - 'Client': 'Client' objects (sub/client.py and 'Client(...)' calls)
+  - 'FES': events of the future event set ('FES.put(...)' and the stdlib
+  queue module)
+  - 'other'
+  The grouping is based on the source line of the allocation, so it is
+  approximate (e.g., the floats appended to a list are counted with the list
+  only if they are created on the same line).
+
+The growth rate (bytes per simulated time unit) of each quantity is the slope
+of the least squares fit over the simulation times.
+
+Usage (from the repository root):
+    python benchmarks/memory.py [--sim-times 10000 20000 40000 80000]
+        [--out memory.json]
+"""
+
+SIM_TIMES = [10000, 20000, 40000, 80000]
+RUN_PARAMS = {"fract": 0.5, "arr_t": 3.0, "serv_t_1": 5.0, "n_serv_1": 2}
+
+
+def peakRSS():
+    """
+    peakRSS
+    ---
+    Peak resident set size of the current process (bytes).
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def allocationCategory(filename, lineno):
+    """
+    allocationCategory
+    ---
+    Category of an allocation, given the innermost frame of its traceback.
+    """
+    line = linecache.getline(filename, lineno)
+    name = os.path.basename(filename)
+    match = re.search(r"\bdata\.(\w+)", line)
+    if match is not None:
+        return "Measure." + match.group(1)
+    if name == "records.py":
+        return "PacketRecords"
+    if name == "measurements.py":
+        match = re.search(r"\bself\.(\w+)", line)
+        if match is not None:
+            return "Measure." + match.group(1)
+    if name == "client.py" or "Client(" in line:
+        return "Client"
+    if "FES.put" in line or filename == sys.modules["queue"].__file__:
+        return "FES"
+    return "other"
+
+
+def memoryRun(sim, sim_time, traced, seed=1):
+    """
+    memoryRun
+    ---
+    Run lab02 for 'sim_time' and measure the memory (see the module
+    documentation).
+    """
+    res = {"sim_time": sim_time, "traced": traced, "rss_start": peakRSS()}
+    random.seed(seed)
+    if traced:
+        tracemalloc.start()
+    start = time.perf_counter()
+    mdc_data, cdc_data = sim.run(sim_time, **RUN_PARAMS)
+    res["wall_time"] = time.perf_counter() - start
+
+    if traced:
+        snapshot = tracemalloc.take_snapshot()
+        res["traced_peak"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        groups = {}
+        for stat in snapshot.statistics("lineno"):
+            frame = stat.traceback[0]
+            cat = allocationCategory(frame.filename, frame.lineno)
+            groups[cat] = groups.get(cat, 0) + stat.size
+        res["tracemalloc"] = dict(sorted(groups.items(), key=lambda x: -x[1]))
+    else:
+        res["rss_peak"] = peakRSS()
+        res["memory_report"] = {
+            "mdc": mdc_data.memory_report(),
+            "cdc": cdc_data.memory_report(),
+        }
+    return res
+
+
+def growthRates(results, values):
+    """
+    growthRates
+    ---
+    Slope (bytes per simulated time unit) of each quantity of the dicts
+    values(results[i]), as a function of the simulation time.
+    """
+    if len(results) < 2:
+        return {}
+    x = [r["sim_time"] for r in results]
+    names = set().union(*[values(r) for r in results])
+    rates = {}
+    for name in names:
+        y = [values(r).get(name, 0) for r in results]
+        rates[name] = float(np.polyfit(x, y, 1)[0])
+    return dict(sorted(rates.items(), key=lambda x: -x[1]))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        options = json.loads(sys.argv[3])
+        sim = loadLab(sys.argv[2])
+        print(json.dumps(memoryRun(sim, options["sim_time"], options["traced"])))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Memory-footprint benchmark")
+    parser.add_argument("--sim-times", nargs="+", type=float, default=SIM_TIMES)
+    parser.add_argument("--out", default=None, help="output JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for sim_time in args.sim_times:
+        for traced in [False, True]:
+            options = {"sim_time": sim_time, "traced": traced}
+            results.append(runWorker(__file__, "lab02", options))
+
+    plain = [r for r in results if not r["traced"]]
+    traced = [r for r in results if r["traced"]]
+    content = {
+        "machine": machineInfo(),
+        "run_params": RUN_PARAMS,
+        "results": results,
+        "growth": {
+            "mdc": growthRates(plain, lambda r: r["memory_report"]["mdc"]),
+            "cdc": growthRates(plain, lambda r: r["memory_report"]["cdc"]),
+            "tracemalloc": growthRates(traced, lambda r: r["tracemalloc"]),
+        },
+    }
+    if args.out is not None:
+        writeJSON(args.out, content)
+
+    print(f"{'sim_time':>10} {'peak RSS [MB]':>14} {'traced peak [MB]':>17}")
+    for p, t in zip(plain, traced):
+        print(
+            f"{p['sim_time']:>10.0f} {p['rss_peak'] / 2**20:>14.1f}"
+            f" {t['traced_peak'] / 2**20:>17.1f}"
+        )
+    for name, rates in content["growth"].items():
+        print(f"\nGrowth, {name} (bytes per time unit):")
+        for cat, rate in list(rates.items())[:10]:
+            print(f"  {cat:<40} {rate:>10.1f}")
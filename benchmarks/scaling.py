@@ -0,0 +1,225 @@
+import sys
+import json
+import queue
+import pstats
+import cProfile
+import argparse
+import numpy as np
+from common import LABS, loadLab, runWorker, machineInfo, writeJSON, readJSON
+from throughput import timeRun
+
+"""
+Scaling benchmark: cost of the simulators as a function of the number of
+servers and of the buffer size.
+
+Two sweeps are run for each lab:
+- servers: n_server in 1, 4, ..., 4096 (infinite buffer, load 0.9)
+- buffer: queue_len in 10, 100, 1000, 10000 and unbounded (1 server, load 2:
+the system is overloaded and the simulation lasts at least twice the time
+needed to fill the buffer, so that it is full most of the time)
+
+Each point is run twice: without profiler, for the total time per event,
+and with cProfile, to split the time among the hot spots:
+- choose_server: 'Server.chooseNextServer' (linear scan of the idle vector)
+- queue_pop: 'list.pop' (removal of the first client of the waiting line)
+- fes: 'PriorityQueue.put/get' of the future event set (with locks); only
+the FES based on the stdlib 'queue.PriorityQueue' is recognized: with a
+different FES (e.g., the heapq-based one of 'sub/network.py') this component
+is 0 and its exponent is not fitted
+
+For each sweep and component, the empirical complexity exponent is the slope
+of the least squares fit of log(time per event) vs log(size), i.e.,
+time per event ~ size^exponent (the unbounded buffer is excluded from the
+fit). The profiled times are inflated by the profiler overhead: compare them
+across sizes, not with the total.
+
+Usage (from the repository root):
+    python benchmarks/scaling.py run [--out scaling.json] [--plot scaling.png]
+        [--n-events N] [--labs lab01 lab02]
+    python benchmarks/scaling.py plot scaling.json scaling.png
+"""
+
+SERVER_SIZES = [1, 4, 16, 64, 256, 1024, 4096]
+BUFFER_SIZES = [10, 100, 1000, 10000, None]
+SERVER_LOAD = 0.9
+BUFFER_LOAD = 2.0
+COMPONENTS = ["choose_server", "queue_pop", "fes"]
+
+
+def profileComponents(stats):
+    """
+    profileComponents
+    ---
+    Extract the time of the hot spots from the 'pstats' dict
+    {(file, line, function): (cc, nc, tottime, cumtime, callers)}. The FES
+    time is the one of the methods 'put' and 'get' defined in the stdlib
+    module 'queue' (i.e., 'queue.PriorityQueue').
+    """
+    times = {c: 0.0 for c in COMPONENTS}
+    for (file, _, func), (_, _, tottime, cumtime, _) in stats.items():
+        if func == "chooseNextServer":
+            times["choose_server"] += tottime
+        elif func == "<method 'pop' of 'list' objects>":
+            times["queue_pop"] += tottime
+        elif file == queue.__file__ and func in ["put", "get"]:
+            times["fes"] += cumtime
+    return times
+
+
+def runPoint(sim, lab, sweep, size, n_events, seed=1):
+    """
+    runPoint
+    ---
+    Measure one point of a sweep: total time per event and time per event of
+    each component.
+    """
+    if sweep == "servers":
+        n_server, queue_len, load = size, None, SERVER_LOAD
+    else:
+        n_server, queue_len, load = 1, size, BUFFER_LOAD
+    case = {"lab": lab, "n_server": n_server, "policy": "first_idle"}
+    arr_rate = load * n_server
+    sim_time = n_events / (2 * arr_rate)
+    if sweep == "buffer" and size is not None:
+        # The buffer fills at rate (load - 1) (service time = 1)
+        sim_time = max(sim_time, 2 * size / (load - 1))
+
+    events, wall_time = timeRun(sim, case, sim_time, queue_len, arr_rate, seed)
+
+    prof = cProfile.Profile()
+    prof.enable()
+    timeRun(sim, case, sim_time, queue_len, arr_rate, seed)
+    prof.disable()
+    comp = profileComponents(pstats.Stats(prof).stats)
+
+    res = {
+        "lab": lab,
+        "sweep": sweep,
+        "size": size,
+        "events": events,
+        "total": wall_time / events,
+    }
+    res.update({c: t / events for c, t in comp.items()})
+    return res
+
+
+def fitExponents(results):
+    """
+    fitExponents
+    ---
+    Fit the complexity exponents: dict {lab: {sweep: {component: exponent}}}.
+    """
+    fits = {}
+    for lab in sorted(set(r["lab"] for r in results)):
+        fits[lab] = {}
+        for sweep in ["servers", "buffer"]:
+            points = [
+                r
+                for r in results
+                if r["lab"] == lab and r["sweep"] == sweep and r["size"] is not None
+            ]
+            if len(points) < 2:
+                continue
+            x = np.log([r["size"] for r in points])
+            fits[lab][sweep] = {}
+            for c in ["total"] + COMPONENTS:
+                y = np.array([r[c] for r in points])
+                if np.any(y <= 0):
+                    # Component never called in this sweep
+                    fits[lab][sweep][c] = None
+                    continue
+                fits[lab][sweep][c] = float(np.polyfit(x, np.log(y), 1)[0])
+    return fits
+
+
+def plotScaling(content, img_name):
+    """
+    plotScaling
+    ---
+    Plot the time per event vs size (log-log), one panel per lab and sweep.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    results = content["results"]
+    labs = sorted(set(r["lab"] for r in results))
+    fig, axes = plt.subplots(len(labs), 2, figsize=(12, 4.5 * len(labs)), squeeze=False)
+    for i, lab in enumerate(labs):
+        for j, sweep in enumerate(["servers", "buffer"]):
+            ax = axes[i][j]
+            points = [
+                r
+                for r in results
+                if r["lab"] == lab and r["sweep"] == sweep and r["size"] is not None
+            ]
+            for c in ["total"] + COMPONENTS:
+                exp = content["exponents"][lab].get(sweep, {}).get(c)
+                label = c if exp is None else f"{c} (exponent {exp:.2f})"
+                ax.loglog(
+                    [r["size"] for r in points],
+                    [max(r[c], 1e-12) for r in points],
+                    "o-",
+                    label=label,
+                )
+            ax.set_title(f"{lab} - {sweep}")
+            ax.set_xlabel("n_server" if sweep == "servers" else "queue_len")
+            ax.set_ylabel("time per event [s]")
+            ax.grid(which="both", alpha=0.3)
+            ax.legend()
+    fig.tight_layout()
+    fig.savefig(img_name, dpi=150)
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        lab, options = sys.argv[2], json.loads(sys.argv[3])
+        sim = loadLab(lab)
+        out = [
+            runPoint(sim, lab, "servers", n, options["n_events"]) for n in SERVER_SIZES
+        ]
+        out += [
+            runPoint(sim, lab, "buffer", q, options["n_events"]) for q in BUFFER_SIZES
+        ]
+        print(json.dumps(out))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Scaling benchmark")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_cmd = commands.add_parser("run", help="run the benchmark")
+    run_cmd.add_argument("--out", default="-", help="output JSON file")
+    run_cmd.add_argument("--plot", default=None, help="output image")
+    run_cmd.add_argument("--n-events", type=int, default=20000)
+    run_cmd.add_argument("--labs", nargs="+", default=LABS, choices=LABS)
+    plot_cmd = commands.add_parser("plot", help="plot saved results")
+    plot_cmd.add_argument("results")
+    plot_cmd.add_argument("img_name")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = []
+        for lab in args.labs:
+            results += runWorker(__file__, lab, {"n_events": args.n_events})
+        content = {
+            "machine": machineInfo(),
+            "n_events": args.n_events,
+            "results": results,
+            "exponents": fitExponents(results),
+        }
+        writeJSON(args.out, content)
+        if args.out != "-":
+            # Component growing faster with the size, for each sweep
+            for lab, sweeps in content["exponents"].items():
+                for sweep, exps in sweeps.items():
+                    comp = {c: e for c, e in exps.items() if c != "total" and e}
+                    if not comp:
+                        # No component fitted (never called or failed fit)
+                        continue
+                    worst = max(comp, key=comp.get)
+                    print(f"{lab} - {sweep}: {worst} grows fastest ({comp[worst]:.2f})")
+        if args.plot is not None:
+            plotScaling(content, args.plot)
+    else:
+        plotScaling(readJSON(args.results), args.img_name)
@@ -0,0 +1,314 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from itertools import product
+from common import LABS, loadLab, runWorker, machineInfo, writeJSON, readJSON
+
+"""
+Simulation throughput benchmark.
+
+Measures the events per second (wall time) and the wall time per simulated
+time unit of 'queue_generic-ES.py::run' (lab01) and 'main.py::run' (lab02),
+on the grid:
+- load (utilization of the servers): 0.5, 0.9, 0.99
+- number of servers: 1, 4, 64
+- buffer: finite (2 places per server) or infinite
+- server policy: 'first_idle', 'round_robin'
+
+The average service time is 1 and the arrival rate is set to obtain the
+requested load; in lab02 the cloud servers are 1/fract times slower, so that
+both data centers have (about) the same load. The simulation time is chosen
+so that each case processes about 'n_events' events. To reduce the noise,
+after one untimed run each case is measured 'repeat' times (same seed), in
+interleaved rounds over all the cases; each measurement repeats the run until
+at least 'min_time' seconds of wall time have elapsed, and the fastest
+measurement is kept (the noise of the machine only slows the runs down).
+
+Usage (from the repository root):
+    python benchmarks/throughput.py run [--out results.json] [--n-events N]
+        [--repeat R] [--min-time T]
+    python benchmarks/throughput.py compare results.json [--baseline FILE]
+        [--tolerance 0.25] [--force]
+
+'compare' exits with status 1 if the events per second of some case dropped
+by more than 'tolerance' (relative) with respect to the baseline
+(benchmarks/baseline.json by default). The results can only be compared with
+a baseline obtained on the same machine with the same 'n_events', 'repeat'
+and 'min_time': otherwise, 'compare' exits with status 2 (with '--force', the
+differences are only reported as warnings). Regenerate the baseline with
+'run --out benchmarks/baseline.json' when the machine changes.
+"""
+
+LOADS = [0.5, 0.9, 0.99]
+N_SERVERS = [1, 4, 64]
+BUFFERS = ["finite", "inf"]
+POLICIES = ["first_idle", "round_robin"]
+FRACT = 0.5  # Fraction of packets B (lab02)
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def benchCases(lab):
+    """
+    benchCases
+    ---
+    List of the cases (dicts) of the grid for one lab.
+    """
+    cases = []
+    for load, n_server, buffer, policy in product(LOADS, N_SERVERS, BUFFERS, POLICIES):
+        cases.append(
+            {
+                "name": f"{lab}/load={load}/n_server={n_server}/buffer={buffer}/{policy}",
+                "lab": lab,
+                "load": load,
+                "n_server": n_server,
+                "buffer": buffer,
+                "policy": policy,
+            }
+        )
+    return cases
+
+
+def caseSetup(case, n_events):
+    """
+    caseSetup
+    ---
+    Return (sim_time, queue_len, arr_rate) of a case, the simulation time
+    being chosen so that a run processes about 'n_events' events.
+    """
+    n_server = case["n_server"]
+    queue_len = 2 * n_server if case["buffer"] == "finite" else None
+    arr_rate = case["load"] * n_server  # Service time = 1
+    # Each packet generates (about) 2 events per data center it visits
+    sim_time = n_events / (2 * arr_rate)
+
+    if case["lab"] == "lab02":
+        # Packets B visit both data centers
+        sim_time /= 1 + FRACT
+    return sim_time, queue_len, arr_rate
+
+
+def runCases(sim, cases, n_events, repeat=7, min_time=0.2, seed=1):
+    """
+    runCases
+    ---
+    Run the cases and return the measured throughput. The measurements are
+    interleaved (in each round, every case is measured once), so that a slow
+    period of the machine affects one measurement of many cases rather than
+    all the measurements of one case.
+
+    ### Input parameters
+    - sim: simulator module (see 'loadLab')
+    - cases: list of dicts describing the cases (see 'benchCases')
+    - n_events: approximate number of events to be processed by each run
+    - repeat: number of rounds of measurements (the fastest one is kept)
+    - min_time: minimum wall time of each measurement (the run is repeated
+    until it elapses)
+    - seed: seed of the random generators
+
+    ### Output parameters
+    - results: list of the case dicts updated with sim_time, events (of one
+    run), wall_time (of one run), events_per_s, wall_per_time_unit and spread
+    (relative difference between the fastest and the slowest measurement)
+    """
+    setups = [caseSetup(case, n_events) for case in cases]
+    # Untimed runs (imports, caches)
+    events = [timeRun(sim, c, *setup, seed)[0] for c, setup in zip(cases, setups)]
+
+    rates = [[] for _ in cases]
+    for _ in range(repeat):
+        for i, (case, setup) in enumerate(zip(cases, setups)):
+            tot_events, tot_wall = 0, 0.0
+            while tot_wall < min_time:
+                n, elapsed = timeRun(sim, case, *setup, seed)
+                tot_events += n
+                tot_wall += elapsed
+            rates[i].append(tot_events / tot_wall)
+
+    results = []
+    for case, (sim_time, _, _), n, r in zip(cases, setups, events, rates):
+        events_per_s = max(r)
+        res = dict(case)
+        res.update(
+            {
+                "sim_time": sim_time,
+                "events": n,
+                "wall_time": n / events_per_s,
+                "events_per_s": events_per_s,
+                "wall_per_time_unit": n / events_per_s / sim_time,
+                "spread": (max(r) - min(r)) / events_per_s,
+            }
+        )
+        results.append(res)
+    return results
+
+
+def timeRun(sim, case, sim_time, queue_len, arr_rate, seed):
+    """
+    timeRun
+    ---
+    Run the simulator once; return the number of processed events and the
+    wall time.
+    """
+    n_server = case["n_server"]
+    if case["lab"] == "lab01":
+        sim.SIM_TIME = sim_time
+        start = time.perf_counter()
+        _, data, _ = sim.run(
+            serv_t=1.0,
+            arr_t=1.0 / arr_rate,
+            queue_len=queue_len,
+            n_server=n_server,
+            server_policy=case["policy"],
+            seed=seed,
+            serv_dist="expovariate",
+        )
+        wall_time = time.perf_counter() - start
+        return data.arr + data.dep, wall_time
+
+    random.seed(seed)
+    start = time.perf_counter()
+    mdc_data, cdc_data = sim.run(
+        sim_time,
+        FRACT,
+        arr_t=1.0 / arr_rate,
+        serv_t_1=1.0,
+        q1_len=queue_len,
+        n_serv_1=n_server,
+        serv_t_2=1.0 / FRACT,
+        q2_len=queue_len,
+        n_serv_2=n_server,
+        server_policy=case["policy"],
+    )
+    wall_time = time.perf_counter() - start
+    return mdc_data.arr + mdc_data.dep + cdc_data.arr + cdc_data.dep, wall_time
+
+
+def runBenchmark(n_events, repeat=7, min_time=0.2, labs=LABS):
+    """
+    runBenchmark
+    ---
+    Run all the cases (one worker process per lab) and return the results.
+    """
+    options = {"n_events": n_events, "repeat": repeat, "min_time": min_time}
+    results = []
+    for lab in labs:
+        results += runWorker(__file__, lab, options)
+    return {
+        "machine": machineInfo(),
+        **options,
+        "results": results,
+    }
+
+
+def checkComparable(current, baseline):
+    """
+    checkComparable
+    ---
+    Return the list of the differences (strings) between the settings of two
+    results which make them not comparable: machine and interpreter,
+    'n_events', 'repeat' and 'min_time'. The list is empty if the results are
+    comparable.
+    """
+    diffs = []
+    for key in ["n_events", "repeat", "min_time"]:
+        if current.get(key) != baseline.get(key):
+            diffs.append(f"{key}: {current.get(key)} (baseline {baseline.get(key)})")
+    machine, base_machine = current.get("machine", {}), baseline.get("machine", {})
+    for key in sorted(set(machine) | set(base_machine)):
+        if machine.get(key) != base_machine.get(key):
+            diffs.append(
+                f"machine {key}: {machine.get(key)} (baseline {base_machine.get(key)})"
+            )
+    return diffs
+
+
+def compareResults(current, baseline, tolerance=0.25):
+    """
+    compareResults
+    ---
+    Compare the events per second of the cases present in both results.
+
+    ### Output parameters
+    - rows: list of tuples (name, baseline ev/s, current ev/s, ratio,
+    regression flag)
+    """
+    base = {r["name"]: r for r in baseline["results"]}
+    rows = []
+    for r in current["results"]:
+        if r["name"] not in base:
+            continue
+        ratio = r["events_per_s"] / base[r["name"]]["events_per_s"]
+        rows.append(
+            (
+                r["name"],
+                base[r["name"]]["events_per_s"],
+                r["events_per_s"],
+                ratio,
+                ratio < 1 - tolerance,
+            )
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        # Worker process: run the cases of one lab, print the results as JSON
+        lab, options = sys.argv[2], json.loads(sys.argv[3])
+        sim = loadLab(lab)
+        out = runCases(
+            sim,
+            benchCases(lab),
+            options["n_events"],
+            options["repeat"],
+            options["min_time"],
+        )
+        print(json.dumps(out))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Simulation throughput benchmark")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_cmd = commands.add_parser("run", help="run the benchmark")
+    run_cmd.add_argument("--out", default="-", help="output JSON file")
+    run_cmd.add_argument("--n-events", type=int, default=20000)
+    run_cmd.add_argument("--repeat", type=int, default=7)
+    run_cmd.add_argument("--min-time", type=float, default=0.2)
+    run_cmd.add_argument("--labs", nargs="+", default=LABS, choices=LABS)
+    cmp_cmd = commands.add_parser("compare", help="compare with the baseline")
+    cmp_cmd.add_argument("results", help="JSON file produced by 'run'")
+    cmp_cmd.add_argument("--baseline", default=BASELINE)
+    cmp_cmd.add_argument("--tolerance", type=float, default=0.25)
+    cmp_cmd.add_argument(
+        "--force", action="store_true", help="compare even if the settings differ"
+    )
+    args = parser.parse_args()
+
+    if args.command == "run":
+        writeJSON(
+            args.out,
+            runBenchmark(args.n_events, args.repeat, args.min_time, args.labs),
+        )
+    else:
+        current, baseline = readJSON(args.results), readJSON(args.baseline)
+        diffs = checkComparable(current, baseline)
+        if diffs:
+            label = "WARNING" if args.force else "ERROR"
+            for d in diffs:
+                print(f"{label}: different {d}", file=sys.stderr)
+            if not args.force:
+                print(
+                    "The results are not comparable with the baseline "
+                    "(use --force to compare anyway)",
+                    file=sys.stderr,
+                )
+                sys.exit(2)
+        rows = compareResults(current, baseline, args.tolerance)
+        print(f"{'case':<60} {'baseline':>10} {'current':>10} {'ratio':>6}")
+        for name, base_eps, eps, ratio, regression in rows:
+            flag = "  REGRESSION" if regression else ""
+            print(f"{name:<60} {base_eps:>10.0f} {eps:>10.0f} {ratio:>6.2f}{flag}")
+        n_regr = sum(r[4] for r in rows)
+        print(f"\n{len(rows)} cases compared, {n_regr} regressions")
+        sys.exit(1 if n_regr > 0 else 0)
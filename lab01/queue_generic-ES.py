@@ -1,14 +1,12 @@
 #!/usr/bin/python3
 
-import random
 import numpy as np
-from queue import Queue, PriorityQueue
-from sub.measurements import Measure
-from sub.client import Client
-from sub.server import Server
-import matplotlib.pyplot as plt
+from sub.rendering import plt
 from scipy.stats import t
 from sub.utilities import *
+from sub.splitting import lossProbSplitting
+from sub.analytic import mmck
+from sub.simulator import Simulator
 
 """
 General program for sinluating a queuing system.
@@ -22,220 +20,10 @@ Parameters:
 # ******************************************************************************
 # Constants
 # ******************************************************************************
-TYPE1 = 1
-
 SIM_TIME = 50000
 
 img_path = "report/images/"  # To be filled with desired name
 
-# ******************************************************************************
-# Additional methods:
-
-
-def addClient(time, FES, queue, serv, queue_len, n_server):
-    """
-    Decide whether the user can be added.
-    Need to look at the QUEUE_LEN parameter.
-    This method is called by the 'arrival' subroutine.
-    """
-    global users, data
-
-    if queue_len is not None:
-        # Limited length
-        if users < queue_len:
-            users += 1
-            data.n_usr_t.append((users, time))
-            # create a record for the client
-            client = Client(TYPE1, time)
-            # insert the record in the queue
-            queue.append(client)
-
-            # If there are less clients than servers, it means that the
-            # new client can directly be served
-            # It may also be that the number of servers is unlimited
-            # (new client always finds a server)
-            if n_server is None or users <= n_server:
-                # sample the service time
-                service_time, serv_id = serv.evalServTime(type="constant")
-                data.servicesList.append(service_time)
-                # service_time = 1 + random.uniform(0, SEVICE_TIME)
-
-                # schedule when the client will finish the server
-                FES.put((time + service_time, ["departure", serv_id]))
-                serv.makeBusy(serv_id)
-
-                if n_server is not None:
-                    # Update the beginning of the service
-                    data.serv_busy[serv_id]["begin_last_service"] = time
-
-                # Update the waiting time for the client which starts to be served straight away
-                # Get the client - not extracting:
-                cli = queue[0]
-                data.waitingDelaysList.append(time - cli.arrival_time)
-
-        else:
-            # Lost client
-            data.countLosses += 1
-    else:
-        # Unlimited length
-        users += 1
-        data.n_usr_t.append((users, time))
-
-        # create a record for the client
-        client = Client(TYPE1, time)
-
-        # insert the record in the queue
-        queue.append(client)
-
-        # If there are less clients than servers, it means that the
-        # new client can directly be served
-        if n_server is None or users <= n_server:
-            # sample the service time
-            service_time, serv_id = serv.evalServTime(type="constant")
-            data.servicesList.append(service_time)
-            # service_time = 1 + random.uniform(0, SEVICE_TIME)
-
-            # schedule when the client will finish the server
-            FES.put((time + service_time, ["departure", serv_id]))
-            serv.makeBusy(serv_id)
-
-            if n_server is not None:
-                # Update the beginning of the service
-                data.serv_busy[serv_id]["begin_last_service"] = time
-
-            # Update the waiting time for the client which starts to be served straight away
-            # Get the client - not extracting:
-            cli = queue[0]
-            data.waitingDelaysList.append(time - cli.arrival_time)
-
-
-# arrivals *********************************************************************
-def arrival(time, FES, queue, serv, queue_len, n_server, arr_t):
-    """
-    arrival
-    ---
-    Perform operations needed at arrival.
-    In particular, the new user is added to the queuing
-    system and the measurements are updated.
-
-    Input parameters:
-    - time: current time, extracted from the event in the FES.
-    - FES: (priority queue) future event set (for scheduling). Used to place
-    the next scheduled arrival.
-    - queue: (list) containing all users which are currently inside the
-    system (both waiting and being served).
-    """
-    global users
-    global data
-
-    assert len(queue) == users, "The len of the queue and number of clients don't match"
-
-    # print("Arrival no. ",data.arr+1," at time ",time," with ",users," users" )
-
-    # cumulate statistics
-    data.arr += 1
-    data.ut += users * (time - data.oldT)
-    data.avgBuffer += max(0, users - n_server) * (time - data.oldT)
-    data.oldT = time
-
-    # sample the time until the next event
-    inter_arrival = random.expovariate(lambd=1.0 / arr_t)
-    data.arrivalsList.append(inter_arrival)
-
-    # schedule the next arrival
-    FES.put((time + inter_arrival, ["arrival"]))
-
-    ################################
-    addClient(time, FES, queue, serv, queue_len, n_server)
-    ################################
-
-
-# ******************************************************************************
-
-
-# departures *******************************************************************
-def departure(time, FES, queue, serv_id, serv, n_server):
-    """
-    departure
-    ---
-    Perform the operations needed at a departure (end of service).
-    Specifically, this method updates the measurements and removes the served
-    client from the system, then it possibly adds another client to the service.
-
-    Input parameters:
-    - time: current time, extracted from the event in the FES.
-    - FES: (priority queue) future event set (for scheduling). Used to place
-    the next scheduled arrival.
-    - queue: (list) containing all users which are currently inside the
-    system (both waiting and being served).
-    """
-    global users
-    global data
-
-    # print("Departure no. ",data.dep+1," at time ",time," with ",users," users" )
-
-    # cumulate statistics
-    data.dep += 1
-    data.ut += users * (time - data.oldT)
-    data.avgBuffer += max(0, users - n_server) * (time - data.oldT)
-
-    data.oldT = time
-
-    if len(queue) > 0:
-        # get the first element from the queue
-        client = queue.pop(0)
-
-        # Make its server idle
-        serv.makeIdle(serv_id)
-
-        if n_server is not None:
-            # Update cumulative server busy time
-
-            # Add to the cumulative time the time difference between now (service end)
-            # and the beginning of the service
-            # print(data.serv_busy[serv_id]['cumulative_time'])
-            data.serv_busy[serv_id]["cumulative_time"] += (
-                time - data.serv_busy[serv_id]["begin_last_service"]
-            )
-
-        # do whatever we need to do when clients go away
-
-        data.delay += time - client.arrival_time
-        data.delaysList.append(time - client.arrival_time)
-        users -= 1
-        data.n_usr_t.append((users, time))
-
-    # Update time
-    data.oldT = time
-
-    can_add = False
-
-    # See whether there are more clients in the line
-    if n_server is not None:
-        if users >= n_server:
-            can_add = True
-    elif users > 0:
-        can_add = True
-
-    ########## SERVE ANOTHER CLIENT #############
-    if can_add:
-        # Sample the service time
-        service_time, new_serv_id = serv.evalServTime(type="constant")
-        data.servicesList.append(service_time)
-
-        new_served = queue[0]
-
-        data.waitingDelaysList.append(time - new_served.arrival_time)
-        data.waitingDelaysList_no_zeros.append(time - new_served.arrival_time)
-
-        # Schedule when the service will end
-        FES.put((time + service_time, ["departure", new_serv_id]))
-        serv.makeBusy(new_serv_id)
-
-        if n_server is not None:
-            # Update the beginning of the service
-            data.serv_busy[new_serv_id]["begin_last_service"] = time
-
 
 # ******************************************************************************
 # simulation run function
@@ -247,57 +35,35 @@ def run(
     n_server=1,
     server_policy="first_idle",
     seed=1,
+    serv_dist="constant",
+    dist_params=None,
+    profile=False,
 ):
     """
     run
     ---
-    Run the simulation of the queuing system.
-
-    Input parameters:
-    - serv_t: average service time (1/serv_rate)
-    - arr_t: average inter-arrival time (1/arr_rate)
-    - queue_len: maximum queue length (if None then infinite queue)
-    - n_server: number of servers (if None then infinite queue)
+    Run the simulation of the queuing system for SIM_TIME with a new
+    'Simulator' (see 'sub.simulator' for the input parameters). The number of
+    users and the measurements of the run are also stored in the module
+    variables 'users' and 'data'.
     """
     global users
     global data
 
-    ###### Check - the number of servers cannot be unlimited if QUEUE_LEN is finite
-    if queue_len is not None and n_server is None:
-        """NOTE: the number of server 'wins' - it forces the queue length to be infinite"""
-        queue_len = None
-
-    # The following contains the list of all clients currently present in the
-    # system (waiting + served):
-    MM_system = []
-    users = 0
-    random.seed(seed)
-
-    data = Measure(0, 0, 0, 0, 0, 0, n_server)
-
-    # Simulation time
-    time = 0
-
-    # List of events in the form: (time, type)
-    FES = PriorityQueue()
-
-    # Schedule the FIRST ARRIVAL at t=0
-    FES.put((0, ["arrival"]))
-
-    # Create servers (class)
-    servers = Server(n_server, serv_t, policy=server_policy)
-
-    # Simulate until the simulated time reaches a constant
-    while time < SIM_TIME:
-        (time, event_type) = FES.get()
-
-        if event_type[0] == "arrival":
-            arrival(time, FES, MM_system, servers, queue_len, n_server, arr_t)
-
-        elif event_type[0] == "departure":
-            departure(time, FES, MM_system, event_type[1], servers, n_server)
-
-    return MM_system, data, time
+    sim = Simulator(SIM_TIME)
+    out = sim.run(
+        serv_t,
+        arr_t,
+        queue_len,
+        n_server,
+        server_policy,
+        seed,
+        serv_dist,
+        dist_params,
+        profile,
+    )
+    users, data = sim.users, sim.data
+    return out
 
 
 # ******************************************************************
@@ -318,12 +84,14 @@ if __name__ == "__main__":
         - change_arr_t: launch multiple runs on different values of the arrival rate
         - multi_vs_single: comparison between MM1 vs MM2 systems
         - change_queue_l: launch multiple runs on different queue length values
+        - rare_loss: estimate very small loss probabilities via importance splitting
 
     """
     single_run = False
     change_arr_t = True
     multi_vs_single = False
     change_queue_l = False
+    rare_loss = False
 
     if single_run:
         n_server = 1
@@ -381,6 +149,8 @@ if __name__ == "__main__":
         queue_len = 10
         n_server = 1
         serv_t = 5.0
+        # exponential service, so that the runs can be compared with M/M/c/K
+        serv_dist = "expovariate"
 
         # confidence interval
         n_iter = 6  # number of iteration for confidence interval
@@ -392,7 +162,11 @@ if __name__ == "__main__":
         confidence_int = True
         for arr_t in arr_t_list:
             MM_system, data, time = run(
-                arr_t=arr_t, serv_t=serv_t, n_server=n_server, queue_len=queue_len
+                arr_t=arr_t,
+                serv_t=serv_t,
+                n_server=n_server,
+                queue_len=queue_len,
+                serv_dist=serv_dist,
             )
             data_list.append(data)
             if confidence_int:
@@ -405,6 +179,7 @@ if __name__ == "__main__":
                         n_server=n_server,
                         queue_len=queue_len,
                         seed=None,
+                        serv_dist=serv_dist,
                     )
                     data_conf_int.append(data)
 
@@ -419,8 +194,11 @@ if __name__ == "__main__":
                     )
                 )
 
-        # metrics plots on different arrival rates
-        plotArrivalRate(arr_t_list, data_list, [queue_len, n_server, serv_t])
+        # metrics plots on different arrival rates - theoretical values overlaid
+        analytic = mmck(np.array(arr_t_list), serv_t, n_server, queue_len)
+        plotArrivalRate(
+            arr_t_list, data_list, [queue_len, n_server, serv_t], analytic=analytic
+        )
 
         if confidence_int:
             # confidence interval for no. of losses
@@ -472,10 +250,42 @@ if __name__ == "__main__":
         arr_t = 6.0
         serv_t = 5.0
         n_server = 2
+        # exponential service, so that the runs can be compared with M/M/c/K
+        serv_dist = "expovariate"
         for queue_len in queue_len_list:
             MM2, data, time2 = run(
-                arr_t=arr_t, serv_t=serv_t, n_server=n_server, queue_len=queue_len
+                arr_t=arr_t,
+                serv_t=serv_t,
+                n_server=n_server,
+                queue_len=queue_len,
+                serv_dist=serv_dist,
             )  # MM2 system
             data_list.append(data)
 
-        plotQueueLen(queue_len_list, data_list, [arr_t, n_server, serv_t])
+        analytic = mmck(arr_t, serv_t, n_server, np.array(queue_len_list))
+        plotQueueLen(
+            queue_len_list, data_list, [arr_t, n_server, serv_t], analytic=analytic
+        )
+
+    if rare_loss:
+        # Loss probability for long buffers - a plain run would need an
+        # extremely large SIM_TIME to observe any loss
+        queue_len_list = [10, 20, 30]
+        arr_t = 10.0
+        serv_t = 5.0
+        n_server = 1
+        for queue_len in queue_len_list:
+            res = lossProbSplitting(
+                serv_t,
+                arr_t,
+                queue_len,
+                n_server,
+                split=3,
+                serv_type="constant",
+                n_cycles=5000,
+            )
+            print(
+                f"queue_len = {queue_len} - loss probability: {res['loss_prob']:.3e}",
+                f"- CI: ({res['conf_int'][0]:.3e}, {res['conf_int'][1]:.3e})",
+                f"- events: {res['n_events']}",
+            )
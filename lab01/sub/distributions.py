@@ -0,0 +1,186 @@
+import random
+import inspect
+import numpy as np
+from scipy.special import gamma
+
+"""
+Service time distributions.
+
+Each distribution is registered (decorator 'registerDistribution') with a
+factory, which receives the mean value and the shape parameters and returns
+the function (rng, n) -> n samples, being rng a NumPy Generator.
+A 'Sampler' binds one distribution to one server: the samples are generated in
+blocks (one NumPy call per block) and returned one at a time.
+
+Available distributions (extra parameters):
+- expovariate: exponential
+- constant: deterministic (the value is the mean)
+- uniform: uniform in (0, 2 * mean)
+- hyperexp: 2-phase hyperexponential with balanced means ('cv': coefficient of
+variation, >= 1)
+- erlang: Erlang-k ('k': number of phases)
+- lognormal: lognormal ('sigma': std of the underlying normal distribution)
+- pareto: Pareto ('alpha': shape, > 1 for a finite mean)
+- weibull: Weibull ('shape')
+- empirical: resampling of the observed values ('values'); they are rescaled to
+the requested mean unless 'rescale' is False
+"""
+
+DISTRIBUTIONS = {}
+
+
+def registerDistribution(name):
+    """
+    registerDistribution
+    ---
+    Decorator adding a distribution factory to the registry.
+    """
+
+    def decorator(factory):
+        DISTRIBUTIONS[name] = factory
+        return factory
+
+    return decorator
+
+
+@registerDistribution("expovariate")
+def expovariateDist(mean):
+    return lambda rng, n: rng.exponential(mean, n)
+
+
+@registerDistribution("constant")
+def constantDist(mean):
+    return lambda rng, n: np.full(n, float(mean))
+
+
+@registerDistribution("uniform")
+def uniformDist(mean):
+    return lambda rng, n: rng.uniform(0, 2 * mean, n)
+
+
+@registerDistribution("hyperexp")
+def hyperexpDist(mean, cv=2.0):
+    if cv < 1:
+        raise ValueError("The hyperexponential distribution needs cv >= 1!")
+    # Balanced means: p1/mu1 = p2/mu2
+    p1 = 0.5 * (1 + np.sqrt((cv**2 - 1) / (cv**2 + 1)))
+    means = np.array([mean / (2 * p1), mean / (2 * (1 - p1))])
+
+    def draw(rng, n):
+        phase = (rng.random(n) >= p1).astype(int)
+        return rng.exponential(1.0, n) * means[phase]
+
+    return draw
+
+
+@registerDistribution("erlang")
+def erlangDist(mean, k=2):
+    if k < 1:
+        raise ValueError("The Erlang distribution needs k >= 1!")
+    return lambda rng, n: rng.gamma(k, mean / k, n)
+
+
+@registerDistribution("lognormal")
+def lognormalDist(mean, sigma=1.0):
+    mu = np.log(mean) - sigma**2 / 2
+    return lambda rng, n: rng.lognormal(mu, sigma, n)
+
+
+@registerDistribution("pareto")
+def paretoDist(mean, alpha=2.5):
+    if alpha <= 1:
+        raise ValueError("The Pareto distribution needs alpha > 1 (finite mean)!")
+    x_min = mean * (alpha - 1) / alpha
+    # NumPy draws from the Lomax distribution (shifted Pareto)
+    return lambda rng, n: x_min * (1 + rng.pareto(alpha, n))
+
+
+@registerDistribution("weibull")
+def weibullDist(mean, shape=0.5):
+    scale = mean / gamma(1 + 1 / shape)
+    return lambda rng, n: scale * rng.weibull(shape, n)
+
+
+@registerDistribution("empirical")
+def empiricalDist(mean, values, rescale=True):
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        raise ValueError("No values provided for the empirical distribution!")
+    if rescale:
+        values = values * mean / np.mean(values)
+    return lambda rng, n: rng.choice(values, n)
+
+
+def shapeParameters(name):
+    """
+    shapeParameters
+    ---
+    Names of the shape parameters of a distribution of the registry.
+    """
+    if name not in DISTRIBUTIONS:
+        raise ValueError(f"Invalid distribution type '{name}'!")
+    return list(inspect.signature(DISTRIBUTIONS[name]).parameters)[1:]
+
+
+# ******************************************************************************
+# Sampler
+# ******************************************************************************
+class Sampler:
+    def __init__(self, name, mean, rng=None, block_size=1024, **params):
+        """
+        Sampler
+        ---
+        Generator of samples of one distribution of the registry.
+
+        ### Input parameters
+        - name: name of the distribution
+        - mean: mean value
+        - rng: NumPy Generator; if None, a new one is seeded from the 'random'
+        module, so that 'random.seed' makes the runs reproducible
+        - block_size: number of samples generated at once
+        - params: shape parameters of the distribution
+        """
+        if name not in DISTRIBUTIONS:
+            raise ValueError(f"Invalid distribution type '{name}'!")
+        self.name = name
+        self.mean = mean
+        self.params = params
+        self.draw = DISTRIBUTIONS[name](mean, **params)
+        if rng is None:
+            rng = np.random.default_rng(random.getrandbits(32))
+        self.rng = rng
+        self.block_size = block_size
+
+        self.block = []
+        self.pos = 0
+
+    def __getstate__(self):
+        # The sampling function is a closure: it is rebuilt when unpickling
+        state = dict(self.__dict__)
+        del state["draw"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.draw = DISTRIBUTIONS[self.name](self.mean, **self.params)
+
+    def reseed(self, seed):
+        """
+        reseed
+        ---
+        Replace the NumPy generator with a new one seeded with 'seed'; the
+        samples already drawn and not yet used are discarded.
+        """
+        self.rng = np.random.default_rng(seed)
+        self.block = []
+        self.pos = 0
+
+    def __call__(self):
+        """
+        Return the next sample.
+        """
+        if self.pos >= len(self.block):
+            self.block = self.draw(self.rng, self.block_size).tolist()
+            self.pos = 0
+        self.pos += 1
+        return self.block[self.pos - 1]
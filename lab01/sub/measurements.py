@@ -1,4 +1,4 @@
-import matplotlib.pyplot as plt
+from sub.rendering import plt
 import numpy as np
 
 
@@ -25,6 +25,8 @@ class Measure:
         # Distribution of the queuing delay
         # Save all values as a list and make the histogram when needed
         self.delaysList = []
+        # Number of bins of the histograms, cached by (list name, length)
+        self.bins_cache = {}
 
         # Store all inter arrival times:
         self.arrivalsList = []
@@ -61,8 +63,23 @@ class Measure:
                 for i in range(n_servers)
             ]
         else:
-            # Unlimited n. of servers       ! complicated
-            pass
+            # Unlimited n. of servers: one single element, whose cumulative time
+            # is the total busy time of all the servers (sum of the service times
+            # of the completed services) - no per-server state is needed
+            self.serv_busy = [{"cumulative_time": 0, "begin_last_service": 0}]
+
+    def histBins(self, name):
+        """
+        histBins
+        ---
+        Number of bins of the histogram of the list 'name' (square root of the
+        number of distinct values); the value is computed once per list length.
+        """
+        values = getattr(self, name)
+        key = (name, len(values))
+        if key not in self.bins_cache:
+            self.bins_cache[key] = round(np.sqrt(len(np.unique(values))))
+        return self.bins_cache[key]
 
     def queuingDelayHist(self, mean_value=False, img_name=None):
         """
@@ -74,7 +91,7 @@ class Measure:
         - img_name: if provided (not None) the plot will be saved in the provided location
         """
         plt.figure(figsize=(8, 4))
-        plt.hist(self.delaysList, bins=round(np.sqrt(len(np.unique(self.delaysList)))))
+        plt.hist(self.delaysList, bins=self.histBins("delaysList"))
         if mean_value:
             # Plot the horizontal line corresponding to the mean
             plt.axvline(
@@ -134,7 +151,11 @@ class Measure:
                 plt.savefig(img_name, dpi=300)
             plt.show()
         else:
-            print("Unable to print utilization of servers - they are unlimited")
+            # Unlimited servers - the utilization of each one is not defined
+            print(
+                "Average number of busy servers (unlimited servers):",
+                self.serv_busy[0]["cumulative_time"] / sim_time,
+            )
 
     def plotUsrInTime(self, img_name=None):
         """
@@ -164,9 +185,7 @@ class Measure:
         - img_name: if provided, save the plot in the specified location
         """
         plt.figure(figsize=(8, 4))
-        plt.hist(
-            self.arrivalsList, bins=round(np.sqrt(len(np.unique(self.arrivalsList))))
-        )
+        plt.hist(self.arrivalsList, bins=self.histBins("arrivalsList"))
         if mean_value:
             plt.axvline(
                 np.mean(self.arrivalsList), color="k", linestyle="dashed", linewidth=1
@@ -189,9 +208,7 @@ class Measure:
         - img_name: if provided, save the plot in the specified location
         """
         plt.figure(figsize=(8, 4))
-        plt.hist(
-            self.servicesList, bins=round(np.sqrt(len(np.unique(self.servicesList))))
-        )
+        plt.hist(self.servicesList, bins=self.histBins("servicesList"))
         if mean_value:
             plt.axvline(
                 np.mean(self.servicesList), color="k", linestyle="dashed", linewidth=1
@@ -220,7 +237,7 @@ class Measure:
         if zeros:
             plt.hist(
                 self.waitingDelaysList,
-                bins=round(np.sqrt(len(np.unique(self.waitingDelaysList)))),
+                bins=self.histBins("waitingDelaysList"),
             )
             if mean_value:
                 # Plot the horizontal line corresponding to the mean
@@ -234,7 +251,7 @@ class Measure:
         else:
             plt.hist(
                 self.waitingDelaysList_no_zeros,
-                bins=round(np.sqrt(len(np.unique(self.waitingDelaysList_no_zeros)))),
+                bins=self.histBins("waitingDelaysList_no_zeros"),
             )
             if mean_value:
                 # Plot the horizontal line corresponding to the mean
@@ -0,0 +1,321 @@
+import random
+from queue import PriorityQueue
+from sub.measurements import Measure
+from sub.client import Client
+from sub.server import Server
+from sub.profiling import RunProfile
+
+"""
+Event-driven simulator of a single queuing system (M/G/s/n).
+
+All the state of a run (clients in the system, measurements, FES, servers and
+random streams) belongs to a 'Simulator' object, so independent runs can
+coexist in the same process (e.g., in different threads, one object each).
+The random numbers are drawn from a 'random.Random' object owned by the
+simulator (the NumPy generators of the service times are seeded from it):
+the results of run(..., seed=s) are the same as the ones of the original
+script after 'random.seed(s)'.
+"""
+
+TYPE1 = 1
+
+
+# ******************************************************************************
+# Simulator
+# ******************************************************************************
+class Simulator:
+    def __init__(self, sim_time=50000):
+        """
+        Simulator
+        ---
+        Re-entrant simulator of a queuing system.
+
+        ### Input parameters
+        - sim_time: simulation time of the runs
+
+        ### Attributes (state of the last run)
+        - users: number of clients in the system
+        - data: 'Measure' object
+        - queue: list of the clients in the system (waiting + served)
+        - in_service: with infinitely many servers, dict {key: client} of the
+        clients in the system (all in service), the key being the number of the
+        arrival; the departure events carry the key instead of the server id
+        - servers: 'Server' object
+        - FES: future event set
+        - time: current simulated time
+        - rng: 'random.Random' object used for the random streams
+        """
+        self.sim_time = sim_time
+
+        self.users = 0
+        self.data = None
+        self.queue = []
+        self.in_service = {}
+        self.servers = None
+        self.FES = None
+        self.time = 0
+        self.rng = None
+
+        # Parameters of the current run
+        self.arr_t = None
+        self.queue_len = None
+        self.n_server = None
+
+    def buffered(self):
+        """
+        buffered
+        ---
+        Number of clients in the waiting line.
+        """
+        if self.n_server is None:
+            return 0
+        return max(0, self.users - self.n_server)
+
+    def addClient(self, time):
+        """
+        Decide whether the user can be added.
+        Need to look at the QUEUE_LEN parameter.
+        This method is called by the 'arrival' method.
+        """
+        data = self.data
+
+        if self.queue_len is not None and self.users >= self.queue_len:
+            # Lost client
+            data.countLosses += 1
+            return
+
+        self.users += 1
+        data.n_usr_t.append((self.users, time))
+        client = Client(TYPE1, time)
+
+        if self.n_server is None:
+            # Infinitely many servers - the client is served immediately
+            service_time, _ = self.servers.evalServTime()
+            data.servicesList.append(service_time)
+            self.in_service[data.arr] = client
+            self.FES.put((time + service_time, ["departure", data.arr]))
+            self.servers.makeBusy(0)
+            data.waitingDelaysList.append(0.0)
+            return
+
+        # insert the record in the queue
+        self.queue.append(client)
+
+        # If there are less clients than servers, it means that the
+        # new client can directly be served
+        if self.users <= self.n_server:
+            # sample the service time
+            service_time, serv_id = self.servers.evalServTime()
+            data.servicesList.append(service_time)
+
+            # schedule when the client will finish the server
+            self.FES.put((time + service_time, ["departure", serv_id]))
+            self.servers.makeBusy(serv_id)
+
+            # Update the beginning of the service
+            data.serv_busy[serv_id]["begin_last_service"] = time
+
+            # Update the waiting time for the client which starts to be served straight away
+            # Get the client - not extracting:
+            cli = self.queue[0]
+            data.waitingDelaysList.append(time - cli.arrival_time)
+
+    def arrival(self, time):
+        """
+        arrival
+        ---
+        Perform operations needed at arrival.
+        In particular, the new user is added to the queuing
+        system and the measurements are updated.
+
+        ### Input parameters
+        - time: current time, extracted from the event in the FES
+        """
+        data = self.data
+
+        assert (
+            len(self.queue) + len(self.in_service) == self.users
+        ), "The len of the queue and number of clients don't match"
+
+        # cumulate statistics
+        data.arr += 1
+        data.ut += self.users * (time - data.oldT)
+        data.avgBuffer += self.buffered() * (time - data.oldT)
+        data.oldT = time
+
+        # sample the time until the next event
+        inter_arrival = self.rng.expovariate(1.0 / self.arr_t)
+        data.arrivalsList.append(inter_arrival)
+
+        # schedule the next arrival
+        self.FES.put((time + inter_arrival, ["arrival"]))
+
+        self.addClient(time)
+
+    def departure(self, time, serv_id):
+        """
+        departure
+        ---
+        Perform the operations needed at a departure (end of service).
+        Specifically, this method updates the measurements and removes the served
+        client from the system, then it possibly adds another client to the service.
+
+        ### Input parameters
+        - time: current time, extracted from the event in the FES
+        - serv_id: server which completed the service (key of the client with
+        infinitely many servers)
+        """
+        data = self.data
+        n_server = self.n_server
+
+        # cumulate statistics
+        data.dep += 1
+        data.ut += self.users * (time - data.oldT)
+        data.avgBuffer += self.buffered() * (time - data.oldT)
+        data.oldT = time
+
+        client = None
+        if n_server is None:
+            # The client which completed the service (served since its arrival)
+            client = self.in_service.pop(serv_id)
+            self.servers.makeIdle(0)
+            data.serv_busy[0]["cumulative_time"] += time - client.arrival_time
+        elif len(self.queue) > 0:
+            # get the first element from the queue
+            client = self.queue.pop(0)
+
+            # Make its server idle
+            self.servers.makeIdle(serv_id)
+
+            # Add to the cumulative time the time difference between now (service end)
+            # and the beginning of the service
+            data.serv_busy[serv_id]["cumulative_time"] += (
+                time - data.serv_busy[serv_id]["begin_last_service"]
+            )
+
+        if client is not None:
+            data.delay += time - client.arrival_time
+            data.delaysList.append(time - client.arrival_time)
+            self.users -= 1
+            data.n_usr_t.append((self.users, time))
+
+        ########## SERVE ANOTHER CLIENT #############
+        # See whether there are more clients in the line (never with infinitely
+        # many servers)
+        if n_server is not None and self.users >= n_server:
+            # Sample the service time
+            service_time, new_serv_id = self.servers.evalServTime()
+            data.servicesList.append(service_time)
+
+            new_served = self.queue[0]
+
+            data.waitingDelaysList.append(time - new_served.arrival_time)
+            data.waitingDelaysList_no_zeros.append(time - new_served.arrival_time)
+
+            # Schedule when the service will end
+            self.FES.put((time + service_time, ["departure", new_serv_id]))
+            self.servers.makeBusy(new_serv_id)
+
+            # Update the beginning of the service
+            data.serv_busy[new_serv_id]["begin_last_service"] = time
+
+    def run(
+        self,
+        serv_t=5.0,
+        arr_t=5.0,
+        queue_len=None,
+        n_server=1,
+        server_policy="first_idle",
+        seed=1,
+        serv_dist="constant",
+        dist_params=None,
+        profile=False,
+    ):
+        """
+        run
+        ---
+        Run the simulation of the queuing system (the state of the previous
+        run, if any, is discarded).
+
+        ### Input parameters
+        - serv_t: average service time (1/serv_rate)
+        - arr_t: average inter-arrival time (1/arr_rate)
+        - queue_len: maximum queue length (if None then infinite queue)
+        - n_server: number of servers (if None then infinite queue)
+        - server_policy: policy for the choice of the server
+        - seed: seed of the random number generators (if None, fresh entropy
+        from the OS is used)
+        - serv_dist: service time distribution (see 'sub.distributions')
+        - dist_params: dict of shape parameters of the service time distribution
+        - profile: if True, the event loop is instrumented (see 'RunProfile') and
+        the profile is returned as fourth element
+
+        ### Output parameters
+        - queue: list of the clients in the system at the end
+        - data: 'Measure' object
+        - time: simulated time at the end
+        - prof: 'RunProfile' object (only if 'profile' is True)
+        """
+        ###### Check - the number of servers cannot be unlimited if QUEUE_LEN is finite
+        if queue_len is not None and n_server is None:
+            """NOTE: the number of server 'wins' - it forces the queue length to be infinite"""
+            queue_len = None
+
+        self.arr_t = arr_t
+        self.queue_len = queue_len
+        self.n_server = n_server
+
+        self.queue = []
+        self.in_service = {}
+        self.users = 0
+        self.rng = random.Random(seed)
+        self.data = Measure(0, 0, 0, 0, 0, 0, n_server)
+        self.time = 0
+
+        # List of events in the form: (time, type)
+        self.FES = PriorityQueue()
+        # Schedule the FIRST ARRIVAL at t=0
+        self.FES.put((0, ["arrival"]))
+
+        self.servers = Server(
+            n_server,
+            serv_t,
+            policy=server_policy,
+            distribution=serv_dist,
+            dist_params=dist_params,
+        )
+        # The service times are drawn from streams seeded by this simulator
+        for sampler in self.servers.samplers:
+            sampler.reseed(self.rng.getrandbits(32))
+
+        prof = None
+        handlers = ["arrival", "departure", "addClient"]
+        if profile:
+            # The instance attributes shadow the methods during the run
+            prof = RunProfile()
+            for h in handlers:
+                setattr(self, h, prof.wrap(getattr(self, h), h))
+            prof.watchFES(self.FES)
+            prof.start()
+
+        try:
+            time = 0
+            # Simulate until the simulated time reaches a constant
+            while time < self.sim_time:
+                time, event_type = self.FES.get()
+
+                if event_type[0] == "arrival":
+                    self.arrival(time)
+
+                elif event_type[0] == "departure":
+                    self.departure(time, event_type[1])
+        finally:
+            self.time = time
+            for h in handlers:
+                self.__dict__.pop(h, None)
+
+        clients = self.queue if n_server is not None else list(self.in_service.values())
+        if prof is not None:
+            prof.stop(time)
+            return clients, self.data, time, prof
+        return clients, self.data, time
@@ -0,0 +1,245 @@
+import random
+import heapq
+import numpy as np
+from scipy.stats import t
+from sub.distributions import Sampler
+
+
+# ******************************************************************************
+# Trajectory
+# ******************************************************************************
+class Trajectory:
+    def __init__(self, users, next_arr, departures, weight=1.0, level=0):
+        """
+        Trajectory
+        ---
+        Complete (cloneable) state of a single-queue simulation, as needed by the
+        splitting estimator.
+
+        ### Attributes
+        - users: number of clients in the system (waiting + served)
+        - next_arr: time of the next scheduled arrival
+        - departures: heap containing the end-of-service times of the busy servers
+        - weight: statistical weight of the trajectory (1 for the main trajectory)
+        - level: number of thresholds the trajectory has been split at
+        """
+        self.users = users
+        self.next_arr = next_arr
+        self.departures = departures
+        self.weight = weight
+        self.level = level
+
+    def clone(self):
+        """
+        Return an independent copy of the trajectory (same state, same weight).
+        """
+        return Trajectory(
+            self.users, self.next_arr, list(self.departures), self.weight, self.level
+        )
+
+
+# ******************************************************************************
+# Additional methods:
+
+
+def servSampler(serv_type, serv_t, rng, dist_params=None):
+    """
+    servSampler
+    ---
+    Return a function which samples the service time, using the
+    distributions of 'sub.distributions' (the NumPy generator is seeded from
+    rng, so that the estimates only depend on 'seed').
+    """
+    if dist_params is None:
+        dist_params = {}
+    return Sampler(
+        serv_type, serv_t, np.random.default_rng(rng.getrandbits(32)), **dist_params
+    )
+
+
+def checkLevels(thresholds, split, min_value, max_value):
+    """
+    checkLevels
+    ---
+    Validate the splitting thresholds and return the list of splitting
+    factors (one per threshold).
+    """
+    if any(b <= a for a, b in zip(thresholds[:-1], thresholds[1:])):
+        raise ValueError("The splitting thresholds must be strictly increasing!")
+    if thresholds[0] < min_value or thresholds[-1] > max_value:
+        raise ValueError(
+            f"The splitting thresholds must be in [{min_value}, {max_value}]!"
+        )
+
+    if isinstance(split, int):
+        split = [split] * len(thresholds)
+    elif len(split) != len(thresholds):
+        raise ValueError("One splitting factor per threshold is needed!")
+    if any(r < 1 for r in split):
+        raise ValueError("The splitting factors must be >= 1!")
+
+    return list(split)
+
+
+def ratioConfInt(X, Y, conf_level):
+    """
+    ratioConfInt
+    ---
+    Evaluate the ratio estimator sum(X)/sum(Y) over i.i.d. regeneration cycles,
+    together with its confidence interval (delta method).
+    """
+    X = np.asarray(X)
+    Y = np.asarray(Y)
+    n = len(X)
+    ratio = X.sum() / Y.sum()
+    if n < 2:
+        return ratio, (np.nan, np.nan)
+
+    # Z_i = X_i - ratio * Y_i has zero mean; its std gives the std of the ratio
+    std_err = np.std(X - ratio * Y, ddof=1) / (np.mean(Y) * np.sqrt(n))
+    if std_err == 0:
+        return ratio, (ratio, ratio)
+
+    return ratio, t.interval(conf_level, n - 1, ratio, std_err)
+
+
+def lossProbSplitting(
+    serv_t,
+    arr_t,
+    queue_len,
+    n_server=1,
+    thresholds=None,
+    split=2,
+    serv_type="constant",
+    dist_params=None,
+    n_cycles=10000,
+    max_events=None,
+    conf_level=0.99,
+    seed=1,
+):
+    """
+    lossProbSplitting
+    ---
+    Estimate the loss probability (countLosses/arr) of a finite buffer queue by
+    means of importance splitting (RESTART-like thresholds on the number of users).
+
+    The simulation is divided into regeneration cycles, each one starting with an
+    arrival in the empty system. When a trajectory reaches the threshold
+    'thresholds[i]' it is cloned into 'split[i]' copies, each one carrying a
+    fraction 1/split[i] of the weight; when a copy goes back below the threshold
+    it is kept with probability 1/split[i] (and its weight is restored), else it
+    is discarded (Russian roulette).
+    Losses and arrivals are counted with the weight of the trajectory, so that the
+    estimates are unbiased, while the trajectories close to the full buffer are
+    explored many more times than in a plain simulation.
+
+    ### Input parameters
+    - serv_t: average service time (1/serv_rate)
+    - arr_t: average inter-arrival time (1/arr_rate)
+    - queue_len: maximum number of clients in the system (must be finite)
+    - n_server: number of servers
+    - thresholds: increasing list of occupancy levels at which trajectories are
+    split; default: all levels between n_server + 1 and queue_len - 1
+    - split: splitting factor (int) or list of splitting factors (one per
+    threshold); a good choice is about 1/p, being p the probability to reach
+    the next threshold
+    - serv_type: service time distribution (see 'sub.distributions')
+    - dist_params: dict of shape parameters of the service time distribution
+    - n_cycles: number of regeneration cycles to be simulated
+    - max_events: if not None, stop as soon as this number of events is processed
+    - conf_level: confidence level of the returned interval
+    - seed: seed of the random number generator
+
+    ### Output parameters
+    - results: dict containing the loss probability estimate ('loss_prob'), its
+    confidence interval ('conf_int'), the number of simulated cycles ('n_cycles')
+    and the number of processed events ('n_events')
+    """
+    if queue_len is None:
+        raise ValueError("The loss probability is null if the queue is infinite!")
+    if n_server is None:
+        raise ValueError("The loss probability is null if the servers are unlimited!")
+
+    queue_len = max(queue_len, n_server)
+
+    if thresholds is None:
+        thresholds = list(range(max(n_server + 1, 2), queue_len))
+
+    if len(thresholds) > 0:
+        # The cycles start with 1 user, so the first threshold must be above it
+        split = checkLevels(thresholds, split, 2, queue_len)
+    else:
+        # No room for splitting - plain regenerative simulation
+        split = []
+    n_levels = len(thresholds)
+
+    rng = random.Random(seed)
+    serv = servSampler(serv_type, serv_t, rng, dist_params)
+    arr_rate = 1.0 / arr_t
+
+    X = []  # Weighted losses in each cycle
+    Y = []  # Weighted arrivals in each cycle
+    n_events = 0
+
+    while len(X) < n_cycles and (max_events is None or n_events < max_events):
+        # First arrival of the cycle (time 0, empty system)
+        root = Trajectory(1, rng.expovariate(arr_rate), [serv()])
+        losses = 0.0
+        arrivals = 1.0
+        n_events += 1
+
+        stack = [root]
+        while stack:
+            tr = stack.pop()
+            while True:
+                if len(tr.departures) > 0 and tr.departures[0] < tr.next_arr:
+                    # Departure
+                    time = heapq.heappop(tr.departures)
+                    n_events += 1
+                    tr.users -= 1
+                    if tr.users >= n_server:
+                        # Serve the next client in the line
+                        heapq.heappush(tr.departures, time + serv())
+
+                    if tr.level > 0 and tr.users < thresholds[tr.level - 1]:
+                        # Russian roulette when going back below the threshold
+                        tr.level -= 1
+                        if rng.random() * split[tr.level] >= 1:
+                            break
+                        tr.weight *= split[tr.level]
+                else:
+                    # Arrival
+                    time = tr.next_arr
+                    if tr.users == 0:
+                        # Regeneration point - end of the cycle for this trajectory
+                        break
+                    n_events += 1
+                    arrivals += tr.weight
+                    tr.next_arr = time + rng.expovariate(arr_rate)
+
+                    if tr.users >= queue_len:
+                        losses += tr.weight
+                    else:
+                        tr.users += 1
+                        if tr.users <= n_server:
+                            heapq.heappush(tr.departures, time + serv())
+
+                        if tr.level < n_levels and tr.users >= thresholds[tr.level]:
+                            # Split the trajectory
+                            r = split[tr.level]
+                            tr.level += 1
+                            tr.weight /= r
+                            for i in range(r - 1):
+                                stack.append(tr.clone())
+
+        X.append(losses)
+        Y.append(arrivals)
+
+    loss_prob, conf_int = ratioConfInt(X, Y, conf_level)
+
+    return {
+        "loss_prob": loss_prob,
+        "conf_int": conf_int,
+        "n_cycles": len(X),
+        "n_events": n_events,
+    }
@@ -1,4 +1,4 @@
-import matplotlib.pyplot as plt
+from sub.rendering import plt, FigureJobs
 import numpy as np
 
 
@@ -14,7 +14,20 @@ def printResults(
     MM_system,
     SIM_TIME,
     img_path,
+    parallel=False,
+    n_proc=None,
 ):
+    """
+    printResults
+    ---
+    Print the measurements of a run and produce the figures.
+
+    ### Input parameters
+    - parallel: if True, only the figures saved in 'img_path' are produced,
+    rendered headless in a pool of 'n_proc' processes (see
+    'sub.rendering.FigureJobs'); else all of them are drawn (and shown) in order
+    - n_proc: number of processes (default: number of CPUs)
+    """
     print(
         "******************************************************************************"
     )
@@ -80,6 +93,11 @@ def printResults(
             print(
                 f"> Server {i+1} - cumulative service time: {data.serv_busy[i]['cumulative_time']}"
             )
+    else:
+        # Infinitely many servers - only the total busy time is measured
+        print(
+            f"\nAverage number of busy servers: {data.serv_busy[0]['cumulative_time']/time}"
+        )
 
     print(
         "******************************************************************************"
@@ -96,40 +114,77 @@ def printResults(
         n_c = str(queue_len)
     fileinfo = f"{n_s}_serv_{n_c}_queue"
 
+    # Figures saved to file: (method of 'data', arguments)
+    figures = [
+        ("plotUsrInTime", {"img_name": img_path + "usr_time_" + fileinfo + ".png"}),
+        (
+            "queuingDelayHist",
+            {
+                "mean_value": True,
+                "img_name": img_path + "hist_delay_" + fileinfo + ".png",
+            },
+        ),
+        (
+            "plotQueuingDelays",
+            {"img_name": img_path + "delay_time_" + fileinfo + ".png"},
+        ),
+        (
+            "plotServUtilDelay",
+            {
+                "sim_time": SIM_TIME,
+                "policy": "first_idle",
+                "img_name": img_path + "serv_util_" + fileinfo + ".png",
+            },
+        ),
+        (
+            "plotArrivalsHist",
+            {
+                "mean_value": True,
+                "img_name": img_path + "inter_arr_" + fileinfo + ".png",
+            },
+        ),
+        (
+            "plotServiceTimeHist",
+            {
+                "mean_value": True,
+                "img_name": img_path + "serv_time_" + fileinfo + ".png",
+            },
+        ),
+        (
+            "waitingDelayHist",
+            {
+                "zeros": True,
+                "mean_value": True,
+                "img_name": img_path + "wait_delay_" + fileinfo + ".png",
+            },
+        ),
+        (
+            "waitingDelayHist",
+            {
+                "zeros": False,
+                "mean_value": False,
+                "img_name": img_path + "wait_delay_no_zero_" + fileinfo + ".png",
+            },
+        ),
+    ]
+
+    if parallel:
+        jobs = FigureJobs()
+        for method, kwargs in figures:
+            jobs.add(data, method, **kwargs)
+        jobs.render(n_proc)
+        return
+
     data.queuingDelayHist()
     data.waitingDelayHist()
     data.plotQueuingDelays()
     data.plotServUtilDelay(sim_time=SIM_TIME, policy=server_policy)
 
-    data.plotUsrInTime(img_name=img_path + "usr_time_" + fileinfo + ".png")
-    data.queuingDelayHist(
-        mean_value=True, img_name=img_path + "hist_delay_" + fileinfo + ".png"
-    )
-    data.plotQueuingDelays(img_name=img_path + "delay_time_" + fileinfo + ".png")
-    data.plotServUtilDelay(
-        sim_time=SIM_TIME,
-        policy="first_idle",
-        img_name=img_path + "serv_util_" + fileinfo + ".png",
-    )
-    data.plotArrivalsHist(
-        mean_value=True, img_name=img_path + "inter_arr_" + fileinfo + ".png"
-    )
-    data.plotServiceTimeHist(
-        mean_value=True, img_name=img_path + "serv_time_" + fileinfo + ".png"
-    )
-    data.waitingDelayHist(
-        zeros=True,
-        mean_value=True,
-        img_name=img_path + "wait_delay_" + fileinfo + ".png",
-    )
-    data.waitingDelayHist(
-        zeros=False,
-        mean_value=False,
-        img_name=img_path + "wait_delay_no_zero_" + fileinfo + ".png",
-    )
+    for method, kwargs in figures:
+        getattr(data, method)(**kwargs)
 
 
-def plotArrivalRate(arr_t_list, data_list, param):
+def plotArrivalRate(arr_t_list, data_list, param, analytic=None):
     """
     - arr_t_list: list of arrival rates on x-axis
     - data_list: list of object data to get desired metrics
@@ -137,6 +192,9 @@ def plotArrivalRate(arr_t_list, data_list, param):
         - param[0]: queue lenght
         - param[1]: number of servers
         - param[2]: service time
+    - analytic: if provided, dict of theoretical metrics evaluated on arr_t_list
+    (see 'analytic.mmck'), overlaid as dashed lines; meaningful only if the
+    runs use exponential service times
     """
     # plots for number of packets
     plt.figure()
@@ -186,6 +244,8 @@ def plotArrivalRate(arr_t_list, data_list, param):
         [data.delay / data.dep for data in data_list],
         label="Average delay",
     )
+    if analytic is not None:
+        plotAnalyticDelays([1.0 / x for x in arr_t_list], analytic)
     plt.legend()
     plt.ylabel("waiting delay [s]")
     plt.xlabel("arrival rate [1/s]")
@@ -193,7 +253,7 @@ def plotArrivalRate(arr_t_list, data_list, param):
     plt.show()
 
 
-def plotQueueLen(queue_len_list, data_list, param):
+def plotQueueLen(queue_len_list, data_list, param, analytic=None):
     """
     - queue_len_list: list of queue length on x-axis
     - data_list: list of object data to get desired metrics
@@ -201,6 +261,9 @@ def plotQueueLen(queue_len_list, data_list, param):
         - param[0]: arrival time
         - param[1]: number of servers
         - param[2]: service time
+    - analytic: if provided, dict of theoretical metrics evaluated on queue_len_list
+    (see 'analytic.mmck'), overlaid as dashed lines; meaningful only if the
+    runs use exponential service times
     """
     # waitingDelay_no_zeros control for empty list
     # for data in data_list:
@@ -260,6 +323,8 @@ def plotQueueLen(queue_len_list, data_list, param):
         [data.delay / data.dep for data in data_list],
         label="Average delay",
     )
+    if analytic is not None:
+        plotAnalyticDelays(queue_len_list, analytic)
     plt.legend()
     plt.ylabel("waiting delay [s]")
     plt.xlabel("queue length")
@@ -269,6 +334,27 @@ def plotQueueLen(queue_len_list, data_list, param):
     plt.show()
 
 
+def plotAnalyticDelays(x_values, analytic):
+    """
+    Overlay the theoretical delays on the current figure, using the same colors
+    as the simulated curves of 'plotArrivalRate' and 'plotQueueLen'.
+
+    - x_values: values on the x-axis
+    - analytic: dict of theoretical metrics (see 'analytic.mmck')
+    """
+    plt.plot(
+        x_values,
+        analytic["wait_no_zeros"],
+        "--",
+        color="C0",
+        label="M/M/c/K waiting delay (only waiting)",
+    )
+    plt.plot(
+        x_values, analytic["wait"], "--", color="C1", label="M/M/c/K waiting delay"
+    )
+    plt.plot(x_values, analytic["delay"], "--", color="C2", label="M/M/c/K delay")
+
+
 def plotConfInter(
     metric_name, n_iter, conf_level, intervals, metric_cf_mean, arr_t_list
 ):
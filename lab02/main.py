@@ -1,11 +1,27 @@
 from sub.micro_data_center import MicroDataCenter
 from sub.cloud_data_center import CloudDataCenter
+from sub.splitting import cdcLossSplitting
+from sub.ctmc import solveTandem, transientTandem
+from sub.decomposition import decompose, tandemNodes
+from sub.search import stochasticBisection, monotoneIntSearch, replicationSeeds
+from sub.analytic import mmck
+from sub.optimizer import optimizeServers
+from sub.server import Server
+from sub.records import PacketHandles
+from sub.arrivals import NHPP, RateProfile, stepProfile
+from sub.profiling import RunProfile
+from sub.checkpoint import saveCheckpoint, loadCheckpoint
+from sub.network import fanInNetwork
+from functools import partial
+import multiprocessing as mp
+import copy
 import random
 import numpy as np
-import matplotlib.pyplot as plt
+from sub.rendering import plt, FigureJobs
 import scipy.stats as st
 from queue import Queue, PriorityQueue
 import time as tm
+import os
 
 DEBUG = False
 
@@ -18,6 +34,12 @@ task_4a = True
 task_4b = False
 task_4c = False
 task_4d = False
+rare_loss_cdc = False  # Importance splitting for small CDC loss probabilities
+use_ctmc = True  # Overlay the exact (CTMC) results on the task 2 plots
+use_transient = True  # Overlay the exact (uniformization) trajectories on task 4a
+screen_decomposition = False  # Analytic screening of the task 4c/4d configurations
+parallel_rendering = False  # Render the saved figures in a pool of processes
+fan_in = False  # Many micro data centers feeding one cloud data center
 
 T_q = 50  # thresh of maximum average queuing time for pkt A
 
@@ -56,7 +78,7 @@ DEPARTURES:
 """
 
 
-def printResults(sim_time, mdc, cdc, plots=False):
+def printResults(sim_time, mdc, cdc, plots=False, parallel=False):
     """
     printResults
     ---
@@ -70,22 +92,40 @@ def printResults(sim_time, mdc, cdc, plots=False):
     - mdc: 'MicroDataCenter' class object
     - cdc: 'CloudDataCenter' class object
     - plots: bool to choose whether to display figures (plots) or not
+    - parallel: if True, the figures of the 'Measure' objects which are saved to
+    file are rendered headless in a pool of processes (see
+    'sub.rendering.FigureJobs') and the ones which are only displayed are
+    skipped
     """
+    jobs = FigureJobs(skip=("records", "e2e")) if parallel else None
+
+    def draw(data, method, **kwargs):
+        # Plot now, or schedule the figure if it is saved (parallel rendering)
+        if jobs is None:
+            getattr(data, method)(**kwargs)
+        elif kwargs.get("img_name") is not None:
+            jobs.add(data, method, **kwargs)
+
     # Task 1(version A). Analysis of the waiting delay
     if task_1:
-        cdc.data.waitingDelayHist(
+        draw(
+            cdc.data,
+            "waitingDelayHist",
             zeros=True,
             mean_value=True,
             img_name="images/task1_wait_delays_hist_cdc.png",
         )
 
         ## Plot moving average of the waiting delay (CDC only)
-        cdc.data.avgWaitDelayInTime(img_name="images/task1_average_wait_cdc.png")
+        draw(
+            cdc.data,
+            "avgWaitDelayInTime",
+            img_name="images/task1_average_wait_cdc.png",
+        )
 
-        avg_wait_del_time = [
-            sum(cdc.data.waitingDelaysList[:i]) / (i)
-            for i in range(1, len(cdc.data.waitingDelaysList))
-        ]
+        # Average of the first i values, i = 1, ..., n-1
+        wait_del = np.asarray(cdc.data.waitingDelaysList, dtype=float)
+        avg_wait_del_time = np.cumsum(wait_del)[:-1] / np.arange(1, len(wait_del))
 
         ### Removing warm-up transient
         # Evaluate mean of waiting delay and then find point in which relative variation becomes low
@@ -94,10 +134,9 @@ def printResults(sim_time, mdc, cdc, plots=False):
         avg_time_avg_wait_del = np.mean(avg_wait_del_time)
 
         # Evaluate the mean having removed the first 'k' samples
-        avg_wait_rem_samples = [
-            sum(avg_wait_del_time[i:]) / (len(avg_wait_del_time) - i)
-            for i in range(1, len(avg_wait_del_time))
-        ]
+        tail_sums = np.cumsum(avg_wait_del_time[::-1])[::-1]
+        n_avg = len(avg_wait_del_time)
+        avg_wait_rem_samples = tail_sums[1:] / (n_avg - np.arange(1, n_avg))
 
         relative_distance = (avg_wait_del_time - avg_wait_del) / avg_wait_del
 
@@ -144,8 +183,8 @@ def printResults(sim_time, mdc, cdc, plots=False):
             plt.savefig("images/task1_transient_location.png", dpi=300)
             plt.show()
 
-            cdc.data.plotUsrInTime()
-            cdc.data.plotUsrMovingAvg()
+            draw(cdc.data, "plotUsrInTime")
+            draw(cdc.data, "plotUsrMovingAvg")
 
         print(f"The initial transient ends at time t = {end_of_transient_time}")
 
@@ -164,14 +203,20 @@ def printResults(sim_time, mdc, cdc, plots=False):
         if task_4a:
             # mdc.data.plotLossesMovingAvg()
             # cdc.data.plotLossesMovingAvg()
-            mdc.data.plotLossesInTime(img_name="lab02/images/mdc_lossTime.png")
-            cdc.data.plotLossesInTime(img_name="lab02/images/cdc_lossTime.png")
-
-            mdc.data.plotUsrInTime(
-                mean_value=True, img_name="lab02/images/mdc_usrTime.png"
+            draw(mdc.data, "plotLossesInTime", img_name="lab02/images/mdc_lossTime.png")
+            draw(cdc.data, "plotLossesInTime", img_name="lab02/images/cdc_lossTime.png")
+
+            draw(
+                mdc.data,
+                "plotUsrInTime",
+                mean_value=True,
+                img_name="lab02/images/mdc_usrTime.png",
             )
-            cdc.data.plotUsrInTime(
-                mean_value=True, img_name="lab02/images/cdc_usrTime.png"
+            draw(
+                cdc.data,
+                "plotUsrInTime",
+                mean_value=True,
+                img_name="lab02/images/cdc_usrTime.png",
             )
         if task_4b:
             print(
@@ -200,79 +245,157 @@ def printResults(sim_time, mdc, cdc, plots=False):
             print(f"  - Total cost, CDC: {cdc.data.tot_serv_costs}")
 
             # 4.c - maximum queuing delay, packets A
-            total_queuing_delays_A = {}
-            for id in mdc.data.delay_pkt_A.keys():
-                if id in cdc.data.delay_pkt_A:
-                    total_queuing_delays_A[id] = (
-                        mdc.data.delay_pkt_A[id] + cdc.data.delay_pkt_A[id]
-                    )
-                else:
-                    total_queuing_delays_A[id] = mdc.data.delay_pkt_A[id]
-
-            max_queuing_delay_A = max(total_queuing_delays_A.values())
-
-        print(f"Maximum queuing delay, packets A: {max_queuing_delay_A}")
-        print(
-            f"Loss probability, packets A: {(cdc.data.countLosses_A +mdc.data.countLosses_A)/(cdc.data.arr + mdc.data.arr) }"
-        )
+            delays_A = totalDelays(mdc.data, cdc.data, "A")
+            print(f"Maximum queuing delay, packets A: {np.max(delays_A)}")
+            print(
+                f"99th percentile of the delay, packets A: {np.quantile(delays_A, 0.99)}"
+            )
+            print(
+                f"Loss probability, packets A: {(cdc.data.countLosses_A +mdc.data.countLosses_A)/(cdc.data.arr + mdc.data.arr) }"
+            )
 
-        total_queuing_delays_B = {}
-        for id in mdc.data.delay_pkt_B.keys():
-            if id in cdc.data.delay_pkt_B:
-                total_queuing_delays_B[id] = (
-                    mdc.data.delay_pkt_B[id] + cdc.data.delay_pkt_B[id]
-                )
-            else:
-                total_queuing_delays_B[id] = mdc.data.delay_pkt_B[id]
+            delays_B = totalDelays(mdc.data, cdc.data, "B")
+            print(f"Maximum queuing delay, packets B: {np.max(delays_B)}")
+            print(
+                f"99th percentile of the delay, packets B: {np.quantile(delays_B, 0.99)}"
+            )
+            print(
+                f"Loss probability, packets B: {(cdc.data.countLosses_B +mdc.data.countLosses_B)/(cdc.data.arr + mdc.data.arr) }"
+            )
 
-        max_queuing_delay_B = max(total_queuing_delays_B.values())
-
-        print(f"Maximum queuing delay, packets B: {max_queuing_delay_B}")
-        print(
-            f"Loss probability, packets B: {(cdc.data.countLosses_B +mdc.data.countLosses_B)/(cdc.data.arr + mdc.data.arr) }"
-        )
+    if jobs is not None:
+        jobs.render()
 
     return mdc.data, cdc.data
 
 
-def run(
+def totalDelays(mdc_data, cdc_data, pkt_type="A"):
+    """
+    totalDelays
+    ---
+    Return the array of the end-to-end delays (from the generation to the
+    final departure, including the propagation to the cloud) of the packets of
+    the specified type, given the 'Measure' objects of the two data centers.
+    """
+    return np.concatenate(
+        [mdc_data.e2e.delays(pkt_type), cdc_data.e2e.delays(pkt_type)]
+    )
+
+
+def delayQuantileEval(
+    param, sim_time, quantile=0.99, transform=None, n_events=None, **kwargs
+):
+    """
+    delayQuantileEval
+    ---
+    Build the function (x, seed) -> quantile of the total delay of type A
+    packets, obtained by running one replication with the parameter 'param' of
+    'run' set to x, as needed by the search procedures in 'sub.search'.
+
+    ### Input parameters
+    - param: name of the parameter of 'run' (e.g., 'n_serv_1', 'q1_len')
+    - sim_time: simulation time of each replication
+    - quantile: quantile of the delay (1 -> maximum delay)
+    - transform: function applied to x before passing it to 'run' (e.g., to
+    search on the service rate while 'run' expects the service time)
+    - n_events: if a list is passed, the number of processed arrivals and
+    departures is accumulated in its first element
+    - kwargs: other (fixed) parameters of 'run'
+    """
+
+    def evaluate(x, seed):
+        random.seed(seed)
+        kwargs[param] = x if transform is None else transform(x)
+        res_mdc, res_cdc = run(sim_time, **kwargs)
+        if n_events is not None:
+            n_events[0] += res_mdc.arr + res_mdc.dep + res_cdc.arr + res_cdc.dep
+        return np.quantile(totalDelays(res_mdc, res_cdc), quantile)
+
+    return evaluate
+
+
+def evalServerConfig(serv_t_2, sim_time, seed, quantile=0.99, **kwargs):
+    """
+    evalServerConfig
+    ---
+    Run one replication with the cloud server types 'serv_t_2' and return the
+    tuple (CDC operational cost, quantile of the total delay of type A packets),
+    as needed by 'optimizeServers'. The other parameters of 'run' are passed in
+    kwargs.
+    """
+    random.seed(seed)
+    res_mdc, res_cdc = run(
+        sim_time, serv_t_2=serv_t_2, n_serv_2=len(serv_t_2), server_costs=True, **kwargs
+    )
+    return res_cdc.tot_serv_costs, np.quantile(totalDelays(res_mdc, res_cdc), quantile)
+
+
+def screenServerConfig(
+    serv_t_2, sim_time, fract, arr_t, serv_t_1, q1_len, n_serv_1, q2_len
+):
+    """
+    screenServerConfig
+    ---
+    Analytic screening of the cloud server types 'serv_t_2' for
+    'optimizeServers': the CDC throughput is estimated with the decomposition
+    approximation, and the cheapest server (as given by 'evalServerCost')
+    serving all the packets gives a lower bound on the cost; the mean delay of
+    type A packets estimates (by defect) the delay quantile.
+    """
+    res = decompose(
+        tandemNodes(serv_t_1, q1_len, n_serv_1, serv_t_2, q2_len, len(serv_t_2)),
+        fract,
+        arr_t=arr_t,
+    )
+    throughput = res["nodes"][1]["arr_rate"] * (1 - res["nodes"][1]["loss"])
+    costs = Server(len(serv_t_2), serv_t_2, costs=True).evalServerCost()
+    return {
+        "cost": throughput * min(costs) * sim_time,
+        "delay": res["A"]["delay_us"],
+    }
+
+
+def buildNetwork(
     sim_time,
     fract,
-    arr_t=10.0,
-    serv_t_1=3.0,
-    q1_len=10,
-    n_serv_1=1,
-    serv_t_2=5.0,
-    q2_len=20,
-    n_serv_2=1,
-    server_costs=False,
-    results=False,
-    plots=False,
+    arr_t,
+    serv_t_1,
+    q1_len,
+    n_serv_1,
+    serv_t_2,
+    q2_len,
+    n_serv_2,
+    server_costs,
+    serv_dist,
+    dist_params,
+    records_dir,
+    server_policy,
 ):
     """
-    Run
+    buildNetwork
     ---
-    Launch simulation of the queuing system, lab 2.
+    Create the FES and the two data centers of a run (see 'run' for the input
+    parameters) and schedule the first arrival.
 
-    ### Paramaters
-
-    - sim_time: simulation time
-    - fract: fraction of packets of type B
-    - arr_t: average inter-arrival time, queue 1
-    - serv_t_1: average service time, queue 1
-    - q1_len: length of queue 1
-    - n_serv_1: number of servers, queue 1
-    - serv_t_1: average service time, queue 2
-    - q2_len: length of queue 2
-    - n_serv_2: number of servers, queue 2
-    - results: bool to choose whether to print the results (stdout) or not
-    - plots: bool to choose whether to display the plots or not
+    ### Output parameters
+    - FES: future event set
+    - MDC, CDC: 'MicroDataCenter' and 'CloudDataCenter' objects
     """
     FES = PriorityQueue()
 
-    # control if there are more service rate during the simulation
-    # and split the simulation proportionally to the no. of service
-    # rates
+    # Time-varying arrival rate: non-homogeneous Poisson process
+    if isinstance(arr_t, list):
+        arr_t = stepProfile(arr_t, sim_time)
+    if isinstance(arr_t, RateProfile):
+        arr_t = NHPP(arr_t)
+
+    # Packet handles, shared by the two data centers
+    handles = PacketHandles()
+
+    records_path = {"mdc": None, "cdc": None}
+    if records_dir is not None:
+        for key in records_path:
+            records_path[key] = os.path.join(records_dir, f"{key}_records.bin")
 
     MDC = MicroDataCenter(
         serv_t=serv_t_1,
@@ -283,6 +406,12 @@ def run(
         costs=server_costs,
         fract=fract,
         in_transient=True,
+        serv_dist=serv_dist,
+        dist_params=dist_params,
+        stage=0,
+        records_path=records_path["mdc"],
+        handles=handles,
+        server_policy=server_policy,
     )
 
     CDC = CloudDataCenter(
@@ -294,32 +423,62 @@ def run(
         costs=server_costs,
         fract=fract,
         in_transient=True,
+        serv_dist=serv_dist,
+        dist_params=dist_params,
+        stage=1,
+        records_path=records_path["cdc"],
+        handles=handles,
+        server_policy=server_policy,
     )
 
-    # Pick at random the first packet given the fraction of B
-    type_pkt = MDC.rand_pkt_type(fract)
-
-    # Simulation time
-    if isinstance(arr_t, list):
-        step_time = sim_time / len(arr_t)
-        step_app = step_time
-        i = 0
-        MDC.arr_t = arr_t[i]
+    if hasattr(arr_t, "nextPacket"):
+        # Trace-driven arrivals - first record of the trace
+        first_arrival, type_pkt = arr_t.nextPacket()
     else:
-        step_time = sim_time
+        # Pick at random the first packet given the fraction of B
+        type_pkt = MDC.rand_pkt_type(fract)
+        first_arrival = arr_t.nextArrival() if hasattr(arr_t, "nextArrival") else 0
+
+    if first_arrival < float("inf"):
+        FES.put(
+            (
+                first_arrival,
+                ["arrival_micro", type_pkt, handles.register(first_arrival)],
+            )
+        )
 
-    time = 0
+    return FES, MDC, CDC
 
-    FES.put((0, ["arrival_micro", type_pkt, 0]))
 
-    while time < step_time:
-        # a = tm.time()
-        (time, event_type) = FES.get()
-        # b = tm.time()
-        # print(f"Time to extract last: {b-a}")
-        # print(f"Current time: {time} - event: {event_type}")
+def eventLoop(
+    time,
+    sim_time,
+    FES,
+    MDC,
+    CDC,
+    checkpoint_path=None,
+    checkpoint_every=None,
+    next_checkpoint=float("inf"),
+):
+    """
+    eventLoop
+    ---
+    Process the events of the FES from 'time' until 'sim_time' (or until the
+    FES is empty).
 
-        # tm.sleep(2)
+    ### Input parameters
+    - time: current simulated time
+    - sim_time: simulated time at which the loop stops
+    - FES: future event set
+    - MDC, CDC: data centers
+    - checkpoint_path, checkpoint_every: see 'run'
+    - next_checkpoint: simulated time of the next checkpoint
+
+    ### Output parameters
+    - time: time of the last processed event
+    """
+    while time < sim_time and not FES.empty():
+        time, event_type = FES.get()
 
         if event_type[0] == "arrival_micro":
             MDC.arrival(time, FES, event_type)
@@ -333,20 +492,353 @@ def run(
         elif event_type[0] == "departure_cloud":
             CDC.departure(time, FES, event_type)
 
-        if (
-            time > step_time and step_time < sim_time
-        ):  # check if the simulation is not finished
-            step_time += step_app
-            i += 1
-            MDC.arr_t = arr_t[i]
+        if time >= next_checkpoint:
+            while next_checkpoint <= time:
+                next_checkpoint += checkpoint_every
+            saveCheckpoint(checkpoint_path, time, next_checkpoint, FES, MDC, CDC)
+
+    return time
+
+
+def run(
+    sim_time,
+    fract,
+    arr_t=10.0,
+    serv_t_1=3.0,
+    q1_len=10,
+    n_serv_1=1,
+    serv_t_2=5.0,
+    q2_len=20,
+    n_serv_2=1,
+    server_costs=False,
+    serv_dist="expovariate",
+    dist_params=None,
+    records_dir=None,
+    server_policy="first_idle",
+    profile=False,
+    checkpoint_path=None,
+    checkpoint_every=None,
+    resume_from=None,
+    results=False,
+    plots=False,
+):
+    """
+    Run
+    ---
+    Launch simulation of the queuing system, lab 2.
+
+    ### Paramaters
+
+    - sim_time: simulation time
+    - fract: fraction of packets of type B
+    - arr_t: average inter-arrival time, queue 1; it can also be a list of
+    values, each one used for an equal fraction of sim_time, a 'RateProfile'
+    (non-homogeneous Poisson arrivals) or a 'TraceArrivals' object (arrival
+    times and packet types replayed from a trace file)
+    - serv_t_1: average service time, queue 1
+    - q1_len: length of queue 1
+    - n_serv_1: number of servers, queue 1
+    - serv_t_1: average service time, queue 2
+    - q2_len: length of queue 2
+    - n_serv_2: number of servers, queue 2
+    - server_costs: bool indicating whether server costs are to be used
+    - serv_dist: service time distribution of both data centers (see
+    'sub.distributions')
+    - dist_params: dict of shape parameters of the service time distribution
+    - records_dir: if not None, directory where the per-packet records of the
+    two data centers are spilled ('mdc_records.bin', 'cdc_records.bin', plus the
+    end-to-end records '*_records_e2e.bin')
+    - server_policy: policy for the choice of the server in both data centers
+    (see 'Server')
+    - profile: if True, the event loop is instrumented (see 'RunProfile') and
+    the profile is returned as third element; if False, the loop runs without
+    any instrumentation
+    - checkpoint_path: if not None, file where the state of the simulation is
+    saved every 'checkpoint_every' units of simulated time (see
+    'sub.checkpoint'; not allowed together with 'profile')
+    - checkpoint_every: interval between checkpoints (simulated time)
+    - resume_from: if not None, checkpoint file from which the run is resumed;
+    the run continues exactly as the interrupted one, up to 'sim_time' (the
+    parameters of the network are the ones stored in the checkpoint)
+    - results: bool to choose whether to print the results (stdout) or not
+    - plots: bool to choose whether to display the plots or not
+
+    ### Output parameters
+    - mdc_data, cdc_data: 'Measure' objects of the two data centers
+    - prof: 'RunProfile' object (only if 'profile' is True)
+    """
+    if (checkpoint_path is None) != (checkpoint_every is None):
+        raise ValueError("Both 'checkpoint_path' and 'checkpoint_every' are needed!")
+    if profile and checkpoint_path is not None:
+        raise ValueError("Checkpoints cannot be taken while profiling!")
+
+    if resume_from is not None:
+        time, next_checkpoint, FES, MDC, CDC = loadCheckpoint(resume_from)
+    else:
+        FES, MDC, CDC = buildNetwork(
+            sim_time,
+            fract,
+            arr_t,
+            serv_t_1,
+            q1_len,
+            n_serv_1,
+            serv_t_2,
+            q2_len,
+            n_serv_2,
+            server_costs,
+            serv_dist,
+            dist_params,
+            records_dir,
+            server_policy,
+        )
+        time = 0
+        next_checkpoint = checkpoint_every
+    if checkpoint_path is None:
+        next_checkpoint = float("inf")
+
+    prof = None
+    if profile:
+        prof = RunProfile()
+        prof.attach(MDC, "mdc")
+        prof.attach(CDC, "cdc")
+        prof.watchFES(FES)
+
+    if prof is not None:
+        prof.start()
+
+    time = eventLoop(
+        time,
+        sim_time,
+        FES,
+        MDC,
+        CDC,
+        checkpoint_path,
+        checkpoint_every,
+        next_checkpoint,
+    )
+
+    if prof is not None:
+        prof.stop(time)
 
     # Might be used later for returning the results in multi-run simulations
     if plots:
-        return printResults(sim_time, MDC, CDC, plots=True)
+        out = printResults(sim_time, MDC, CDC, plots=True, parallel=parallel_rendering)
     elif results:
-        return printResults(sim_time, MDC, CDC, plots=False)
+        out = printResults(sim_time, MDC, CDC, plots=False, parallel=parallel_rendering)
+    else:
+        out = (MDC.data, CDC.data)
+
+    if prof is not None:
+        return out + (prof,)
+    return out
+
+
+def reseedNetwork(MDC, CDC, seed):
+    """
+    reseedNetwork
+    ---
+    Start new random streams from the current state of the network: the
+    'random' module is seeded with 'seed' and the NumPy generators of the
+    service time samplers and of the arrival process (if it is a 'NHPP') are
+    replaced by new ones, seeded from the 'random' module.
+    """
+    random.seed(seed)
+    for dc in [MDC, CDC]:
+        for sampler in dc.servers.samplers:
+            sampler.reseed(random.getrandbits(32))
+    if hasattr(MDC.arr_t, "reseed"):
+        MDC.arr_t.reseed(random.getrandbits(32))
+
+
+# Snapshot of the network at the end of the warm-up, set in the workers of
+# 'warmStartReplications'
+warm_snapshot = None
+
+
+def setWarmSnapshot(snapshot):
+    """
+    setWarmSnapshot
+    ---
+    Initializer of the workers of 'warmStartReplications'.
+    """
+    global warm_snapshot
+    warm_snapshot = snapshot
+
+
+def warmReplication(seed, sim_time, evaluate, copy_state=False):
+    """
+    warmReplication
+    ---
+    Run one replication from the snapshot 'warm_snapshot' (see
+    'warmStartReplications'); the snapshot is modified by the run, unless
+    'copy_state' is True.
+    """
+    state = warm_snapshot
+    if copy_state:
+        state = copy.deepcopy(state)
+    time, fes, MDC, CDC = state
+    FES = PriorityQueue()
+    # The list is already a valid heap
+    FES.queue = fes
+    reseedNetwork(MDC, CDC, seed)
+    eventLoop(time, sim_time, FES, MDC, CDC)
+    if evaluate is None:
+        return MDC.data, CDC.data
+    return evaluate(MDC.data, CDC.data)
+
+
+def warmStartReplications(
+    n_rep, warmup_time, sim_time, fract, seed=1, n_proc=None, evaluate=None, **kwargs
+):
+    """
+    warmStartReplications
+    ---
+    Run the warm-up once and then 'n_rep' replications starting from the
+    state of the network at its end, each one with its own random streams
+    (see 'reseedNetwork'). The measurements of the warm-up are discarded
+    (see 'Queue.endTransient'), so the results refer to the period
+    [warmup_time, warmup_time + sim_time].
+
+    The replications are run in a pool of processes: with the 'fork' start
+    method, a new worker is forked for each replication and the snapshot is
+    shared copy-on-write; otherwise, it is pickled to the workers.
+
+    ### Input parameters
+    - n_rep: number of replications
+    - warmup_time: duration of the warm-up (simulated time)
+    - sim_time: duration of each replication after the warm-up
+    - fract: fraction of packets of type B (see 'run')
+    - seed: seed of the warm-up; the seeds of the replications are obtained
+    with 'replicationSeeds', so the results do not depend on 'n_proc'
+    - n_proc: number of processes (default: number of CPUs); if 1, the
+    replications are run sequentially in this process
+    - evaluate: function evaluate(mdc_data, cdc_data) applied to the 'Measure'
+    objects of each replication, in the worker; if None, the 'Measure' objects
+    are returned. It must be defined at module level
+    - kwargs: parameters of the network (see 'run'; 'records_dir' is not
+    supported, since the replications would share the files)
+
+    ### Output parameters
+    - results: list of the outputs of each replication
+    """
+    if kwargs.get("records_dir") is not None:
+        raise ValueError("Per-packet records cannot be spilled by the replications!")
+    params = dict(
+        arr_t=10.0,
+        serv_t_1=3.0,
+        q1_len=10,
+        n_serv_1=1,
+        serv_t_2=5.0,
+        q2_len=20,
+        n_serv_2=1,
+        server_costs=False,
+        serv_dist="expovariate",
+        dist_params=None,
+        records_dir=None,
+        server_policy="first_idle",
+    )
+    params.update(kwargs)
+    horizon = warmup_time + sim_time
+
+    random.seed(seed)
+    FES, MDC, CDC = buildNetwork(horizon, fract, **params)
+    time = eventLoop(0, warmup_time, FES, MDC, CDC)
+    MDC.endTransient(time)
+    CDC.endTransient(time)
+    snapshot = (time, list(FES.queue), MDC, CDC)
+
+    seeds = replicationSeeds(seed, n_rep)
+    if n_proc is None:
+        n_proc = os.cpu_count()
+    n_proc = min(n_proc, n_rep)
+    if n_proc <= 1:
+        setWarmSnapshot(snapshot)
+        try:
+            return [warmReplication(s, horizon, evaluate, True) for s in seeds]
+        finally:
+            setWarmSnapshot(None)
+
+    if "fork" in mp.get_all_start_methods():
+        ctx = mp.get_context("fork")
     else:
-        return 0
+        ctx = mp.get_context()
+    # One worker per replication: each one starts from an untouched snapshot
+    with ctx.Pool(
+        n_proc,
+        initializer=setWarmSnapshot,
+        initargs=(snapshot,),
+        maxtasksperchild=1,
+    ) as pool:
+        return pool.starmap(
+            warmReplication, [(s, horizon, evaluate) for s in seeds], chunksize=1
+        )
+
+
+def runFanIn(
+    sim_time,
+    n_sites,
+    fract,
+    arr_t=10.0,
+    serv_t_1=3.0,
+    q1_len=10,
+    n_serv_1=1,
+    serv_t_2=5.0,
+    q2_len=20,
+    n_serv_2=1,
+    serv_dist="expovariate",
+    dist_params=None,
+    results=False,
+):
+    """
+    runFanIn
+    ---
+    Simulate 'n_sites' micro data centers, each one with its own arrival
+    stream and fraction of B packets, forwarding to one cloud data center (see
+    'sub.network.fanInNetwork' for the parameters). The state of the sites is
+    kept in arrays by the network engine.
+
+    ### Output parameters
+    - res: measurements of 'Network.results'; the per-node arrays have the
+    sites first and the cloud data center last
+    """
+    net = fanInNetwork(
+        n_sites,
+        fract,
+        arr_t,
+        serv_t_1,
+        q1_len,
+        n_serv_1,
+        serv_t_2,
+        q2_len,
+        n_serv_2,
+        serv_dist,
+        dist_params,
+    )
+    res = net.run(sim_time)
+
+    if results:
+        sites = slice(0, n_sites)
+        fwd = res["overflows"][sites] / res["arrivals"][sites]
+        print(f"Sites: {n_sites}, simulation time: {sim_time}")
+        for name, values in [
+            ("Forwarded to the cloud (full MDC)", fwd),
+            ("MDC utilization", res["utilization"][sites]),
+            ("MDC average delay", res["avg_delay"][sites]),
+        ]:
+            print(
+                f"{name}: mean {np.nanmean(values):.4f}, min {np.nanmin(values):.4f},"
+                f" max {np.nanmax(values):.4f}"
+            )
+        print(
+            f"CDC: arrivals {res['arrivals'][-1]}, loss probability"
+            f" {res['loss_prob'][-1]:.4f}, utilization {res['utilization'][-1]:.4f},"
+            f" average delay {res['avg_delay'][-1]:.4f}"
+        )
+        for c, e2e in res["e2e"].items():
+            print(
+                f"End-to-end delay {c}: mean {e2e['mean']:.4f} ({e2e['count']} packets)"
+            )
+    return res
 
 
 ##################################################################
@@ -429,6 +921,24 @@ if __name__ == "__main__":
         plt.figure(figsize=(10, 5))
         plt.plot(q_lengths, avg_usr_mdc_a, "b", label="Micro Data Center")
         plt.plot(q_lengths, avg_usr_cdc_a, "r", label="Cloud Data Center")
+        if use_ctmc:
+            # Exact values (no propagation delay), same parameters as the runs
+            exact_a = [
+                solveTandem(fract, serv_t_1=10.0, q1_len=q, serv_t_2=15.0, q2_len=20)
+                for q in q_lengths
+            ]
+            plt.plot(
+                q_lengths,
+                [x["mdc"]["users"] for x in exact_a],
+                "b--",
+                label="MDC (CTMC)",
+            )
+            plt.plot(
+                q_lengths,
+                [x["cdc"]["users"] for x in exact_a],
+                "r--",
+                label="CDC (CTMC)",
+            )
         plt.legend()
         plt.grid()
         plt.title("Average number of users in both queues vs. queue 1 (MDC) size")
@@ -478,6 +988,23 @@ if __name__ == "__main__":
         plt.figure(figsize=(10, 5))
         plt.plot(q_lengths, avg_usr_mdc_b, "b", label="Micro Data Center")
         plt.plot(q_lengths, avg_usr_cdc_b, "r", label="Cloud Data Center")
+        if use_ctmc:
+            exact_b = [
+                solveTandem(fract, serv_t_1=10.0, q1_len=10, serv_t_2=15.0, q2_len=q)
+                for q in q_lengths
+            ]
+            plt.plot(
+                q_lengths,
+                [x["mdc"]["users"] for x in exact_b],
+                "b--",
+                label="MDC (CTMC)",
+            )
+            plt.plot(
+                q_lengths,
+                [x["cdc"]["users"] for x in exact_b],
+                "r--",
+                label="CDC (CTMC)",
+            )
         plt.legend()
         plt.grid()
         plt.title("Average number of users in both queues vs. queue 2 (CDC) size")
@@ -547,68 +1074,110 @@ if __name__ == "__main__":
 
         # a) Find min serv rate to reduce delay A below T_q
         print("+------------------ Task a ------------------+")
-        serv_r_list = np.arange(0.1, 0.8, 0.1)
-        min_found = False
-        delay_list = []
-        for serv_r in serv_r_list:
-            res_mdc, res_cdc = run(sim_time, fract, serv_t_1=1.0 / serv_r, results=True)
-
-            res_mdc.delay_pkt_A
-            total_queuing_delays_A = {}
-            for id in res_mdc.delay_pkt_A.keys():
-                if id in res_cdc.delay_pkt_A:
-                    total_queuing_delays_A[id] = (
-                        res_mdc.delay_pkt_A[id] + res_cdc.delay_pkt_A[id]
-                    )
-                else:
-                    total_queuing_delays_A[id] = res_mdc.delay_pkt_A[id]
-            max_queuing_delay_A = max(total_queuing_delays_A.values())
-            delay_list.append(max_queuing_delay_A)
-            if max_queuing_delay_A < T_q and not min_found:
-                print(f"\nMinimum service rate is {serv_r}\n")
-                min_found = True
+        # The quantile of the delay of A packets is compared with T_q (1 -> max);
+        # each point is evaluated with short independent replications, using the
+        # same seeds at all service rates (common random numbers). The points
+        # close to T_q stop at max_rep replications: at most ~0.3M events,
+        # against ~1M of the 7-point grid with sim_time=500000
+        delay_quantile = 0.99
+        search_sim_time = 20000
+        n_events = [0]
+
+        quantileDelayA = delayQuantileEval(
+            "serv_t_1",
+            search_sim_time,
+            quantile=delay_quantile,
+            transform=lambda serv_r: 1.0 / serv_r,
+            n_events=n_events,
+            fract=fract,
+        )
+        res_search = stochasticBisection(
+            quantileDelayA,
+            lo=0.1,
+            hi=0.8,
+            target=T_q,
+            precision=0.01,
+            n_rep=5,
+            max_rep=10,
+        )
+        print(
+            f"\nMinimum service rate is {res_search['x']:.3f}",
+            f"(interval: [{res_search['interval'][0]:.3f}, {res_search['interval'][1]:.3f}])",
+        )
+        print(f"Runs: {res_search['n_runs']} - events: {n_events[0]}\n")
+
+        points = sorted(res_search["points"], key=lambda p: p["x"])
         plt.figure()
         plt.title(f"Min serv_r to reduce delay_A below T_q={T_q}")
         plt.grid()
-        plt.ylabel("Max delay_A")
+        plt.ylabel(f"{delay_quantile} quantile of delay_A")
         plt.xlabel("serv_rate")
         plt.axhline(T_q, linestyle="--")
-        plt.plot(list(serv_r_list), delay_list)
+        plt.errorbar(
+            [p["x"] for p in points],
+            [p["mean"] for p in points],
+            yerr=[
+                [p["mean"] - p["conf_int"][0] for p in points],
+                [p["conf_int"][1] - p["mean"] for p in points],
+            ],
+            fmt="o-",
+            capsize=3,
+        )
+        plt.axvline(res_search["x"], color="k", linestyle=":")
         plt.savefig("lab02/images/serv_r_T_q.png", dpi=300)
 
         # b) Find min no. of edge nodes to reduce delay A below T_q
         print("+------------------ Task b ------------------+")
-        n_serv_list = range(1, 15)
-        min_found = False
-        delay_list = []
-        for n_serv in n_serv_list:
-            res_mdc, res_cdc = run(
-                sim_time, fract, n_serv_1=n_serv, serv_t_1=8.0, results=True
+        # Same approach as a); the delay is monotone in the number of servers, so
+        # galloping + binary search is used, skipping the values for which the
+        # mean MDC delay (M/M/c/K) alone is already above T_q
+        n_events = [0]
+        search_cache = {}
+        quantileDelayA = delayQuantileEval(
+            "n_serv_1",
+            search_sim_time,
+            quantile=delay_quantile,
+            n_events=n_events,
+            fract=fract,
+            serv_t_1=8.0,
+        )
+        res_search = monotoneIntSearch(
+            quantileDelayA,
+            target=T_q,
+            start=1,
+            stop=15,
+            bound=lambda n: mmck(10.0, 8.0, n, 10)["delay"],
+            cache=search_cache,
+        )
+        if res_search["x"] is None:
+            print("\nNo number of edges below 15 satisfies the constraint")
+        else:
+            print(
+                f"\nMinimum no. of edges is {res_search['x']}",
+                "(significant)" if res_search["confident"] else "(not significant)",
             )
-            total_queuing_delays_A = {}
-            for id in res_mdc.delay_pkt_A.keys():
-                if id in res_cdc.delay_pkt_A:
-                    total_queuing_delays_A[id] = (
-                        res_mdc.delay_pkt_A[id] + res_cdc.delay_pkt_A[id]
-                    )
-                else:
-                    total_queuing_delays_A[id] = res_mdc.delay_pkt_A[id]
-
-            max_queuing_delay_A = max(total_queuing_delays_A.values())
-            delay_list.append(max_queuing_delay_A)
-            # delay_A = (res_cdc.delay_A + res_mdc.delay_A) / (res_cdc.dep + res_mdc.dep)
-            # delay_list.append(delay_A)
-            if max_queuing_delay_A < T_q and not min_found:
-                print(f"\nMinimum no. of edges is {n_serv}")
-                min_found = True
+        print(
+            f"Runs: {res_search['n_runs']} - events: {n_events[0]}",
+            f"- pruned: {res_search['n_pruned']}",
+        )
 
+        points = [res_search["points"][n] for n in sorted(res_search["points"])]
         plt.figure()
         plt.title(f"Min n_serv to reduce delay_A below T_q={T_q}")
         plt.grid()
         plt.xlabel("no. of servers")
-        plt.ylabel("Max delay_A")
+        plt.ylabel(f"{delay_quantile} quantile of delay_A")
         plt.axhline(T_q, linestyle="--")
-        plt.plot(list(n_serv_list), delay_list)
+        plt.errorbar(
+            [p["x"] for p in points],
+            [p["mean"] for p in points],
+            yerr=[
+                [p["mean"] - p["conf_int"][0] for p in points],
+                [p["conf_int"][1] - p["mean"] for p in points],
+            ],
+            fmt="o-",
+            capsize=3,
+        )
         plt.savefig("lab02/images/n_serv_T_q.png", dpi=300)
 
         plt.show()
@@ -632,6 +1201,58 @@ if __name__ == "__main__":
                 plots=True,
             )
 
+            if use_transient:
+                # Expected values over time for the same arrival profile
+                exact_4a = transientTandem(
+                    fract,
+                    arr_t_list,
+                    sim_time,
+                    serv_t_1=4.0,
+                    n_serv_1=4,
+                    n_serv_2=4,
+                    n_points=1000,
+                )
+                plt.figure(figsize=(12, 5))
+                plt.plot(
+                    [x[1] for x in res_mdc.n_usr_t],
+                    [x[0] for x in res_mdc.n_usr_t],
+                    "b",
+                    alpha=0.3,
+                    label="MDC (simulation)",
+                )
+                plt.plot(
+                    exact_4a["time"], exact_4a["users_mdc"], "b", label="MDC (CTMC)"
+                )
+                plt.plot(
+                    exact_4a["time"], exact_4a["users_cdc"], "r", label="CDC (CTMC)"
+                )
+                plt.title("Number of users in time, variable arrival rate")
+                plt.xlabel("time")
+                plt.ylabel("# packets")
+                plt.legend()
+                plt.grid()
+                plt.tight_layout()
+                plt.savefig("lab02/images/task4a_usr_time_ctmc.png", dpi=300)
+
+                plt.figure(figsize=(12, 5))
+                plt.plot(
+                    [x[1] for x in res_cdc.countLosses_t],
+                    [x[0] for x in res_cdc.countLosses_t],
+                    "r",
+                    label="CDC (simulation)",
+                )
+                plt.plot(
+                    exact_4a["time"], exact_4a["losses_cdc"], "r--", label="CDC (CTMC)"
+                )
+                plt.title("Number of losses in time, variable arrival rate")
+                plt.xlabel("time")
+                plt.ylabel("# losses")
+                plt.legend()
+                plt.grid()
+                plt.tight_layout()
+                plt.savefig("lab02/images/task4a_losses_time_ctmc.png", dpi=300)
+                plt.show()
+
         # b)
         if task_4b:
             res_mdc, res_cdc = run(
@@ -658,29 +1279,60 @@ if __name__ == "__main__":
             """
             # NEW fraction
             f = 0.75
-            # The operational cost is defined as the rate
-            max_oper_cost = 25000  # To be reviewed
+            # The operational cost is defined as the rate; only the cost of the
+            # CDC depends on the server types, so the threshold refers to it
+            max_oper_cost = 100000  # To be reviewed
             n_serv_2 = 4
-            # different server types compinations
-            serv_t_list = [[7, 7, 4, 4], [1, 1, 10, 10]]
+            # Available server types (average service times)
+            serv_types = [1, 2, 4, 7, 10]
+            fixed_params = {
+                "fract": f,
+                "arr_t": 1.0,
+                "serv_t_1": 3.0,
+                "q1_len": 10,
+                "n_serv_1": 4,
+                "q2_len": 20,
+            }
             print("\n+--------- Task 4c ----------+")
             print(f"\nMaximum cost threshold: {max_oper_cost}")
             print(f"Queuing delay threshold: {T_q}")
             print("+------------------------------------+")
-            # TODO: check if constraints of task 3 are respected
-            for serv_t_2 in serv_t_list:
-                print("\nServer arrival time configuration:", serv_t_2)
-                res_mdc, res_cdc = run(
+
+            def bestServerTypes(n_serv_2):
+                # Screening, racing of the survivors and final run of the best
+                res_opt = optimizeServers(
+                    partial(evalServerConfig, **fixed_params),
+                    serv_types,
+                    n_serv_2,
+                    max_oper_cost,
+                    T_q,
+                    sim_time,
+                    screen=partial(
+                        screenServerConfig, sim_time=sim_time, **fixed_params
+                    ),
+                    min_sim_time=sim_time / 64,
+                )
+                print(
+                    f"\nScreened out: {res_opt['n_screened']}",
+                    f"- runs: {res_opt['n_runs']}",
+                    f"- rounds: {len(res_opt['rounds'])}",
+                )
+                if res_opt["serv_t"] is None:
+                    print("No configuration satisfies the constraints")
+                    return
+                print("\nServer arrival time configuration:", res_opt["serv_t"])
+                random.seed(1)
+                run(
                     sim_time,
-                    f,
-                    arr_t=1.0,
-                    n_serv_1=4,
                     n_serv_2=n_serv_2,
-                    serv_t_2=serv_t_2,
+                    serv_t_2=res_opt["serv_t"],
                     server_costs=True,
                     results=True,
+                    **fixed_params,
                 )
 
+            bestServerTypes(n_serv_2)
+
             if task_4d:
                 """
                 Install half the number of Cloud servers, keeping the same value
@@ -693,17 +1345,69 @@ if __name__ == "__main__":
                     packet drop probability
                 """
                 n_serv_2 = int(n_serv_2 / 2)
-                serv_t_list = [[3, 3.97], [10, 10], [1, 1]]
                 print("\n\n+--------- Task 4d ----------+")
-                for serv_t_2 in serv_t_list:
-                    print("\nServer arrival time configuration:", serv_t_2)
-                    res_mdc, res_cdc = run(
-                        sim_time,
-                        f,
-                        arr_t=1.0,
-                        n_serv_1=4,
-                        n_serv_2=n_serv_2,
-                        serv_t_2=serv_t_2,
-                        server_costs=True,
-                        results=True,
-                    )
+                bestServerTypes(n_serv_2)
+
+    ########### Small loss probabilities at the cloud data center
+    if rare_loss_cdc:
+        print("+--------------- Rare CDC losses ---------------+")
+        # With these buffer sizes the CDC loss probability is too small to be
+        # observed in a plain run; the thresholds are placed on the CDC occupancy
+        q2_lengths = [8, 12, 16]
+        for q2_len in q2_lengths:
+            res = cdcLossSplitting(
+                fract,
+                arr_t=4.0,
+                serv_t_1=3.0,
+                q1_len=3,
+                serv_t_2=4.0,
+                q2_len=q2_len,
+                split=2,
+                n_cycles=20000,
+            )
+            print(
+                f"q2_len = {q2_len} - CDC loss probability: {res['loss_prob']:.3e}",
+                f"- CI: ({res['conf_int'][0]:.3e}, {res['conf_int'][1]:.3e})",
+                f"- events: {res['n_events']}",
+            )
+
+    ########### Fan-in of many micro data centers into one cloud data center
+    if fan_in:
+        print("+------------------ Fan-in ------------------+")
+        n_sites = 1000
+        # Heterogeneous sites; the CDC is loaded at about 80%
+        runFanIn(
+            2000,
+            n_sites,
+            fract=np.linspace(0.1, 0.9, n_sites),
+            arr_t=np.linspace(4.0, 8.0, n_sites),
+            serv_t_1=3.0,
+            q1_len=10,
+            serv_t_2=0.04,
+            q2_len=200,
+            n_serv_2=4,
+            results=True,
+        )
+
+    ########### Fast screening of the configurations (decomposition)
+    if screen_decomposition:
+        print("+------------- Decomposition screening -------------+")
+        f = 0.75
+        for serv_t_2 in [[7, 7, 4, 4], [1, 1, 10, 10], [3, 3.97], [10, 10], [1, 1]]:
+            res = decompose(
+                tandemNodes(
+                    serv_t_1=3.0,
+                    q1_len=10,
+                    n_serv_1=4,
+                    serv_t_2=serv_t_2,
+                    q2_len=20,
+                    n_serv_2=len(serv_t_2),
+                ),
+                f,
+                arr_t=1.0,
+            )
+            print(
+                f"serv_t_2 = {serv_t_2}",
+                f"- delay A: {res['A']['delay_us']:.2f} us, loss A: {res['A']['loss']:.2e}",
+                f"- delay B: {res['B']['delay_us']:.2f} us, loss B: {res['B']['loss']:.2e}",
+            )
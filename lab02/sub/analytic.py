@@ -0,0 +1,197 @@
+import numpy as np
+
+"""
+Closed-form results for Markovian queues (M/M/1, M/M/1/B, M/M/c, M/M/c/K,
+M/M/inf).
+
+All functions accept scalars or NumPy arrays (broadcast together), so that
+whole sweep grids can be evaluated at once.
+The parameters follow the same convention used by 'run':
+- arr_t: average inter-arrival time (1/arr_rate)
+- serv_t: average service time (1/serv_rate)
+- n_server: number of servers (None -> infinite)
+- queue_len: maximum number of clients in the system (None -> infinite)
+"""
+
+
+def erlangB(n_server, load):
+    """
+    erlangB
+    ---
+    Erlang B formula (blocking probability of M/M/c/c), evaluated with the
+    numerically stable recursion:
+
+        B(0) = 1,   B(k) = a * B(k-1) / (k + a * B(k-1))
+
+    ### Input parameters
+    - n_server: number of servers (int or array of ints)
+    - load: offered load a = arr_rate/serv_rate (float or array)
+    """
+    c, a = np.broadcast_arrays(np.asarray(n_server), np.asarray(load, dtype=float))
+    B = np.ones(a.shape)
+    for k in range(1, int(np.max(c, initial=0)) + 1):
+        # Only update the elements which still need to reach their n. of servers
+        upd = k <= c
+        B = np.where(upd, a * B / (k + a * B), B)
+    return B
+
+
+def erlangC(n_server, load):
+    """
+    erlangC
+    ---
+    Erlang C formula (probability of waiting in M/M/c), obtained from the
+    Erlang B one as:
+
+        C = c * B / (c - a * (1 - B))
+
+    The value is 1 for unstable systems (a >= c).
+
+    ### Input parameters
+    - n_server: number of servers (int or array of ints)
+    - load: offered load a = arr_rate/serv_rate (float or array)
+    """
+    c, a = np.broadcast_arrays(np.asarray(n_server), np.asarray(load, dtype=float))
+    B = erlangB(c, a)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        C = c * B / (c - a * (1 - B))
+    return np.where(a < c, C, 1.0)
+
+
+def mmck(arr_t, serv_t, n_server=1, queue_len=None):
+    """
+    mmck
+    ---
+    Evaluate the steady-state metrics of an M/M/c/K queue. M/M/1, M/M/1/B and
+    M/M/c are obtained with n_server=1 and/or queue_len=None, M/M/inf with
+    n_server=None (or np.inf): no waiting, no losses and a Poisson number of
+    users with mean arr_rate/serv_rate.
+
+    The finite-buffer case is solved through the stationary distribution, which
+    is evaluated in log-space to avoid overflows for large buffers or loads; the
+    infinite-buffer case uses the Erlang C formula (unstable systems get
+    infinite users and delays).
+
+    NOTE: as in the 'Queue' class, queue_len is forced to be at least n_server.
+
+    ### Input parameters
+    - arr_t: average inter-arrival time
+    - serv_t: average service time
+    - n_server: number of servers (None or np.inf for infinitely many servers)
+    - queue_len: maximum number of clients in the system (None or np.inf for
+    infinite queues)
+
+    ### Output parameters
+    - metrics: dict of arrays with keys:
+      - users: average number of users in the system
+      - buffer: average number of users in the waiting line
+      - delay: average time spent in the system (accepted clients)
+      - wait: average waiting delay (accepted clients)
+      - wait_no_zeros: average waiting delay of the clients which actually wait
+      - loss: loss probability
+      - util: utilization of each server (NaN with infinitely many servers)
+    """
+    if queue_len is None:
+        queue_len = np.inf
+    if n_server is None:
+        n_server = np.inf
+    arr_t, serv_t, c, K = np.broadcast_arrays(
+        np.asarray(arr_t, dtype=float),
+        np.asarray(serv_t, dtype=float),
+        np.asarray(n_server, dtype=float),
+        np.asarray(queue_len, dtype=float),
+    )
+    K = np.maximum(K, c)
+    arr_r = 1.0 / arr_t
+    serv_r = 1.0 / serv_t
+    a = arr_r / serv_r
+
+    metrics = {
+        key: np.full(a.shape, np.nan)
+        for key in ["users", "buffer", "delay", "wait", "wait_no_zeros", "loss", "util"]
+    }
+
+    # Infinitely many servers (the buffer is never used)
+    inf_serv = np.isinf(c)
+    if np.any(inf_serv):
+        metrics["users"][inf_serv] = a[inf_serv]
+        metrics["buffer"][inf_serv] = 0.0
+        metrics["delay"][inf_serv] = serv_t[inf_serv]
+        metrics["wait"][inf_serv] = 0.0
+        metrics["loss"][inf_serv] = 0.0
+
+    fin = np.isfinite(K)
+    if np.any(fin):
+        res = finiteQueue(a[fin], c[fin], K[fin])
+        lam_eff = arr_r[fin] * (1 - res["loss"])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            metrics["users"][fin] = res["users"]
+            metrics["buffer"][fin] = res["buffer"]
+            metrics["delay"][fin] = res["users"] / lam_eff
+            metrics["wait"][fin] = res["buffer"] / lam_eff
+            metrics["wait_no_zeros"][fin] = (
+                res["buffer"] / lam_eff / (res["p_wait"] / (1 - res["loss"]))
+            )
+            metrics["loss"][fin] = res["loss"]
+            metrics["util"][fin] = lam_eff / (c[fin] * serv_r[fin])
+
+    inf = ~fin & ~inf_serv
+    if np.any(inf):
+        rho = a[inf] / c[inf]
+        stable = rho < 1
+        C = erlangC(c[inf], a[inf])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            buffer = np.where(stable, C * rho / (1 - rho), np.inf)
+            wait = buffer / arr_r[inf]
+            metrics["buffer"][inf] = buffer
+            metrics["wait"][inf] = wait
+            metrics["wait_no_zeros"][inf] = np.where(
+                stable, 1.0 / (c[inf] * serv_r[inf] - arr_r[inf]), np.inf
+            )
+            metrics["delay"][inf] = wait + serv_t[inf]
+            metrics["users"][inf] = np.where(stable, buffer + a[inf], np.inf)
+        metrics["loss"][inf] = 0.0
+        metrics["util"][inf] = np.minimum(rho, 1.0)
+
+    return metrics
+
+
+def finiteQueue(a, c, K):
+    """
+    finiteQueue
+    ---
+    Stationary distribution of M/M/c/K queues (1D arrays of parameters), used by
+    'mmck'. The unnormalized probabilities are:
+
+        p(n) = p(n-1) * a / min(n, c),  n = 1, ..., K
+
+    ### Output parameters
+    - res: dict containing the average users ('users'), the average users in
+    the waiting line ('buffer'), the loss probability ('loss') and the
+    probability that an arriving client finds all servers busy without
+    being dropped ('p_wait')
+    """
+    K_max = int(np.max(K, initial=0))
+    n = np.arange(K_max + 1)
+
+    with np.errstate(divide="ignore"):
+        log_ratio = np.log(a)[:, None] - np.log(np.minimum(n[None, 1:], c[:, None]))
+    log_p = np.concatenate([np.zeros((len(a), 1)), np.cumsum(log_ratio, axis=1)], 1)
+    valid = n[None, :] <= K[:, None]
+    log_p = np.where(valid, log_p, -np.inf)
+
+    # Normalization (log-sum-exp)
+    log_p -= np.max(log_p, axis=1, keepdims=True)
+    p = np.exp(log_p)
+    p /= p.sum(axis=1, keepdims=True)
+
+    waiting = np.maximum(n[None, :] - c[:, None], 0)
+    loss = p[np.arange(len(a)), K.astype(int)]
+    p_wait = np.sum(np.where(n[None, :] >= c[:, None], p, 0), axis=1) - loss
+
+    return {
+        "users": p @ n,
+        "buffer": np.sum(p * waiting, axis=1),
+        "loss": loss,
+        "p_wait": p_wait,
+    }
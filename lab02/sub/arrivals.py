@@ -0,0 +1,258 @@
+import random
+import numpy as np
+
+"""
+Non-homogeneous Poisson arrival processes (NHPP).
+
+The arrival rate is described by a 'RateProfile' (piecewise-constant,
+piecewise-linear or sinusoidal, optionally periodic, e.g., time-of-day
+profiles). The arrival epochs are generated by thinning (Lewis-Shedler): in
+each segment of the profile, candidate epochs are drawn from a homogeneous
+Poisson process with rate equal to the maximum rate of the segment, and each
+candidate at time t is kept with probability rate(t)/max_rate. Candidates are
+generated in batches with NumPy.
+"""
+
+
+# ******************************************************************************
+# RateProfile
+# ******************************************************************************
+class RateProfile:
+    def __init__(self, kind, times=None, rates=None, period=None, **params):
+        """
+        RateProfile
+        ---
+        Arrival rate as a function of time. Use the functions
+        'piecewiseConstant', 'piecewiseLinear' and 'sinusoidal' to build it.
+
+        ### Input parameters
+        - kind: 'constant' (piecewise-constant), 'linear' (piecewise-linear) or
+        'sinusoidal'
+        - times: increasing breakpoints, starting at 0 (piecewise profiles)
+        - rates: rates at the breakpoints (piecewise profiles)
+        - period: if not None, the profile is repeated with this period; the
+        piecewise profiles keep their last value after the last breakpoint if it
+        is None
+        - params: parameters of the sinusoidal profile ('mean_rate', 'amplitude',
+        'phase')
+        """
+        self.kind = kind
+        self.period = period
+
+        if kind in ["constant", "linear"]:
+            self.times = np.asarray(times, dtype=float)
+            self.rates = np.asarray(rates, dtype=float)
+            if len(self.times) == 0 or len(self.times) != len(self.rates):
+                raise ValueError("One rate per breakpoint is needed!")
+            if self.times[0] != 0 or np.any(np.diff(self.times) <= 0):
+                raise ValueError("The breakpoints must be increasing, starting at 0!")
+            if period is not None and period <= self.times[-1]:
+                raise ValueError("The period must be larger than the last breakpoint!")
+            # Segment boundaries (the last one extends up to the period/infinity)
+            end = np.inf if period is None else period
+            self.seg_start = self.times
+            self.seg_end = np.append(self.times[1:], end)
+            if kind == "constant":
+                self.seg_max = self.rates
+            else:
+                # Linear profiles: constant after the last breakpoint, or going back
+                # to the first value at the end of the period
+                next_rates = np.append(
+                    self.rates[1:], self.rates[-1] if period is None else self.rates[0]
+                )
+                self.seg_max = np.maximum(self.rates, next_rates)
+        elif kind == "sinusoidal":
+            self.mean_rate = params["mean_rate"]
+            self.amplitude = params.get("amplitude", 0.0)
+            self.phase = params.get("phase", 0.0)
+            if period is None:
+                raise ValueError("The period of the sinusoidal profile is needed!")
+            if abs(self.amplitude) > self.mean_rate:
+                raise ValueError("The amplitude cannot exceed the mean rate!")
+            # Single segment covering the whole period
+            self.seg_start = np.array([0.0])
+            self.seg_end = np.array([float(period)])
+            self.seg_max = np.array([self.mean_rate + abs(self.amplitude)])
+        else:
+            raise ValueError(f"Invalid profile type '{kind}'!")
+
+        if np.any(self.seg_max < 0):
+            raise ValueError("The arrival rates cannot be negative!")
+
+    def rate(self, t):
+        """
+        rate
+        ---
+        Evaluate the arrival rate at time(s) t (scalar or array).
+        """
+        t = np.asarray(t, dtype=float)
+        if self.period is not None:
+            t = np.mod(t, self.period)
+
+        if self.kind == "sinusoidal":
+            return self.mean_rate + self.amplitude * np.sin(
+                2 * np.pi * t / self.period + self.phase
+            )
+
+        seg = np.searchsorted(self.times, t, side="right") - 1
+        if self.kind == "constant":
+            return self.rates[seg]
+
+        # Linear interpolation inside each segment
+        if self.period is None:
+            return np.interp(t, self.times, self.rates)
+        return np.interp(
+            t,
+            np.append(self.times, self.period),
+            np.append(self.rates, self.rates[0]),
+        )
+
+    def segment(self, t):
+        """
+        segment
+        ---
+        Return (end, max_rate) of the segment containing time t (absolute time,
+        also for periodic profiles).
+        """
+        offset = 0.0
+        if self.period is not None:
+            offset = np.floor(t / self.period) * self.period
+        seg = max(np.searchsorted(self.seg_start, t - offset, side="right") - 1, 0)
+        return offset + self.seg_end[seg], self.seg_max[seg]
+
+
+def piecewiseConstant(times, rates, period=None):
+    """
+    piecewiseConstant
+    ---
+    Profile with rate rates[i] in [times[i], times[i+1]).
+    """
+    return RateProfile("constant", times, rates, period)
+
+
+def piecewiseLinear(times, rates, period=None):
+    """
+    piecewiseLinear
+    ---
+    Profile linearly interpolating the values rates[i] at times[i].
+    """
+    return RateProfile("linear", times, rates, period)
+
+
+def sinusoidal(mean_rate, amplitude, period, phase=0.0):
+    """
+    sinusoidal
+    ---
+    Profile mean_rate + amplitude * sin(2 pi t / period + phase).
+    """
+    return RateProfile(
+        "sinusoidal",
+        period=period,
+        mean_rate=mean_rate,
+        amplitude=amplitude,
+        phase=phase,
+    )
+
+
+def stepProfile(arr_t, sim_time):
+    """
+    stepProfile
+    ---
+    Piecewise-constant profile obtained by splitting 'sim_time' in len(arr_t)
+    equal steps, the i-th one having average inter-arrival time arr_t[i] (same
+    convention as the list of inter-arrival times accepted by 'run').
+    """
+    step = sim_time / len(arr_t)
+    return piecewiseConstant(
+        [i * step for i in range(len(arr_t))], [1.0 / a for a in arr_t]
+    )
+
+
+# ******************************************************************************
+# NHPP
+# ******************************************************************************
+class NHPP:
+    def __init__(self, profile, batch_size=1024, seed=None):
+        """
+        NHPP
+        ---
+        Non-homogeneous Poisson process with the given rate profile.
+
+        ### Input parameters
+        - profile: 'RateProfile' object
+        - batch_size: number of candidate epochs generated at once
+        - seed: seed of the NumPy generator; if None, it is drawn from the
+        'random' module, so that 'random.seed' makes the runs reproducible
+
+        ### Attributes
+        - time: time up to which the process has been generated
+        - buffer: generated (not yet consumed) arrival epochs
+        """
+        self.profile = profile
+        self.batch_size = batch_size
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.rng = np.random.default_rng(seed)
+
+        self.time = 0.0
+        self.buffer = np.empty(0)
+        self.pos = 0
+
+    def generate(self):
+        """
+        generate
+        ---
+        Generate the next batch of arrival epochs (thinning inside the current
+        segment of the profile); the batch may be empty if all the candidates are
+        rejected or the segment ends.
+        """
+        end, max_rate = self.profile.segment(self.time)
+        if max_rate <= 0:
+            # No arrivals in this segment
+            self.time = end
+            return np.empty(0)
+
+        candidates = self.time + np.cumsum(
+            self.rng.exponential(1.0 / max_rate, self.batch_size)
+        )
+        if candidates[-1] >= end:
+            # The process is memoryless: restart from the end of the segment
+            candidates = candidates[candidates < end]
+            self.time = end
+        else:
+            self.time = candidates[-1]
+
+        accept = self.rng.random(len(candidates)) * max_rate < self.profile.rate(
+            candidates
+        )
+        return candidates[accept]
+
+    def nextArrival(self):
+        """
+        nextArrival
+        ---
+        Return the next arrival epoch.
+        """
+        while self.pos >= len(self.buffer):
+            if np.isinf(self.time):
+                return np.inf
+            self.buffer = self.generate()
+            self.pos = 0
+        self.pos += 1
+        return float(self.buffer[self.pos - 1])
+
+    def reseed(self, seed):
+        """
+        reseed
+        ---
+        Replace the NumPy generator with a new one seeded with 'seed'. The
+        epochs already generated and not yet consumed are discarded and the
+        generation restarts from the last consumed arrival: since the process
+        is memoryless, the future arrivals are still a NHPP with the same
+        profile.
+        """
+        if self.pos > 0:
+            self.time = float(self.buffer[self.pos - 1])
+        self.rng = np.random.default_rng(seed)
+        self.buffer = np.empty(0)
+        self.pos = 0
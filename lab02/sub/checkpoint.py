@@ -0,0 +1,88 @@
+import os
+import zlib
+import pickle
+import random
+from queue import PriorityQueue
+
+"""
+Checkpoints of the simulation state.
+
+A checkpoint contains everything needed to continue a run exactly as if it
+had not been interrupted:
+- simulated time and time of the next checkpoint
+- contents of the FES (the heap list of the PriorityQueue)
+- the two data centers, i.e., the waiting lines, the 'Server' objects (idle
+vectors and the service time samplers with their NumPy generators and
+pre-drawn blocks), the 'Measure' accumulators and the packet records
+- the arrival process (if it is an object, e.g., 'NHPP' or 'TraceArrivals')
+and the packet handles
+- the state of the 'random' module
+
+The objects are pickled together (so that shared objects, e.g., the packet
+handles, stay shared) and compressed with zlib. The file starts with the
+magic string CHECKPOINT_MAGIC, followed by the compressed data; it is first
+written to a temporary file and then renamed, so that an interruption
+during the write does not corrupt the previous checkpoint.
+
+The packet records spilled to disk are not copied: when resuming, the spill
+files are truncated to the length they had at the checkpoint.
+"""
+
+CHECKPOINT_MAGIC = b"MCDCKPT1"
+
+
+def saveCheckpoint(path, time, next_checkpoint, FES, mdc, cdc, level=6):
+    """
+    saveCheckpoint
+    ---
+    Write the state of the simulation to 'path'.
+
+    ### Input parameters
+    - path: checkpoint file
+    - time: current simulated time
+    - next_checkpoint: simulated time of the next checkpoint
+    - FES: future event set (PriorityQueue)
+    - mdc, cdc: data centers ('Queue' objects)
+    - level: zlib compression level
+    """
+    state = {
+        "time": time,
+        "next_checkpoint": next_checkpoint,
+        "fes": list(FES.queue),
+        "mdc": mdc,
+        "cdc": cdc,
+        "random": random.getstate(),
+    }
+    data = zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL), level)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(CHECKPOINT_MAGIC)
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def loadCheckpoint(path):
+    """
+    loadCheckpoint
+    ---
+    Read a checkpoint and restore the state of the 'random' module.
+
+    ### Output parameters
+    - time: simulated time of the checkpoint
+    - next_checkpoint: simulated time of the next checkpoint
+    - FES: future event set (new PriorityQueue)
+    - mdc, cdc: data centers
+    """
+    with open(path, "rb") as f:
+        if f.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+            raise ValueError(f"{path} is not a checkpoint file!")
+        state = pickle.loads(zlib.decompress(f.read()))
+
+    FES = PriorityQueue()
+    # The list is already a valid heap
+    FES.queue = state["fes"]
+    random.setstate(state["random"])
+    for dc in [state["mdc"], state["cdc"]]:
+        dc.data.records.truncateSpill()
+        dc.data.e2e.truncateSpill()
+    return state["time"], state["next_checkpoint"], FES, state["mdc"], state["cdc"]
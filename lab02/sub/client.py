@@ -5,7 +5,7 @@ import numpy as np
 # Client
 # ******************************************************************************
 class Client:
-    def __init__(self, type, arrival_time, id=""):
+    def __init__(self, type, arrival_time, id=None):
         """
         Client
 
@@ -13,8 +13,10 @@ class Client:
         """
         self.type = type
         self.arrival_time = arrival_time
-        # Unique ID of the packets - the format is "[type][Number]", e.g., "A10"
+        # ID of the packet - integer, unique among the packets of the same type
         self.pkt_ID = id
+        # Time at which the service starts
+        self.service_start = None
 
         self.arrival_times = []
 
@@ -29,9 +29,7 @@ class CloudDataCenter(Queue):
         self.data.arr += 1  # Regardless of packet type
         self.data.ut += self.users * (time - self.data.oldT)
         self.data.ut_in_time.append([time, self.data.ut])
-        self.data.avgBuffer += max(0, self.users - self.n_server) * (
-            time - self.data.oldT
-        )
+        self.data.avgBuffer += self.buffered() * (time - self.data.oldT)
         self.data.oldT = time
 
         # sample the time until the next event - - - - NOTE: not needed here, it is already done by the arrival
@@ -0,0 +1,403 @@
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from scipy.stats import poisson
+
+"""
+Exact Markov-chain models of the Micro Data Center -> Cloud Data Center tandem.
+
+With exponential inter-arrival and service times and finite queues, the system
+simulated by 'run' is a finite continuous-time Markov chain whose state is the
+pair (n1, n2) = (packets in the MDC, packets in the CDC):
+- arrival (rate 1/arr_t): n1 + 1 if the MDC is not full, else the packet is
+forwarded to the CDC (n2 + 1, or lost if also the CDC is full)
+- MDC service (rate min(n1, n_serv_1)/serv_t_1): n1 - 1; the packet is of type
+B with probability 'fract' and it is then forwarded to the CDC
+- CDC service (rate min(n2, n_serv_2)/serv_t_2): n2 - 1
+
+NOTE: the propagation time between the two data centers is neglected.
+"""
+
+
+def tandemGenerator(
+    fract, arr_t, serv_t_1, q1_len, n_serv_1, serv_t_2, q2_len, n_serv_2
+):
+    """
+    tandemGenerator
+    ---
+    Build the (sparse) infinitesimal generator of the tandem.
+
+    The state (n1, n2) has index n1 * (q2_len + 1) + n2.
+    The parameters have the same meaning as in 'run'; as in the 'Queue' class,
+    the queue lengths are forced to be at least the number of servers.
+
+    ### Output parameters
+    - Q: generator matrix (scipy.sparse CSR, rows sum to 0)
+    - shape: (q1_len + 1, q2_len + 1), shape of the state space
+    """
+    K1 = max(q1_len, n_serv_1)
+    K2 = max(q2_len, n_serv_2)
+    shape = (K1 + 1, K2 + 1)
+    n_states = shape[0] * shape[1]
+
+    n1, n2 = np.meshgrid(np.arange(K1 + 1), np.arange(K2 + 1), indexing="ij")
+    n1 = n1.ravel()
+    n2 = n2.ravel()
+    idx = np.arange(n_states)
+
+    arr_r = 1.0 / arr_t
+    mdc_r = np.minimum(n1, n_serv_1) / serv_t_1
+    cdc_r = np.minimum(n2, n_serv_2) / serv_t_2
+
+    rows = []
+    cols = []
+    rates = []
+
+    def addTransitions(mask, step, rate):
+        rows.append(idx[mask])
+        cols.append(idx[mask] + step)
+        rates.append(np.broadcast_to(rate, idx.shape)[mask])
+
+    # Arrivals at the MDC / overflow towards the CDC
+    addTransitions(n1 < K1, K2 + 1, arr_r)
+    addTransitions((n1 == K1) & (n2 < K2), 1, arr_r)
+    # MDC departures: type A leave the system, type B go to the CDC (if not full)
+    addTransitions((n1 > 0) & (n2 < K2), -(K2 + 1), (1 - fract) * mdc_r)
+    addTransitions((n1 > 0) & (n2 < K2), -(K2 + 1) + 1, fract * mdc_r)
+    addTransitions((n1 > 0) & (n2 == K2), -(K2 + 1), mdc_r)
+    # CDC departures
+    addTransitions(n2 > 0, -1, cdc_r)
+
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    rates = np.concatenate(rates)
+    keep = rates > 0
+
+    Q = sp.csr_matrix(
+        (rates[keep], (rows[keep], cols[keep])), shape=(n_states, n_states)
+    )
+    Q = Q - sp.diags(np.asarray(Q.sum(axis=1)).ravel())
+
+    return Q.tocsr(), shape
+
+
+def stationaryDist(Q, ref=0, tol=1e-10, maxiter=20, ilu_maxiter=2):
+    """
+    stationaryDist
+    ---
+    Evaluate the stationary distribution pi of an irreducible CTMC (pi Q = 0,
+    sum(pi) = 1) with an iterative solver.
+
+    The state 'ref' is used as reference (pi_ref = 1 before normalization), so
+    that the remaining equations form a non-singular system, which is solved by
+    GMRES with an incomplete-LU preconditioner. The reference should be a likely
+    state, so that the unknowns do not span too many orders of magnitude.
+    For stiff chains (high loads, large buffers) the incomplete factorization is
+    not enough; in this case GMRES is restarted using the complete sparse LU
+    factorization as preconditioner (converging in a couple of iterations).
+
+    ### Input parameters
+    - Q: generator matrix (scipy.sparse)
+    - ref: index of the reference state
+    - tol: relative tolerance of the iterative solver
+    - maxiter: maximum number of (restarted) solver iterations
+    - ilu_maxiter: maximum number of (restarted) solver iterations with the
+    incomplete-LU preconditioner, before switching to the complete one
+    """
+    A = Q.T.tocsr()
+    n_states = A.shape[0]
+    if n_states == 1:
+        return np.ones(1)
+
+    # pi_ref = 1: move the reference column to the right-hand side
+    keep = np.arange(n_states) != ref
+    A_red = A[keep][:, keep].tocsc()
+    b = -A[keep][:, ref].toarray().ravel()
+
+    x, info = None, -1
+    try:
+        ilu = spla.spilu(A_red, drop_tol=1e-5, fill_factor=10)
+        M = spla.LinearOperator(A_red.shape, ilu.solve)
+        x, info = spla.gmres(A_red, b, M=M, rtol=tol, atol=0.0, maxiter=ilu_maxiter)
+    except RuntimeError:
+        # Singular incomplete factor
+        pass
+
+    if info != 0:
+        lu = spla.splu(A_red)
+        M = spla.LinearOperator(A_red.shape, lu.solve)
+        x, info = spla.gmres(A_red, b, M=M, rtol=tol, atol=0.0, maxiter=maxiter)
+        if info != 0:
+            raise RuntimeError(
+                f"The iterative solver did not converge (info = {info})!"
+            )
+
+    pi = np.ones(n_states)
+    pi[keep] = x
+    pi = np.maximum(pi, 0)
+    return pi / pi.sum()
+
+
+def likelyState(fract, arr_t, serv_t_1, q1_len, n_serv_1, serv_t_2, q2_len, n_serv_2):
+    """
+    likelyState
+    ---
+    Rough guess of the most likely state of the tandem (index), used as
+    reference state by 'stationaryDist'.
+
+    Each stage is approximated as an M/M/c/K queue, whose mode is floor(a) if
+    the offered load a is below the number of servers, else the full queue.
+    """
+    K1 = max(q1_len, n_serv_1)
+    K2 = max(q2_len, n_serv_2)
+    arr_r = 1.0 / arr_t
+
+    a1 = arr_r * serv_t_1
+    thr1 = min(arr_r, n_serv_1 / serv_t_1)
+    a2 = (arr_r - thr1 + fract * thr1) * serv_t_2
+
+    n1 = K1 if a1 >= n_serv_1 else min(K1, int(a1))
+    n2 = K2 if a2 >= n_serv_2 else min(K2, int(a2))
+    return n1 * (K2 + 1) + n2
+
+
+def tandemMetrics(
+    pi, fract, arr_t, serv_t_1, q1_len, n_serv_1, serv_t_2, q2_len, n_serv_2
+):
+    """
+    tandemMetrics
+    ---
+    Derive the per-stage performance metrics from a distribution 'pi' of the
+    tandem (stationary or transient), with the parameters of 'tandemGenerator'.
+
+    ### Output parameters
+    - metrics: dict with keys 'mdc' and 'cdc'; each value is a dict containing:
+      - arr_rate: rate of the arrivals at the stage
+      - users: average number of users
+      - delay: average time spent in the stage (Little's law)
+      - loss: loss probability (for the MDC: fraction of packets forwarded
+      directly to the cloud because the queue is full)
+      - loss_rate: rate of the losses
+      - util: average utilization of the servers
+      The key 'loss' contains the overall fraction of packets lost at the CDC.
+    """
+    K1 = max(q1_len, n_serv_1)
+    K2 = max(q2_len, n_serv_2)
+    p = np.asarray(pi).reshape(K1 + 1, K2 + 1)
+    n1 = np.arange(K1 + 1)
+    n2 = np.arange(K2 + 1)
+
+    arr_r = 1.0 / arr_t
+    p1 = p.sum(axis=1)
+    p2 = p.sum(axis=0)
+    mdc_r = np.minimum(n1, n_serv_1) / serv_t_1
+    cdc_r = np.minimum(n2, n_serv_2) / serv_t_2
+
+    # Micro Data Center
+    mdc_loss = p1[K1]
+    mdc_thr = p1 @ mdc_r
+    mdc_users = p1 @ n1
+
+    # Cloud Data Center - overflow from the MDC + forwarded type B packets
+    cdc_arr = arr_r * mdc_loss + fract * mdc_thr
+    cdc_loss_rate = arr_r * p[K1, K2] + fract * (p[:, K2] @ mdc_r)
+    cdc_thr = p2 @ cdc_r
+    cdc_users = p2 @ n2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        metrics = {
+            "mdc": {
+                "arr_rate": arr_r,
+                "users": mdc_users,
+                "delay": mdc_users / (arr_r * (1 - mdc_loss)),
+                "loss": mdc_loss,
+                "loss_rate": arr_r * mdc_loss,
+                "util": mdc_thr * serv_t_1 / n_serv_1,
+            },
+            "cdc": {
+                "arr_rate": cdc_arr,
+                "users": cdc_users,
+                "delay": cdc_users / cdc_thr,
+                "loss": cdc_loss_rate / cdc_arr,
+                "loss_rate": cdc_loss_rate,
+                "util": cdc_thr * serv_t_2 / n_serv_2,
+            },
+            "loss": cdc_loss_rate / arr_r,
+        }
+
+    return metrics
+
+
+def solveTandem(
+    fract,
+    arr_t=10.0,
+    serv_t_1=3.0,
+    q1_len=10,
+    n_serv_1=1,
+    serv_t_2=5.0,
+    q2_len=20,
+    n_serv_2=1,
+    tol=1e-10,
+):
+    """
+    solveTandem
+    ---
+    Solve the steady state of the MDC -> CDC tandem exactly (CTMC), without
+    simulation. The parameters have the same meaning (and defaults) as in 'run'.
+
+    ### Output parameters
+    - metrics: dict of per-stage metrics (see 'tandemMetrics'); the key 'pi'
+    contains the stationary distribution, with shape (q1_len + 1, q2_len + 1)
+    """
+    if isinstance(serv_t_1, list) or isinstance(serv_t_2, list):
+        raise ValueError("Only servers with the same service time are supported!")
+
+    params = (fract, arr_t, serv_t_1, q1_len, n_serv_1, serv_t_2, q2_len, n_serv_2)
+    Q, shape = tandemGenerator(*params)
+    pi = stationaryDist(Q, ref=likelyState(*params), tol=tol)
+
+    metrics = tandemMetrics(pi, *params)
+    metrics["pi"] = pi.reshape(shape)
+    return metrics
+
+
+def uniformizationStep(PT, v, unif_rate, dt, eps=1e-12):
+    """
+    uniformizationStep
+    ---
+    Propagate the distribution 'v' of a CTMC for a time 'dt' by uniformization:
+
+        v(t + dt) = sum_k Poisson(k; unif_rate * dt) * v(t) P^k
+
+    where P = I + Q/unif_rate. The Poisson series is truncated so that the
+    neglected mass is below 'eps'; only sparse matrix-vector products are used.
+
+    ### Input parameters
+    - PT: transpose of the uniformized matrix P (scipy.sparse CSR)
+    - v: distribution at time t
+    - unif_rate: uniformization rate (>= max exit rate of the states)
+    - dt: time step
+    - eps: truncation error of the Poisson series
+    """
+    mean = unif_rate * dt
+    k_left = int(poisson.ppf(eps / 2, mean))
+    k_right = int(poisson.isf(eps / 2, mean)) + 1
+    weights = poisson.pmf(np.arange(k_left, k_right + 1), mean)
+
+    res = np.zeros_like(v)
+    term = v
+    for k in range(k_right + 1):
+        if k >= k_left:
+            res += weights[k - k_left] * term
+        if k < k_right:
+            term = PT @ term
+
+    # Compensate for the truncated mass
+    return res / res.sum()
+
+
+def transientTandem(
+    fract,
+    arr_t,
+    sim_time,
+    serv_t_1=3.0,
+    q1_len=10,
+    n_serv_1=1,
+    serv_t_2=5.0,
+    q2_len=20,
+    n_serv_2=1,
+    n_points=500,
+    pi0=None,
+    ss_tol=1e-10,
+):
+    """
+    transientTandem
+    ---
+    Transient analysis of the MDC -> CDC tandem (CTMC) under a piecewise-constant
+    arrival profile, by uniformization.
+
+    As in 'run', if 'arr_t' is a list the simulation time is split into
+    len(arr_t) equal steps, each one with its own average inter-arrival time.
+    Within each step, as soon as the distribution stops changing (steady state
+    reached) the remaining points are filled without further products.
+
+    ### Input parameters
+    - fract: fraction of packets of type B
+    - arr_t: average inter-arrival time (float) or list of average
+    inter-arrival times (one per time step)
+    - sim_time: total time of the analysis
+    - serv_t_1, q1_len, n_serv_1, serv_t_2, q2_len, n_serv_2: same as in 'run'
+    - n_points: number of (equally spaced) time instants at which the metrics are
+    evaluated
+    - pi0: initial distribution (default: empty system)
+    - ss_tol: tolerance (max. abs. variation in one time step) used to detect
+    the steady state within each step
+
+    ### Output parameters
+    - res: dict of arrays over time ('time'), with the expected number of users
+    ('users_mdc', 'users_cdc'), the loss rates ('loss_rate_mdc',
+    'loss_rate_cdc') and the expected cumulative number of losses
+    ('losses_mdc', 'losses_cdc')
+    """
+    if not isinstance(arr_t, list):
+        arr_t = [arr_t]
+
+    step_time = sim_time / len(arr_t)
+    times = np.linspace(0, sim_time, n_points + 1)
+
+    res = {
+        key: np.zeros(len(times))
+        for key in ["users_mdc", "users_cdc", "loss_rate_mdc", "loss_rate_cdc"]
+    }
+
+    serv_params = (serv_t_1, q1_len, n_serv_1, serv_t_2, q2_len, n_serv_2)
+    v = None
+    for i, a_t in enumerate(arr_t):
+        Q, shape = tandemGenerator(fract, a_t, *serv_params)
+        unif_rate = 1.02 * np.max(-Q.diagonal())
+        PT = (sp.identity(Q.shape[0], format="csr") + Q / unif_rate).T.tocsr()
+
+        if v is None:
+            if pi0 is None:
+                v = np.zeros(Q.shape[0])
+                v[0] = 1.0
+            else:
+                v = np.asarray(pi0, dtype=float).ravel()
+
+        # Time instants belonging to this step (the step end is included in the
+        # following one, except for the last step)
+        t_start = i * step_time
+        t_end = (i + 1) * step_time
+        if i == len(arr_t) - 1:
+            in_step = np.nonzero(times >= t_start)[0]
+        else:
+            in_step = np.nonzero((times >= t_start) & (times < t_end))[0]
+
+        t_prev = t_start
+        stationary = False
+        for j in in_step:
+            if not stationary and times[j] > t_prev:
+                v_new = uniformizationStep(PT, v, unif_rate, times[j] - t_prev)
+                stationary = np.max(np.abs(v_new - v)) < ss_tol
+                v = v_new
+            t_prev = times[j]
+
+            metrics = tandemMetrics(v, fract, a_t, *serv_params)
+            res["users_mdc"][j] = metrics["mdc"]["users"]
+            res["users_cdc"][j] = metrics["cdc"]["users"]
+            res["loss_rate_mdc"][j] = metrics["mdc"]["loss_rate"]
+            res["loss_rate_cdc"][j] = metrics["cdc"]["loss_rate"]
+
+        # Move to the end of the step (start of the next one)
+        if not stationary and t_end > t_prev and i < len(arr_t) - 1:
+            v = uniformizationStep(PT, v, unif_rate, t_end - t_prev)
+
+    res["time"] = times
+    # Expected cumulative losses (trapezoidal integration of the loss rates)
+    for stage in ["mdc", "cdc"]:
+        rate = res[f"loss_rate_{stage}"]
+        res[f"losses_{stage}"] = np.concatenate(
+            [[0.0], np.cumsum((rate[1:] + rate[:-1]) / 2 * np.diff(times))]
+        )
+
+    return res
@@ -0,0 +1,181 @@
+import numpy as np
+from sub.analytic import mmck
+
+"""
+Decomposition (Jackson-like) approximation of networks of data centers.
+
+Each node is approximated as an independent M/M/c/K queue fed by Poisson
+flows; the effective arrival rates of the nodes are found iteratively, since
+they depend on the losses (overflows) of the upstream nodes.
+
+A node is described by a dict with keys:
+- serv_t: average service time; if it is a list (one value per server) the node
+is approximated with n_server identical servers with the same total rate
+- n_server: number of servers
+- queue_len: maximum number of packets in the node (None -> infinite)
+- overflow: index of the node which receives the packets that find the queue
+full (None -> the packets are lost)
+- route: dict {'A': target, 'B': target} with the index of the node which
+receives the packets of each type after being served (None -> leave the system)
+"""
+
+TYPES = ["A", "B"]
+
+
+def tandemNodes(
+    serv_t_1=3.0, q1_len=10, n_serv_1=1, serv_t_2=5.0, q2_len=20, n_serv_2=1
+):
+    """
+    tandemNodes
+    ---
+    Node list of the lab02 topology (parameters as in 'run'): the Micro Data
+    Center (node 0) forwards type B packets and its overflow to the Cloud Data
+    Center (node 1).
+    """
+    return [
+        {
+            "serv_t": serv_t_1,
+            "n_server": n_serv_1,
+            "queue_len": q1_len,
+            "overflow": 1,
+            "route": {"A": None, "B": 1},
+        },
+        {
+            "serv_t": serv_t_2,
+            "n_server": n_serv_2,
+            "queue_len": q2_len,
+            "overflow": None,
+            "route": {"A": None, "B": None},
+        },
+    ]
+
+
+def evalNodes(lam, serv_t, n_server, queue_len):
+    """
+    evalNodes
+    ---
+    M/M/c/K metrics of all the nodes, given the arrival rates of each type.
+    """
+    with np.errstate(divide="ignore"):
+        # Nodes without arrivals get an infinite inter-arrival time
+        arr_t = 1.0 / (lam["A"] + lam["B"])
+    return mmck(arr_t, serv_t, n_server, queue_len)
+
+
+def decompose(
+    nodes,
+    fract,
+    arr_t=10.0,
+    source=0,
+    propagation_time=0.2,
+    time_scale=1.0,
+    tol=1e-12,
+    maxiter=1000,
+):
+    """
+    decompose
+    ---
+    Evaluate the decomposition approximation of a network of data centers.
+
+    ### Input parameters
+    - nodes: list of node descriptions (see the module documentation)
+    - fract: fraction of packets of type B
+    - arr_t: average inter-arrival time of the packets generated by the sensors
+    - source: index of the node receiving the packets from the sensors
+    - propagation_time: transmission time of each hop between two nodes
+    - time_scale: duration of one time unit of the model in microseconds (used to
+    express the end-to-end delays in microseconds)
+    - tol: tolerance on the variation of the arrival rates (fixed point)
+    - maxiter: maximum number of fixed-point iterations
+
+    ### Output parameters
+    - res: dict containing:
+      - nodes: list (one element per node) of dicts with the arrival rate
+      ('arr_rate'), loss probability ('loss'), average users ('users'), average
+      delay ('delay') and server utilization ('util') of the node
+      - A, B: dicts with the end-to-end delay of the delivered packets, in
+      microseconds ('delay_us'), and the loss probability ('loss') of each type
+      - n_iter: number of fixed-point iterations
+    """
+    n = len(nodes)
+    serv_t = np.zeros(n)
+    n_server = np.zeros(n)
+    queue_len = np.zeros(n)
+    for i, node in enumerate(nodes):
+        if isinstance(node["serv_t"], list):
+            # Heterogeneous servers -> identical servers with the same capacity
+            serv_t[i] = node["n_server"] / sum(1.0 / x for x in node["serv_t"])
+        else:
+            serv_t[i] = node["serv_t"]
+        n_server[i] = node["n_server"]
+        queue_len[i] = np.inf if node["queue_len"] is None else node["queue_len"]
+
+    # Routing matrices: R[c][i, j] = 1 if type c goes from i to j after service,
+    # O[i, j] = 1 if the overflow of i goes to j
+    R = {c: np.zeros((n, n)) for c in TYPES}
+    O = np.zeros((n, n))
+    for i, node in enumerate(nodes):
+        for c in TYPES:
+            if node["route"].get(c) is not None:
+                R[c][i, node["route"][c]] = 1
+        if node.get("overflow") is not None:
+            O[i, node["overflow"]] = 1
+
+    ext = {c: np.zeros(n) for c in TYPES}
+    ext["A"][source] = (1 - fract) / arr_t
+    ext["B"][source] = fract / arr_t
+
+    # Fixed point on the arrival rates of each type
+    lam = {c: ext[c].copy() for c in TYPES}
+    for n_iter in range(1, maxiter + 1):
+        metrics = evalNodes(lam, serv_t, n_server, queue_len)
+        loss = np.nan_to_num(metrics["loss"])
+        new_lam = {
+            c: ext[c] + (lam[c] * (1 - loss)) @ R[c] + (lam[c] * loss) @ O
+            for c in TYPES
+        }
+        delta = max(np.max(np.abs(new_lam[c] - lam[c])) for c in TYPES)
+        lam = new_lam
+        if delta < tol:
+            break
+
+    metrics = evalNodes(lam, serv_t, n_server, queue_len)
+    loss = np.nan_to_num(metrics["loss"])
+    delay = metrics["delay"]
+
+    res = {"nodes": [], "n_iter": n_iter}
+    for i in range(n):
+        res["nodes"].append(
+            {
+                "arr_rate": lam["A"][i] + lam["B"][i],
+                "loss": loss[i],
+                "users": metrics["users"][i],
+                "delay": delay[i],
+                "util": metrics["util"][i],
+            }
+        )
+
+    # End-to-end delays: D[i] is the rate-weighted delay accumulated by the
+    # packets entering node i, and it satisfies the linear system
+    # D = D_ext + (D + lam * delay) (1 - loss) R + D * loss * O + hops * prop
+    for c in TYPES:
+        acc = lam[c] * (1 - loss)  # accepted rate
+        blk = lam[c] * loss  # blocked rate
+        fwd = R[c] * acc[:, None] + O * blk[:, None]  # rates of the hops
+        M = R[c] * (1 - loss)[:, None] + O * loss[:, None]
+        rhs = (acc * np.nan_to_num(delay)) @ R[c] + propagation_time * fwd.sum(axis=0)
+        D = np.linalg.solve(np.eye(n) - M.T, rhs)
+
+        # Packets leave the system after service if not routed elsewhere
+        exits = 1 - R[c].sum(axis=1)
+        out_rate = acc * exits
+        out_delay = (D * (1 - loss) + acc * np.nan_to_num(delay)) * exits
+        lost_rate = blk * (1 - O.sum(axis=1))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            res[c] = {
+                "delay_us": out_delay.sum() / out_rate.sum() * time_scale,
+                "loss": lost_rate.sum() / ext[c].sum(),
+            }
+
+    return res
@@ -1,10 +1,56 @@
-import matplotlib.pyplot as plt
+from sub.rendering import plt
 import numpy as np
+import os
+import sys
+from sub.records import PacketRecords
+
+
+def deepSizeOf(value, sample=100):
+    """
+    deepSizeOf
+    ---
+    Estimate the memory (bytes) used by an object and by the objects it
+    contains. The size of the elements of lists, tuples and dicts is estimated
+    on (at most) 'sample' evenly spaced elements, so that the cost does not
+    depend on the length; objects shared by different containers are counted
+    more than once.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, np.ndarray):
+        # 'getsizeof' only includes the data if the array owns it
+        if not value.flags.owndata:
+            size += value.nbytes
+    elif isinstance(value, (list, tuple)):
+        if len(value) > 0:
+            step = max(len(value) // sample, 1)
+            items = value[::step]
+            size += len(value) * sum(deepSizeOf(x, sample) for x in items) / len(items)
+    elif isinstance(value, dict):
+        if len(value) > 0:
+            items = list(value.items())
+            step = max(len(items) // sample, 1)
+            items = items[::step]
+            size += (
+                len(value)
+                * sum(deepSizeOf(k, sample) + deepSizeOf(v, sample) for k, v in items)
+                / len(items)
+            )
+    elif hasattr(value, "__dict__") and not isinstance(value, type):
+        size += sum(deepSizeOf(v, sample) for v in vars(value).values())
+    return int(size)
 
 
 class Measure:
     def __init__(
-        self, Narr, Ndep, NAveraegUser, OldTimeEvent, AverageDelay, countLoss, n_servers
+        self,
+        Narr,
+        Ndep,
+        NAveraegUser,
+        OldTimeEvent,
+        AverageDelay,
+        countLoss,
+        n_servers,
+        records_path=None,
     ):
         """ """
 
@@ -33,14 +79,21 @@ class Measure:
         self.countLosses_A = countLoss
         self.countLosses_B = countLoss
 
-        # Delay of packets A - This dict has as keys the packet IDs and as values the evaluated delays for the queue
-        self.delay_pkt_A = {}
-        # Delay of packets B
-        self.delay_pkt_B = {}
+        # Per-packet records (id, type, arrival, service start, departure, stage),
+        # stored as columns; if 'records_path' is given they are spilled to disk
+        self.records = PacketRecords(spill_path=records_path)
+        # End-to-end records of the packets leaving the network from this queue
+        # (the arrival time is the generation time of the packet)
+        e2e_path = None
+        if records_path is not None:
+            e2e_path = os.path.splitext(records_path)[0] + "_e2e.bin"
+        self.e2e = PacketRecords(spill_path=e2e_path)
 
         # Distribution of the queuing delay
         # Save all values as a list and make the histogram when needed
         self.delaysList = []
+        # Number of bins of the histograms, cached by (list name, length)
+        self.bins_cache = {}
 
         # Store all inter arrival times:
         self.arrivalsList = []
@@ -80,12 +133,69 @@ class Measure:
                 for i in range(n_servers)
             ]
         else:
-            # Unlimited n. of servers       ! complicated
-            pass
+            # Unlimited n. of servers: one single element, whose cumulative time
+            # is the total busy time of all the servers (sum of the service times
+            # of the completed services) - no per-server state is needed; its
+            # 'begin_last_service' is the start of the measurements (see 'reset')
+            self.serv_busy = [{"cumulative_time": 0, "begin_last_service": 0}]
 
         ### Total operation cost:
         self.tot_serv_costs = 0
 
+    def reset(self, time, n_users):
+        """
+        reset
+        ---
+        Discard the measurements collected up to 'time' (e.g., at the end of
+        the warm-up), as if the measurements started at 'time' with 'n_users'
+        packets in the system; the busy time of the ongoing services is only
+        counted from 'time'. The per-packet records are cleared (the spill files
+        are emptied).
+        """
+        serv_busy = getattr(self, "serv_busy", None)
+        self.__init__(
+            0, 0, 0, time, 0, 0, self.n_serv, records_path=self.records.spill_path
+        )
+        self.n_usr_t = [(n_users, time)]
+        self.countLosses_t = [(0, time)]
+        if serv_busy is not None:
+            for new, old in zip(self.serv_busy, serv_busy):
+                new["begin_last_service"] = max(old["begin_last_service"], time)
+
+    def memory_report(self, sample=100):
+        """
+        memory_report
+        ---
+        Live breakdown of the memory used by the measurements (see
+        'deepSizeOf' - the values are estimates); it can be called during the
+        run.
+
+        ### Input parameters
+        - sample: number of elements of each list used to estimate the size of
+        its elements
+
+        ### Output parameters
+        - report: dict {attribute: bytes} sorted by decreasing size, plus the
+        key 'total'; the records already spilled to disk are not included
+        """
+        report = {name: deepSizeOf(value, sample) for name, value in vars(self).items()}
+        report = dict(sorted(report.items(), key=lambda x: -x[1]))
+        report["total"] = sum(report.values())
+        return report
+
+    def histBins(self, name):
+        """
+        histBins
+        ---
+        Number of bins of the histogram of the list 'name' (square root of the
+        number of distinct values); the value is computed once per list length.
+        """
+        values = getattr(self, name)
+        key = (name, len(values))
+        if key not in self.bins_cache:
+            self.bins_cache[key] = round(np.sqrt(len(np.unique(values))))
+        return self.bins_cache[key]
+
     def queuingDelayHist(self, mean_value=False, img_name=None):
         """
         Plot the histogram of the queuing delay values
@@ -96,7 +206,7 @@ class Measure:
         - img_name: if provided (not None) the plot will be saved in the provided location
         """
         plt.figure(figsize=(8, 4))
-        plt.hist(self.delaysList, bins=round(np.sqrt(len(np.unique(self.delaysList)))))
+        plt.hist(self.delaysList, bins=self.histBins("delaysList"))
         if mean_value:
             # Plot the horizontal line corresponding to the mean
             plt.axvline(
@@ -156,7 +266,11 @@ class Measure:
                 plt.savefig(img_name, dpi=300)
             plt.show()
         else:
-            print("Unable to print utilization of servers - they are unlimited")
+            # Unlimited servers - the utilization of each one is not defined
+            print(
+                "Average number of busy servers (unlimited servers):",
+                self.serv_busy[0]["cumulative_time"] / sim_time,
+            )
 
     def plotUsrInTime(self, mean_value=False, img_name=None):
         """
@@ -214,9 +328,7 @@ class Measure:
         - img_name: if provided, save the plot in the specified location
         """
         plt.figure(figsize=(8, 4))
-        plt.hist(
-            self.arrivalsList, bins=round(np.sqrt(len(np.unique(self.arrivalsList))))
-        )
+        plt.hist(self.arrivalsList, bins=self.histBins("arrivalsList"))
         if mean_value:
             plt.axvline(
                 np.mean(self.arrivalsList), color="k", linestyle="dashed", linewidth=1
@@ -239,9 +351,7 @@ class Measure:
         - img_name: if provided, save the plot in the specified location
         """
         plt.figure(figsize=(8, 4))
-        plt.hist(
-            self.servicesList, bins=round(np.sqrt(len(np.unique(self.servicesList))))
-        )
+        plt.hist(self.servicesList, bins=self.histBins("servicesList"))
         if mean_value:
             plt.axvline(
                 np.mean(self.servicesList), color="k", linestyle="dashed", linewidth=1
@@ -272,7 +382,7 @@ class Measure:
         if zeros:
             plt.hist(
                 self.waitingDelaysList,
-                bins=round(np.sqrt(len(np.unique(self.waitingDelaysList)))),
+                bins=self.histBins("waitingDelaysList"),
             )
             if mean_value:
                 # Plot the horizontal line corresponding to the mean
@@ -286,7 +396,7 @@ class Measure:
         else:
             plt.hist(
                 self.waitingDelaysList_no_zeros,
-                bins=round(np.sqrt(len(np.unique(self.waitingDelaysList_no_zeros)))),
+                bins=self.histBins("waitingDelaysList_no_zeros"),
             )
             if mean_value:
                 # Plot the horizontal line corresponding to the mean
@@ -346,12 +456,10 @@ class Measure:
         at the specified path.
         """
         plt.figure(figsize=figsize)
+        wait_del = np.asarray(self.waitingDelaysList, dtype=float)
         plt.plot(
             self.waiting_delays_times[1:],
-            [
-                sum(self.waitingDelaysList[:i]) / (i)
-                for i in range(1, len(self.waitingDelaysList))
-            ],
+            np.cumsum(wait_del)[:-1] / np.arange(1, len(wait_del)),
         )
         plt.title("Average of the waiting delay in time")
         plt.xlabel("time")
@@ -32,42 +32,53 @@ class MicroDataCenter(Queue):
         self.data.ut += self.users * (time - self.data.oldT)
         self.data.ut_in_time.append([time, self.data.ut])
 
-        self.data.avgBuffer += max(0, self.users - self.n_server) * (
-            time - self.data.oldT
-        )
+        self.data.avgBuffer += self.buffered() * (time - self.data.oldT)
 
         self.data.oldT = time
 
-        if len(self.queue) > 0:
+        client = None
+        if self.n_server is None:
+            client = self.departInfinite(time, event_type)
+        elif len(self.queue) > 0:
             # get the first element from the self.queue
             client = self.queue.pop(0)
 
-            if type_pkt == "B":
-                FES.put((time + self.propagation_time, ["arrival_cloud", client.type]))
-            else:
-                # Going to actuator
-                # print something?
-                pass
-
             # Make its server idle
             self.servers.makeIdle(serv_id)
-            if self.n_server is not None:
-                # Update cumulative server busy time
 
-                # Add to the cumulative time the time difference between now (service end)
-                # and the beginning of the service
-                # print(data.serv_busy['cumulative_time'])
-                self.data.serv_busy[serv_id]["cumulative_time"] += (
-                    time - self.data.serv_busy[serv_id]["begin_last_service"]
+            # Update cumulative server busy time
+
+            # Add to the cumulative time the time difference between now (service end)
+            # and the beginning of the service
+            self.data.serv_busy[serv_id]["cumulative_time"] += (
+                time - self.data.serv_busy[serv_id]["begin_last_service"]
+            )
+
+        if client is not None:
+            if type_pkt == "B":
+                FES.put(
+                    (
+                        time + self.propagation_time,
+                        ["arrival_cloud", client.type, client.pkt_ID],
+                    )
                 )
 
             # do whatever we need to do when clients go away
             if client.type == "A":
                 self.data.delay_A += time - client.arrival_time
-                self.data.delay_pkt_A[client.pkt_ID] = time - client.arrival_times[-1]
             elif client.type == "B":
                 self.data.delay_B += time - client.arrival_time
-                self.data.delay_pkt_B[client.pkt_ID] = time - client.arrival_times[-1]
+            self.data.records.append(
+                client.pkt_ID,
+                client.type,
+                client.arrival_times[-1],
+                client.service_start,
+                time,
+                self.stage,
+            )
+            if type_pkt != "B":
+                # Going to actuator
+                self.leaveSystem(client, time)
 
             self.data.delay += time - client.arrival_time
             self.data.delaysList.append(time - client.arrival_time)
@@ -77,22 +88,17 @@ class MicroDataCenter(Queue):
         # Update time
         self.data.oldT = time
 
-        can_add = False
-
-        # See whether there are more clients in the line
-        if self.n_server is not None:
-            if self.users >= self.n_server:
-                can_add = True
-        elif self.users > 0:
-            can_add = True
-
         ########## SERVE ANOTHER CLIENT #############
-        if can_add:
+        # See whether there are more clients in the line (never with infinitely
+        # many servers)
+        if self.n_server is not None and self.users >= self.n_server:
             # Sample the service time
-            service_time, new_serv_id = self.servers.evalServTime(type="expovariate")
+            service_time, new_serv_id = self.servers.evalServTime()
             self.data.servicesList.append(service_time)
 
             new_served = self.queue[0]
+            # The clients in service are the first n_server ones (FIFO)
+            self.queue[self.n_server - 1].service_start = time
 
             # Update total costs (they will be 0 if not defined)
             self.data.tot_serv_costs += self.servers.costs[new_serv_id]
@@ -134,7 +140,7 @@ class MicroDataCenter(Queue):
                 self.data.n_usr_t.append((self.users, time))
                 self.data.count_types[pkt_type] += 1
 
-                new_pkt_id = f"{pkt_type}{self.data.count_types[pkt_type]}"
+                new_pkt_id = event_type[2]  # Packet handle
 
                 ## Create a record for the client
                 client = Client(pkt_type, time, new_pkt_id)
@@ -150,13 +156,12 @@ class MicroDataCenter(Queue):
                 # (new client always finds a server)
                 if self.n_server is None or self.users <= self.n_server:
                     # sample the service time
-                    service_time, serv_id = self.servers.evalServTime(
-                        type="expovariate"
-                    )
+                    service_time, serv_id = self.servers.evalServTime()
                     self.data.servicesList.append(service_time)
                     # service_time = 1 + random.uniform(0, SEVICE_TIME)
 
                     # schedule when the client will finish the server
+                    client.service_start = time
                     FES.put(
                         (time + service_time, [self.dep_name, client.type, serv_id])
                     )
@@ -193,34 +198,42 @@ class MicroDataCenter(Queue):
                 # Scedule arrival into cloud data center
                 # It will happen after a fixed propagation time
                 arr_time_cloud = time + self.propagation_time
-                FES.put((arr_time_cloud, ["arrival_cloud", pkt_type]))
+                FES.put((arr_time_cloud, ["arrival_cloud", pkt_type, event_type[2]]))
 
         else:
             # Unlimited length
             self.users += 1
             self.data.n_usr_t.append((self.users, time))
 
+            self.data.count_types[pkt_type] += 1
+
             # create a record for the client
-            client = Client(pkt_type, time)
+            client = Client(pkt_type, time, event_type[2])
+            client.addNewArrival(time)
+
+            if self.n_server is None:
+                # Infinitely many servers - the client is served immediately
+                self.serveInfinite(time, FES, client)
+                return
 
             # insert the record in the self.queue
             self.queue.append(client)
 
             # If there are less clients than servers, it means that the
             # new client can directly be served
-            if self.n_server is None or self.users <= self.n_server:
+            if self.users <= self.n_server:
                 # sample the service time
-                service_time, serv_id = self.servers.evalServTime(type="expovariate")
+                service_time, serv_id = self.servers.evalServTime()
                 self.data.servicesList.append(service_time)
                 # service_time = 1 + random.uniform(0, SEVICE_TIME)
 
                 # schedule when the client will finish the server
+                client.service_start = time
                 FES.put((time + service_time, [self.dep_name, client.type, serv_id]))
                 self.servers.makeBusy(serv_id)
 
-                if self.n_server is not None:
-                    # Update the beginning of the service
-                    self.data.serv_busy[serv_id]["begin_last_service"] = time
+                # Update the beginning of the service
+                self.data.serv_busy[serv_id]["begin_last_service"] = time
 
                 # Update the waiting time for the client which starts to be served straight away
                 # Get the client - not extracting:
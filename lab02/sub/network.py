@@ -0,0 +1,608 @@
+import heapq
+import random
+import bisect
+from collections import deque
+from itertools import count
+import numpy as np
+from sub.distributions import Sampler
+from sub.records import PacketRecords, PKT_CLASSES
+
+"""
+Generic queueing network engine.
+
+The network is a set of nodes identified by integer ids (in order of
+creation); each node is a FIFO multi-server queue with:
+- n_server identical servers (None -> infinite servers)
+- queue_len: maximum number of packets in the node, including the ones in
+service (None -> infinite buffer)
+- service time distribution (see 'sub.distributions')
+- overflow: node receiving the packets which find the node full (None -> the
+packets are lost)
+- prop_delay: propagation time of the packets leaving the node towards
+another node (after the service or on overflow)
+
+The packets enter the network from sources (Poisson process or arrival
+process object, e.g., 'NHPP') attached to the nodes, with class 'B' with
+probability 'fract' and 'A' otherwise. After the service, the next node is
+chosen by the routing rule of the node, for each class:
+- None: the packet leaves the network
+- node id: the packet always goes to that node
+- dict {node id: probability} or row of the routing matrix (sequence of N
+probabilities): the packet goes to each node with the given probability and
+leaves the network with the remaining probability
+
+The FES is a heap (heapq) of tuples (time, sequence number, event kind, node
+id, packet), so that the cost of each event grows as log(n. of events) and
+the dispatch does not depend on the number of nodes; the state of the nodes is
+kept in lists indexed by node id. A packet is a list [id, class code,
+generation time, arrival time at the current node, service start].
+"""
+
+# Event kinds
+ARRIVAL = 0
+DEPARTURE = 1
+SOURCE = 2
+
+
+# ******************************************************************************
+# Network
+# ******************************************************************************
+class Network:
+    def __init__(self, records_path=None):
+        """
+        Network
+        ---
+        Queueing network with arbitrary topology (see the module documentation).
+
+        ### Input parameters
+        - records_path: if not None, path of the file where the end-to-end
+        records are spilled (see 'PacketRecords')
+
+        ### Attributes
+        - names: names of the nodes
+        - n_server, queue_len, serv_t, overflow, prop_delay: parameters of the
+        nodes (lists indexed by node id)
+        - sources: list of tuples (node id, arr_t, fract, None) or, for the
+        pooled sources, (node ids, total arr_t, fracts, cumulative weights)
+        - e2e: 'PacketRecords' with one record per packet leaving the network
+        after a service (arrival = generation time, stage = last node)
+        - time: current simulated time
+        """
+        self.names = []
+        self.n_server = []
+        self.queue_len = []
+        self.serv_t = []
+        self.serv_dist = []
+        self.dist_params = []
+        self.overflow = []
+        self.prop_delay = []
+        self.rules = []
+        self.sources = []
+        self.records_path = records_path
+
+        self.e2e = None
+        self.time = 0.0
+
+    def __len__(self):
+        return len(self.names)
+
+    def addNode(
+        self,
+        serv_t,
+        n_server=1,
+        queue_len=None,
+        serv_dist="expovariate",
+        dist_params=None,
+        overflow=None,
+        prop_delay=0.0,
+        name=None,
+    ):
+        """
+        addNode
+        ---
+        Add a node to the network and return its id (see the module
+        documentation for the parameters); the packets are routed out of the
+        network until 'setRouting' is called.
+        """
+        if n_server is not None and n_server < 1:
+            raise ValueError("The number of servers must be at least 1!")
+        if queue_len is not None and n_server is not None:
+            # Cannot have less places than servers
+            queue_len = max(queue_len, n_server)
+        node = len(self.names)
+        self.names.append(f"node_{node}" if name is None else name)
+        self.n_server.append(n_server)
+        self.queue_len.append(queue_len)
+        self.serv_t.append(serv_t)
+        self.serv_dist.append(serv_dist)
+        self.dist_params.append({} if dist_params is None else dist_params)
+        self.overflow.append(overflow)
+        self.prop_delay.append(prop_delay)
+        self.rules.append(None)
+        return node
+
+    def addSource(self, node, arr_t, fract=0.5):
+        """
+        addSource
+        ---
+        Attach a source of packets to 'node'.
+
+        ### Input parameters
+        - node: node id
+        - arr_t: average inter-arrival time (Poisson arrivals), or arrival
+        process providing the method 'nextArrival' (e.g., 'NHPP' object)
+        - fract: fraction of packets of type B
+        """
+        self.sources.append((node, arr_t, fract, None))
+
+    def addPooledSource(self, nodes, arr_t, fract=0.5):
+        """
+        addPooledSource
+        ---
+        Attach independent Poisson sources to the nodes 'nodes', generated as
+        one Poisson process with the total rate: at each arrival, the node is
+        chosen with probability proportional to its rate. The FES contains one
+        event for all the sources, instead of one per node.
+
+        ### Input parameters
+        - nodes: list of node ids
+        - arr_t: average inter-arrival time of each node (list, or one value
+        for all the nodes)
+        - fract: fraction of packets of type B of each node (list, or one
+        value for all the nodes)
+        """
+        n = len(nodes)
+        arr_t = np.broadcast_to(np.asarray(arr_t, dtype=float), (n,))
+        fract = np.broadcast_to(np.asarray(fract, dtype=float), (n,))
+        if np.any(arr_t <= 0):
+            raise ValueError("The inter-arrival times must be positive!")
+        rates = 1.0 / arr_t
+        cum = (np.cumsum(rates) / rates.sum()).tolist()
+        cum[-1] = 1.0
+        self.sources.append(
+            ([int(i) for i in nodes], 1.0 / rates.sum(), fract.tolist(), cum)
+        )
+
+    def setRouting(self, node, rule):
+        """
+        setRouting
+        ---
+        Set the routing rule of 'node': either one rule for all the classes or
+        a dict {class: rule}, being each rule None (leave the network), a node
+        id or the routing probabilities (dict {node id: probability} or
+        sequence of N probabilities).
+        """
+        self.rules[node] = rule
+
+    def setRoutingMatrix(self, P):
+        """
+        setRoutingMatrix
+        ---
+        Set the routing rules of all the nodes from the N x N routing matrix
+        'P' (P[i][j]: probability of going from node i to node j; the packets
+        leave the network with probability 1 - sum(P[i])). A dict
+        {class: matrix} gives class-based routing.
+        """
+        if isinstance(P, dict):
+            for node in range(len(self)):
+                self.setRouting(node, {c: P[c][node] for c in P})
+        else:
+            for node in range(len(self)):
+                self.setRouting(node, P[node])
+
+    def setOverflow(self, node, target):
+        """
+        setOverflow
+        ---
+        Send the packets finding 'node' full to the node 'target' (None -> the
+        packets are lost).
+        """
+        self.overflow[node] = target
+
+    def nodeId(self, name):
+        """
+        nodeId
+        ---
+        Return the id of the node called 'name'.
+        """
+        return self.names.index(name)
+
+    # ******************************************************************************
+    # Private
+
+    def compileRule(self, rule):
+        """
+        compileRule
+        ---
+        Translate one routing rule into None, a node id or the tuple (targets,
+        cumulative probabilities), where the target None means leaving.
+        """
+        if rule is None:
+            return None
+        if isinstance(rule, (int, np.integer)):
+            if not 0 <= rule < len(self):
+                raise ValueError(f"Invalid node id {rule} in the routing rules!")
+            return int(rule)
+        if not isinstance(rule, dict):
+            if len(rule) != len(self):
+                raise ValueError("The rows of the routing matrix must have N elements!")
+            rule = {j: p for j, p in enumerate(rule) if p > 0}
+
+        targets, cum = [], []
+        total = 0.0
+        for target, p in rule.items():
+            if not 0 <= target < len(self):
+                raise ValueError(f"Invalid node id {target} in the routing rules!")
+            if p < 0:
+                raise ValueError("The routing probabilities must be non-negative!")
+            total += p
+            targets.append(int(target))
+            cum.append(total)
+        if total > 1 + 1e-9:
+            raise ValueError("The routing probabilities must sum to at most 1!")
+        if total < 1 - 1e-9:
+            # The packets leave the network with the remaining probability
+            targets.append(None)
+            cum.append(1.0)
+        if len(targets) == 1:
+            return targets[0]
+        cum[-1] = 1.0
+        return targets, cum
+
+    def compileRouting(self):
+        """
+        compileRouting
+        ---
+        Compile the routing rules of all the nodes: list (by node id) of lists
+        (by class code) of compiled rules.
+        """
+        routes = []
+        for node, rule in enumerate(self.rules):
+            if isinstance(rule, dict) and set(rule) <= set(PKT_CLASSES):
+                by_class = [None] * len(PKT_CLASSES)
+                for c, code in PKT_CLASSES.items():
+                    by_class[code] = self.compileRule(rule.get(c))
+            else:
+                by_class = [self.compileRule(rule)] * len(PKT_CLASSES)
+            routes.append(by_class)
+
+        for node, over in enumerate(self.overflow):
+            if over is not None and not 0 <= over < len(self):
+                raise ValueError(f"Invalid overflow node {over} (node {node})!")
+        return routes
+
+    def reset(self):
+        """
+        reset
+        ---
+        Initialize the state and the measurements of all the nodes, the FES and
+        the random streams (the NumPy generators of the service times are
+        seeded from the 'random' module) and schedule the first arrival of each
+        source.
+        """
+        n = len(self)
+        self.routes = self.compileRouting()
+        self.samplers = [
+            Sampler(self.serv_dist[i], self.serv_t[i], **self.dist_params[i])
+            for i in range(n)
+        ]
+        self.FES = []
+        self.seq = count()
+        self.next_id = 0
+        self.time = 0.0
+
+        # State of the nodes
+        self.users = [0] * n
+        self.busy = [0] * n
+        self.waiting = [deque() for _ in range(n)]
+
+        # Measurements of the nodes
+        self.arr = [0] * n
+        self.dep = [0] * n
+        self.losses = [0] * n
+        self.overflows = [0] * n
+        self.started = [0] * n
+        self.delay = [0.0] * n
+        self.wait = [0.0] * n
+        self.ut = [0.0] * n
+        self.busy_time = [0.0] * n
+        self.oldT = [0.0] * n
+        self.e2e = PacketRecords(spill_path=self.records_path)
+
+        for src, (_, arr_t, _, _) in enumerate(self.sources):
+            first = arr_t.nextArrival() if hasattr(arr_t, "nextArrival") else 0.0
+            if first < float("inf"):
+                heapq.heappush(self.FES, (first, next(self.seq), SOURCE, src, None))
+
+    def advance(self, node, time):
+        """
+        advance
+        ---
+        Cumulate the time integrals of the number of packets and of the busy
+        servers of 'node' up to 'time'.
+        """
+        dt = time - self.oldT[node]
+        self.ut[node] += self.users[node] * dt
+        self.busy_time[node] += self.busy[node] * dt
+        self.oldT[node] = time
+
+    def startService(self, time, node, pkt):
+        """
+        startService
+        ---
+        Start the service of 'pkt' at 'node' and schedule its departure.
+        """
+        pkt[4] = time
+        self.started[node] += 1
+        self.wait[node] += time - pkt[3]
+        heapq.heappush(
+            self.FES,
+            (time + self.samplers[node](), next(self.seq), DEPARTURE, node, pkt),
+        )
+
+    def forward(self, time, node, target, pkt):
+        """
+        forward
+        ---
+        Send 'pkt' from 'node' to 'target' (after the propagation time).
+        """
+        heapq.heappush(
+            self.FES,
+            (time + self.prop_delay[node], next(self.seq), ARRIVAL, target, pkt),
+        )
+
+    def arrival(self, time, node, pkt):
+        """
+        arrival
+        ---
+        Arrival of 'pkt' at 'node': the packet is served, queued, sent to the
+        overflow node or lost.
+        """
+        self.advance(node, time)
+        self.arr[node] += 1
+
+        cap = self.queue_len[node]
+        if cap is not None and self.users[node] >= cap:
+            target = self.overflow[node]
+            if target is None:
+                self.losses[node] += 1
+            else:
+                self.overflows[node] += 1
+                self.forward(time, node, target, pkt)
+            return
+
+        self.users[node] += 1
+        pkt[3] = time
+        n_server = self.n_server[node]
+        if n_server is None or self.busy[node] < n_server:
+            self.busy[node] += 1
+            self.startService(time, node, pkt)
+        else:
+            self.waiting[node].append(pkt)
+
+    def departure(self, time, node, pkt):
+        """
+        departure
+        ---
+        End of the service of 'pkt' at 'node': the next waiting packet (if any)
+        is served and 'pkt' is routed.
+        """
+        self.advance(node, time)
+        self.dep[node] += 1
+        self.users[node] -= 1
+        self.delay[node] += time - pkt[3]
+
+        if self.waiting[node]:
+            self.startService(time, node, self.waiting[node].popleft())
+        else:
+            self.busy[node] -= 1
+
+        target = self.routes[node][pkt[1]]
+        if target is not None and target.__class__ is not int:
+            targets, cum = target
+            target = targets[bisect.bisect_right(cum, random.random())]
+        if target is None:
+            # The packet leaves the network
+            self.e2e.append(pkt[0], pkt[1], pkt[2], pkt[4], time, node)
+        else:
+            self.forward(time, node, target, pkt)
+
+    def generate(self, time, src):
+        """
+        generate
+        ---
+        New packet from the source 'src': schedule the next one and deliver
+        the packet to the node of the source.
+        """
+        node, arr_t, fract, cum = self.sources[src]
+        if hasattr(arr_t, "nextArrival"):
+            next_time = arr_t.nextArrival()
+        else:
+            next_time = time + random.expovariate(1.0 / arr_t)
+        if next_time < float("inf"):
+            heapq.heappush(self.FES, (next_time, next(self.seq), SOURCE, src, None))
+
+        if cum is not None:
+            # Pooled source - choose the node
+            i = bisect.bisect_right(cum, random.random())
+            node, fract = node[i], fract[i]
+
+        pkt_class = PKT_CLASSES["B"] if random.random() < fract else PKT_CLASSES["A"]
+        pkt = [self.next_id, pkt_class, time, time, time]
+        self.next_id += 1
+        self.arrival(time, node, pkt)
+
+    # ******************************************************************************
+    # Public
+
+    def run(self, sim_time):
+        """
+        run
+        ---
+        Simulate the network from an empty state until 'sim_time' (use
+        'random.seed' before calling it for reproducible runs) and return the
+        measurements (see 'results').
+        """
+        self.reset()
+        FES = self.FES
+        while FES and FES[0][0] <= sim_time:
+            time, _, kind, node, pkt = heapq.heappop(FES)
+            if kind == DEPARTURE:
+                self.departure(time, node, pkt)
+            elif kind == ARRIVAL:
+                self.arrival(time, node, pkt)
+            else:
+                self.generate(time, node)
+        self.time = sim_time
+        for node in range(len(self)):
+            self.advance(node, sim_time)
+        return self.results()
+
+    def results(self):
+        """
+        results
+        ---
+        Measurements of the current run.
+
+        ### Output parameters
+        - res: dict with
+          - names: names of the nodes
+          - arrivals, departures, losses, overflows: counts per node (arrays)
+          - loss_prob: losses / arrivals, per node
+          - avg_users: time average of the number of packets, per node
+          - avg_delay: average time in the node (waiting + service), per node
+          - avg_wait: average waiting time, per node
+          - avg_busy: time average of the number of busy servers, per node
+          - utilization: avg_busy / n_server (NaN for infinite servers)
+          - e2e: dict {class: {'count', 'mean', 'max'}} of the end-to-end
+          delays of the packets which left the network after a service
+        """
+        T = self.time
+        with np.errstate(divide="ignore", invalid="ignore"):
+            arrivals = np.array(self.arr)
+            departures = np.array(self.dep)
+            started = np.array(self.started)
+            avg_busy = np.array(self.busy_time) / T
+            n_server = np.array(
+                [np.nan if s is None else s for s in self.n_server], dtype=float
+            )
+            res = {
+                "names": list(self.names),
+                "arrivals": arrivals,
+                "departures": departures,
+                "losses": np.array(self.losses),
+                "overflows": np.array(self.overflows),
+                "loss_prob": np.array(self.losses) / arrivals,
+                "avg_users": np.array(self.ut) / T,
+                "avg_delay": np.array(self.delay) / departures,
+                "avg_wait": np.array(self.wait) / started,
+                "avg_busy": avg_busy,
+                "utilization": avg_busy / n_server,
+            }
+
+        res["e2e"] = {}
+        for c in PKT_CLASSES:
+            delays = self.e2e.delays(c)
+            res["e2e"][c] = {
+                "count": len(delays),
+                "mean": float(np.mean(delays)) if len(delays) > 0 else np.nan,
+                "max": float(np.max(delays)) if len(delays) > 0 else np.nan,
+            }
+        return res
+
+
+def edgeCloudNetwork(
+    fract,
+    arr_t=10.0,
+    serv_t_1=3.0,
+    q1_len=10,
+    n_serv_1=1,
+    serv_t_2=5.0,
+    q2_len=20,
+    n_serv_2=1,
+    serv_dist="expovariate",
+    dist_params=None,
+):
+    """
+    edgeCloudNetwork
+    ---
+    Build the network of 'main.py::run' (see its parameters): packets A leave
+    after the micro data center, packets B (and all the packets finding the
+    micro data center full) go to the cloud data center, after the propagation
+    time (0.2).
+    """
+    net = Network()
+    mdc = net.addNode(
+        serv_t_1, n_serv_1, q1_len, serv_dist, dist_params, prop_delay=0.2, name="mdc"
+    )
+    cdc = net.addNode(serv_t_2, n_serv_2, q2_len, serv_dist, dist_params, name="cdc")
+    net.setOverflow(mdc, cdc)
+    net.setRouting(mdc, {"A": None, "B": cdc})
+    net.addSource(mdc, arr_t, fract)
+    return net
+
+
+def fanInNetwork(
+    n_sites,
+    fract,
+    arr_t=10.0,
+    serv_t_1=3.0,
+    q1_len=10,
+    n_serv_1=1,
+    serv_t_2=5.0,
+    q2_len=20,
+    n_serv_2=1,
+    serv_dist="expovariate",
+    dist_params=None,
+):
+    """
+    fanInNetwork
+    ---
+    Build a network where 'n_sites' micro data centers (nodes 0, ...,
+    n_sites - 1, called 'mdc_<i>') forward to one cloud data center (node
+    n_sites, 'cdc'), with the same policy of 'edgeCloudNetwork'.
+
+    ### Input parameters
+    - n_sites: number of micro data centers
+    - fract: fraction of packets of type B of each site (list, or one value for
+    all the sites)
+    - arr_t: average inter-arrival time of each site (list, or one value for
+    all the sites); the items can also be arrival process objects (e.g.,
+    'NHPP'), in which case each site has its own source, otherwise the Poisson
+    sources are pooled (see 'Network.addPooledSource')
+    - serv_t_1, q1_len, n_serv_1: parameters of each micro data center
+    - serv_t_2, q2_len, n_serv_2: parameters of the cloud data center
+    - serv_dist, dist_params: service time distribution of all the nodes
+    """
+    if not isinstance(arr_t, (list, tuple, np.ndarray)):
+        arr_t = [arr_t] * n_sites
+    if not isinstance(fract, (list, tuple, np.ndarray)):
+        fract = [fract] * n_sites
+    if len(arr_t) != n_sites or len(fract) != n_sites:
+        raise ValueError("One value of 'arr_t' and 'fract' per site is needed!")
+
+    net = Network()
+    cdc = n_sites
+    for i in range(n_sites):
+        net.addNode(
+            serv_t_1,
+            n_serv_1,
+            q1_len,
+            serv_dist,
+            dist_params,
+            overflow=cdc,
+            prop_delay=0.2,
+            name=f"mdc_{i}",
+        )
+        net.setRouting(i, {"A": None, "B": cdc})
+    net.addNode(serv_t_2, n_serv_2, q2_len, serv_dist, dist_params, name="cdc")
+
+    poisson = [i for i in range(n_sites) if not hasattr(arr_t[i], "nextArrival")]
+    if len(poisson) > 0:
+        net.addPooledSource(
+            poisson, [arr_t[i] for i in poisson], [fract[i] for i in poisson]
+        )
+    for i in range(n_sites):
+        if hasattr(arr_t[i], "nextArrival"):
+            net.addSource(i, arr_t[i], fract[i])
+    return net
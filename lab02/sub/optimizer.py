@@ -0,0 +1,190 @@
+import os
+import math
+from itertools import combinations_with_replacement
+from multiprocessing import Pool
+import numpy as np
+from sub.search import confInt, replicationSeeds
+
+"""
+Optimization of the server types of a data center under a cost budget and a
+constraint on the delay of type A packets.
+
+A configuration is the (sorted) list of the average service times of the
+servers, chosen among a set of available server types.
+The candidates are first screened analytically ('screen' function), then the
+survivors are raced by successive halving: all of them are simulated with a
+short simulation time, the worst ones are discarded and the simulation time
+of the remaining ones is multiplied by 'eta', until the full simulation time
+is reached.
+
+The simulations are carried out by a user-defined function
+'evaluate(serv_t, sim_time, seed)' returning the tuple (cost, delay), being
+'delay' the performance measure compared with the target (e.g., a quantile of
+the delay of type A packets); it must be defined at module level, since it is
+run in a pool of processes.
+"""
+
+
+def serverConfigs(serv_types, n_serv):
+    """
+    serverConfigs
+    ---
+    List all the assignments of server types (with repetitions, order does not
+    matter) to 'n_serv' servers.
+    """
+    return [list(c) for c in combinations_with_replacement(sorted(serv_types), n_serv)]
+
+
+def runBatch(evaluate, jobs, n_proc):
+    """
+    runBatch
+    ---
+    Run evaluate(*job) for all the jobs, in parallel if n_proc > 1.
+    """
+    if n_proc > 1 and len(jobs) > 1:
+        with Pool(min(n_proc, len(jobs))) as pool:
+            return pool.starmap(evaluate, jobs)
+    return [evaluate(*job) for job in jobs]
+
+
+def optimizeServers(
+    evaluate,
+    serv_types,
+    n_serv,
+    max_cost,
+    target,
+    sim_time,
+    screen=None,
+    min_sim_time=None,
+    eta=2,
+    n_rep=3,
+    conf_level=0.95,
+    n_proc=None,
+    seed=1,
+):
+    """
+    optimizeServers
+    ---
+    Find the cheapest assignment of server types such that the cost is below
+    'max_cost' and the delay measure is below 'target'.
+
+    ### Input parameters
+    - evaluate: function (serv_t, sim_time, seed) -> (cost, delay)
+    - serv_types: available server types (average service times)
+    - n_serv: number of servers
+    - max_cost: maximum cost (over 'sim_time')
+    - target: threshold on the delay measure
+    - sim_time: simulation time of the final evaluations (the costs of the
+    shorter runs are rescaled to this time)
+    - screen: function serv_t -> dict with a lower bound on the cost ('cost')
+    and an estimate of the delay measure ('delay'), both possibly None; the
+    configurations exceeding the budget or the target are discarded without
+    being simulated
+    - min_sim_time: simulation time of the first round (default: such that
+    the number of configurations is halved down to one at 'sim_time')
+    - eta: reduction factor of the number of configurations at each round
+    - n_rep: number of replications per configuration at each round (the same
+    seeds are used for all the configurations)
+    - conf_level: confidence level used to discard the configurations which
+    violate the constraints
+    - n_proc: number of processes (default: number of CPUs)
+    - seed: seed used to generate the seeds of the replications
+
+    ### Output parameters
+    - res: dict containing:
+      - serv_t: best configuration (None if no configuration is feasible)
+      - cost, delay: average cost and delay measure of the best configuration
+      in the last round
+      - n_screened: number of configurations discarded by the screening
+      - n_runs: total number of simulation runs
+      - rounds: list (one element per round) of dicts with the simulation time
+      ('sim_time') and the results of each configuration ('results': list of
+      dicts with keys serv_t, cost, cost_int, delay, delay_int)
+    """
+    if eta < 2:
+        raise ValueError("The reduction factor 'eta' must be >= 2!")
+    if n_proc is None:
+        n_proc = os.cpu_count()
+
+    candidates = serverConfigs(serv_types, n_serv)
+    n_configs = len(candidates)
+    if screen is not None:
+        survivors = []
+        for serv_t in candidates:
+            est = screen(serv_t)
+            if est.get("cost") is not None and est["cost"] > max_cost:
+                continue
+            if est.get("delay") is not None and est["delay"] > target:
+                continue
+            survivors.append(serv_t)
+        candidates = survivors
+    n_screened = n_configs - len(candidates)
+
+    if min_sim_time is None:
+        n_rounds = max(math.ceil(math.log(max(len(candidates), 1), eta)), 0)
+        min_sim_time = sim_time / eta**n_rounds
+
+    seeds = replicationSeeds(seed, n_rep)
+    results = []
+    rounds = []
+    n_runs = 0
+    round_time = min_sim_time
+    while len(candidates) > 0:
+        round_time = min(round_time, sim_time)
+        jobs = [(serv_t, round_time, s) for serv_t in candidates for s in seeds]
+        outputs = runBatch(evaluate, jobs, n_proc)
+        n_runs += len(jobs)
+
+        results = []
+        for i, serv_t in enumerate(candidates):
+            out = np.array(outputs[i * n_rep : (i + 1) * n_rep], dtype=float)
+            # Costs are accumulated in time - rescale them to the full sim. time
+            cost, cost_int = confInt(out[:, 0] * sim_time / round_time, conf_level)
+            delay, delay_int = confInt(out[:, 1], conf_level)
+            results.append(
+                {
+                    "serv_t": serv_t,
+                    "cost": cost,
+                    "cost_int": cost_int,
+                    "delay": delay,
+                    "delay_int": delay_int,
+                }
+            )
+        rounds.append({"sim_time": round_time, "results": results})
+
+        # Discard the configurations which violate the constraints (significantly)
+        results = [
+            r
+            for r in results
+            if r["cost_int"][0] <= max_cost and r["delay_int"][0] <= target
+        ]
+        # Ranking: configurations meeting the constraints on average first, then
+        # by increasing cost
+        results.sort(
+            key=lambda r: (r["cost"] > max_cost or r["delay"] >= target, r["cost"])
+        )
+
+        if round_time >= sim_time or len(results) <= 1:
+            if round_time < sim_time and len(results) == 1:
+                # Confirm the last configuration with the full simulation time
+                candidates = [results[0]["serv_t"]]
+                round_time = sim_time
+                continue
+            break
+        candidates = [r["serv_t"] for r in results[: math.ceil(len(results) / eta)]]
+        round_time *= eta
+
+    best = None
+    if len(results) > 0:
+        r = results[0]
+        if r["cost"] <= max_cost and r["delay"] < target:
+            best = r
+
+    return {
+        "serv_t": None if best is None else best["serv_t"],
+        "cost": None if best is None else best["cost"],
+        "delay": None if best is None else best["delay"],
+        "n_screened": n_screened,
+        "n_runs": n_runs,
+        "rounds": rounds,
+    }
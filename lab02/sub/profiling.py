@@ -0,0 +1,145 @@
+import time as tm
+
+"""
+Instrumentation of the simulation loop.
+
+A 'RunProfile' is attached to a run by replacing the event handlers with
+timed wrappers (e.g., instance attributes shadowing the methods of the
+queues) and by watching the FES: when profiling is disabled nothing is
+attached, so the loop runs the original code with no overhead.
+"""
+
+
+class RunProfile:
+    def __init__(self):
+        """
+        RunProfile
+        ---
+        Counters and timers of one simulation run.
+
+        ### Attributes
+        - event_counts: dict {event name: number of events extracted from the FES}
+        - handler_calls: dict {handler: number of calls}
+        - handler_time: dict {handler: cumulative wall time [s]}; the time of a
+        handler includes the handlers it calls (e.g., 'arrival' includes
+        'addClient')
+        - fes_max: maximum size of the FES (high-water mark)
+        - wall_time: wall time of the loop [s]
+        - sim_time: simulated time at the end of the loop
+        """
+        self.event_counts = {}
+        self.handler_calls = {}
+        self.handler_time = {}
+        self.fes_max = 0
+        self.wall_time = 0.0
+        self.sim_time = 0.0
+        self.wall_start = None
+
+    def wrap(self, func, name):
+        """
+        wrap
+        ---
+        Return a version of 'func' which counts its calls and measures their
+        cumulative wall time under the key 'name'.
+        """
+        self.handler_calls.setdefault(name, 0)
+        self.handler_time.setdefault(name, 0.0)
+
+        def timed(*args, **kwargs):
+            start = tm.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.handler_time[name] += tm.perf_counter() - start
+                self.handler_calls[name] += 1
+
+        return timed
+
+    def attach(self, obj, prefix, handlers=("arrival", "departure", "addClient")):
+        """
+        attach
+        ---
+        Time the methods 'handlers' of 'obj' (e.g., a 'Queue'); the keys are
+        '<prefix>.<handler>'.
+        """
+        for h in handlers:
+            setattr(obj, h, self.wrap(getattr(obj, h), f"{prefix}.{h}"))
+
+    def watchFES(self, FES):
+        """
+        watchFES
+        ---
+        Count the extracted events by name (event_type[0]) and track the
+        maximum size of the FES.
+        """
+        put, get = FES.put, FES.get
+
+        def watchedPut(item, *args, **kwargs):
+            put(item, *args, **kwargs)
+            self.fes_max = max(self.fes_max, FES.qsize())
+
+        def watchedGet(*args, **kwargs):
+            item = get(*args, **kwargs)
+            name = item[1][0]
+            self.event_counts[name] = self.event_counts.get(name, 0) + 1
+            return item
+
+        FES.put = watchedPut
+        FES.get = watchedGet
+        self.fes_max = max(self.fes_max, FES.qsize())
+
+    def start(self):
+        self.wall_start = tm.perf_counter()
+
+    def stop(self, sim_time):
+        self.wall_time += tm.perf_counter() - self.wall_start
+        self.sim_time = sim_time
+
+    def summary(self):
+        """
+        summary
+        ---
+        Return the measurements as a dict, with the derived quantities:
+        - n_events: total number of events
+        - events_per_wall_s: events per second (wall time)
+        - events_per_sim_time: events per simulated time unit
+        - wall_per_sim_time: wall time per simulated time unit
+        - handler_mean: average wall time per call of each handler
+        """
+        n_events = sum(self.event_counts.values())
+        wall, sim = self.wall_time, self.sim_time
+        return {
+            "event_counts": dict(self.event_counts),
+            "handler_calls": dict(self.handler_calls),
+            "handler_time": dict(self.handler_time),
+            "handler_mean": {
+                h: self.handler_time[h] / n if n > 0 else 0.0
+                for h, n in self.handler_calls.items()
+            },
+            "fes_max": self.fes_max,
+            "n_events": n_events,
+            "wall_time": self.wall_time,
+            "sim_time": self.sim_time,
+            "events_per_wall_s": n_events / wall if wall > 0 else 0.0,
+            "events_per_sim_time": n_events / sim if sim > 0 else 0.0,
+            "wall_per_sim_time": wall / sim if sim > 0 else 0.0,
+        }
+
+    def __str__(self):
+        s = self.summary()
+        lines = [
+            f"Events: {s['n_events']} in {s['wall_time']:.3f} s (wall), "
+            f"{s['sim_time']:.1f} (sim. time)",
+            f"Events per second (wall): {s['events_per_wall_s']:.0f}",
+            f"Events per sim. time unit: {s['events_per_sim_time']:.3f}",
+            f"FES high-water mark: {s['fes_max']}",
+        ]
+        for name, n in sorted(s["event_counts"].items()):
+            lines.append(f"  {name:<20} {n:>10}")
+        lines.append("Handlers (calls, cumulative time [s], mean time [us]):")
+        for h, n in s["handler_calls"].items():
+            lines.append(
+                f"  {h:<20} {n:>10} {s['handler_time'][h]:>10.3f}"
+                f" {1e6 * s['handler_mean'][h]:>10.2f}"
+            )
+        return "\n".join(lines)
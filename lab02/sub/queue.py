@@ -4,6 +4,7 @@ from queue import Queue, PriorityQueue
 from sub.measurements import Measure
 from sub.client import Client
 from sub.server import Server
+from sub.records import PacketHandles
 
 DEBUG = False
 
@@ -19,6 +20,12 @@ class Queue:
         fract=0.5,
         costs=False,
         in_transient=False,
+        serv_dist="expovariate",
+        dist_params=None,
+        stage=0,
+        records_path=None,
+        handles=None,
+        server_policy="first_idle",
     ):
         """
         Queue
@@ -28,16 +35,25 @@ class Queue:
 
         ### Input parameters
         - serv_t: average service time (1/serv_rate)
-        - arr_t: average inter-arrival time (1/arr_rate)
+        - arr_t: average inter-arrival time (1/arr_rate), or arrival process
+        providing the method 'nextArrival' (e.g., 'NHPP' object) or
+        'nextPacket' (arrival time and packet type, e.g., 'TraceArrivals' object)
         - queue_len: maximum queue length (if None then infinite queue)
         - n_server: number of servers (if None then infinite queue)
-        - servers: policy initialization
         - event_names: list containing 2 elements - 1st one is the name assigned to the arrivals,
         2nd one is the one assigned to the departure
         - fract: fraction of packets of type B
         - costs: bool indicating whether server costs are to be used
         - in_transient: bool specifying whether the queue is currently in the initial transient;
         if it is, the measurements are not stored
+        - serv_dist: service time distribution (see 'sub.distributions')
+        - dist_params: dict of shape parameters of the service time distribution
+        - stage: index of the queue in the network (stored in the packet records)
+        - records_path: if not None, path of the file where the packet records are
+        spilled (see 'PacketRecords')
+        - handles: 'PacketHandles' registry shared by the queues of the network
+        (a new one is created if None)
+        - server_policy: policy for the choice of the server (see 'Server')
 
         ### Attributes
         - serv_t: average service time
@@ -48,7 +64,11 @@ class Queue:
         - arr_name: name given to the arrival of the specific queue
         - dep_name: name given to the departure of the specific queue
         - data: 'Measure' class object, used to make and store KPI
-        - queue: list containing current users
+        - queue: list containing current users (with infinitely many servers it
+        stays empty, see 'in_service')
+        - in_service: with infinitely many servers, dict {packet handle: client}
+        of the clients in the system (all in service); the departure events
+        carry the packet handle instead of the server id
         - users: variable tracking the length of the queue
         - servers: 'Server' class object, containing the server(s) and allowing to use them
         - types: list of valid packet types
@@ -59,19 +79,32 @@ class Queue:
         self.serv_t = serv_t
         self.arr_t = arr_t
         self.n_server = n_server
-        self.queue_len = max(
-            queue_len, n_server
-        )  # Used to force 'valid' queues (cannot have queue with less places than total servers)
+        # Used to force 'valid' queues (cannot have queue with less places than total
+        # servers); with infinitely many servers the buffer is never used
+        if queue_len is None or n_server is None:
+            self.queue_len = None
+        else:
+            self.queue_len = max(queue_len, n_server)
 
         self.arr_name = event_names[0]
         self.dep_name = event_names[1]
 
         self.types = ["A", "B"]
-        self.data = Measure(0, 0, 0, 0, 0, 0, n_server)
+        self.data = Measure(0, 0, 0, 0, 0, 0, n_server, records_path=records_path)
+        self.stage = stage
+        self.handles = PacketHandles() if handles is None else handles
 
         self.queue = []
+        self.in_service = {}
         self.users = len(self.queue)
-        self.servers = Server(n_server, serv_t, costs=costs)
+        self.servers = Server(
+            n_server,
+            serv_t,
+            policy=server_policy,
+            costs=costs,
+            distribution=serv_dist,
+            dist_params=dist_params,
+        )
 
         self.fract = fract
 
@@ -97,7 +130,7 @@ class Queue:
                 self.data.n_usr_t.append((self.users, time))
                 self.data.count_types[pkt_type] += 1
 
-                new_pkt_id = f"{pkt_type}{self.data.count_types[pkt_type]}"
+                new_pkt_id = event_type[2]  # Packet handle
 
                 ## Create a record for the client
                 client = Client(pkt_type, time, new_pkt_id)
@@ -120,13 +153,12 @@ class Queue:
                     # serv_id = self.servers.chooseNextServer()             # NOTE: Not needed in this lab - all servers have same capabilities
 
                     # sample the service time
-                    service_time, serv_id = self.servers.evalServTime(
-                        type="expovariate"
-                    )  # at the start was constant
+                    service_time, serv_id = self.servers.evalServTime()
                     self.data.servicesList.append(service_time)
                     # service_time = 1 + random.uniform(0, SEVICE_TIME)
 
                     # schedule when the client will finish the server
+                    client.service_start = time
                     FES.put(
                         (time + service_time, [self.dep_name, client.type, serv_id])
                     )
@@ -154,6 +186,8 @@ class Queue:
 
                 self.data.countLosses += 1
                 self.data.countLosses_t.append((self.data.countLosses, time))
+                # The packet leaves the network
+                self.handles.release(event_type[2])
 
                 if DEBUG:
                     print("> Loss at cloud!")
@@ -163,33 +197,36 @@ class Queue:
             self.data.n_usr_t.append((self.users, time))
             self.data.count_types[pkt_type] += 1
 
-            new_pkt_id = f"{pkt_type}{self.data.count_types[pkt_type]}"
+            new_pkt_id = event_type[2]  # Packet handle
 
             ## Create a record for the client
             client = Client(pkt_type, time, new_pkt_id)
             # Add new arrival for the new client (used to evaluate the queuing delay at the end)
             client.addNewArrival(time)
 
+            if self.n_server is None:
+                # Infinitely many servers - the client is served immediately
+                self.serveInfinite(time, FES, client)
+                return
+
             # insert the record in the queue
             self.queue.append(client)
 
             # If there are less clients than servers, it means that the
             # new client can directly be served
-            if self.n_server is None or self.users <= self.n_server:
+            if self.users <= self.n_server:
                 # sample the service time
-                service_time, serv_id = self.servers.evalServTime(
-                    type="expovariate"
-                )  # at the start was constant
+                service_time, serv_id = self.servers.evalServTime()
                 self.data.servicesList.append(service_time)
                 # service_time = 1 + random.uniform(0, SEVICE_TIME)
 
                 # schedule when the client will finish the server
+                client.service_start = time
                 FES.put((time + service_time, [self.dep_name, client.type, serv_id]))
                 self.servers.makeBusy(serv_id)
 
-                if self.n_server is not None:
-                    # Update the beginning of the service
-                    self.data.serv_busy[serv_id]["begin_last_service"] = time
+                # Update the beginning of the service
+                self.data.serv_busy[serv_id]["begin_last_service"] = time
 
                 # Update the waiting time for the client which starts to be served straight away
                 # Get the client - not extracting:
@@ -220,18 +257,28 @@ class Queue:
         self.data.arr += 1
         self.data.ut += self.users * (time - self.data.oldT)
         self.data.ut_in_time.append([time, self.data.ut])
-        self.data.avgBuffer += max(0, self.users - self.n_server) * (
-            time - self.data.oldT
-        )
+        self.data.avgBuffer += self.buffered() * (time - self.data.oldT)
         self.data.oldT = time
 
         # sample the time until the next event
-        inter_arrival = random.expovariate(lambd=1.0 / self.arr_t)
-
-        self.data.arrivalsList.append(inter_arrival)
+        if hasattr(self.arr_t, "nextPacket"):
+            # Trace-driven arrivals - the packet type is given
+            next_time, next_type = self.arr_t.nextPacket()
+        elif hasattr(self.arr_t, "nextArrival"):
+            next_time, next_type = self.arr_t.nextArrival(), self.rand_pkt_type()
+        else:
+            inter_arrival = random.expovariate(lambd=1.0 / self.arr_t)
+            next_time, next_type = time + inter_arrival, self.rand_pkt_type()
 
-        # schedule the next arrival
-        FES.put((time + inter_arrival, [self.arr_name, self.rand_pkt_type()]))
+        # schedule the next arrival (if the arrival process is not over)
+        if next_time < float("inf"):
+            self.data.arrivalsList.append(next_time - time)
+            FES.put(
+                (
+                    next_time,
+                    [self.arr_name, next_type, self.handles.register(next_time)],
+                )
+            )
 
         ################################
         # This method will check the possibility to add the packet
@@ -262,63 +309,64 @@ class Queue:
         self.data.dep += 1
         self.data.ut += self.users * (time - self.data.oldT)
         self.data.ut_in_time.append([time, self.data.ut])
-        self.data.avgBuffer += max(0, self.users - self.n_server) * (
-            time - self.data.oldT
-        )
+        self.data.avgBuffer += self.buffered() * (time - self.data.oldT)
 
         # Update time
         self.data.oldT = time
 
-        if len(self.queue) > 0:
+        client = None
+        if self.n_server is None:
+            client = self.departInfinite(time, event_type)
+        elif len(self.queue) > 0:
             # get the first element from the self.queue
             client = self.queue.pop(0)
 
             # Make its server idle
             self.servers.makeIdle(serv_id)
 
-            if self.n_server is not None:
-                # Update cumulative server busy time
+            # Update cumulative server busy time
 
-                # Add to the cumulative time the time difference between now (service end)
-                # and the beginning of the service
-                # print(data.serv_busy[serv_id]['cumulative_time'])
-                self.data.serv_busy[serv_id]["cumulative_time"] += (
-                    time - self.data.serv_busy[serv_id]["begin_last_service"]
-                )
+            # Add to the cumulative time the time difference between now (service end)
+            # and the beginning of the service
+            self.data.serv_busy[serv_id]["cumulative_time"] += (
+                time - self.data.serv_busy[serv_id]["begin_last_service"]
+            )
+
+        if client is not None:
             # do whatever we need to do when clients go away
             if client.type == "A":
                 self.data.delay_A += time - client.arrival_time
-                self.data.delay_pkt_A[client.pkt_ID] = time - client.arrival_times[-1]
             elif client.type == "B":
                 self.data.delay_B += time - client.arrival_time
-                self.data.delay_pkt_B[client.pkt_ID] = time - client.arrival_times[-1]
+            self.data.records.append(
+                client.pkt_ID,
+                client.type,
+                client.arrival_times[-1],
+                client.service_start,
+                time,
+                self.stage,
+            )
+            self.leaveSystem(client, time)
 
             self.data.delay += time - client.arrival_time
             self.data.delaysList.append(time - client.arrival_time)
             self.users -= 1
             self.data.n_usr_t.append((self.users, time))
 
-        can_add = False
-
-        # See whether there are more clients in the line
-        if self.n_server is not None:
-            if self.users >= self.n_server:
-                can_add = True
-        elif self.users > 0:
-            can_add = True
-
         ########## SERVE ANOTHER CLIENT #############
-        if can_add:
+        # See whether there are more clients in the line (never with infinitely
+        # many servers)
+        if self.n_server is not None and self.users >= self.n_server:
             # Sample the service time
-            service_time, new_serv_id = self.servers.evalServTime(
-                type="expovariate"
-            )  # at the start was constant
+            service_time, new_serv_id = self.servers.evalServTime()
             self.data.servicesList.append(service_time)
 
             # Update total costs (they will be 0 if not defined)
             self.data.tot_serv_costs += self.servers.costs[new_serv_id]
 
             new_served = self.queue[0]
+            # The clients in service are the first n_server ones (FIFO)
+            self.queue[self.n_server - 1].service_start = time
 
             self.data.waitingDelaysList.append(time - new_served.arrival_time)
             self.data.waitingDelaysList_no_zeros.append(time - new_served.arrival_time)
@@ -334,6 +382,62 @@ class Queue:
                 # Update the beginning of the service
                 self.data.serv_busy[new_serv_id]["begin_last_service"] = time
 
+    def buffered(self):
+        """
+        buffered
+        ---
+        Number of clients in the waiting line (0 with infinitely many servers).
+        """
+        if self.n_server is None:
+            return 0
+        return max(0, self.users - self.n_server)
+
+    def serveInfinite(self, time, FES, client):
+        """
+        serveInfinite
+        ---
+        Start the service of a new client with infinitely many servers: no
+        per-server state is kept, the client is stored in 'in_service' and its
+        departure event carries its packet handle.
+        """
+        service_time, _ = self.servers.evalServTime()
+        self.data.servicesList.append(service_time)
+        client.service_start = time
+        self.in_service[client.pkt_ID] = client
+        FES.put((time + service_time, [self.dep_name, client.type, client.pkt_ID]))
+        self.servers.makeBusy(0)
+
+        # No waiting
+        self.data.waitingDelaysList.append(0.0)
+        self.data.waiting_delays_times.append(time)
+
+    def departInfinite(self, time, event_type):
+        """
+        departInfinite
+        ---
+        End of the service of the client whose packet handle is in the
+        departure event, with infinitely many servers; return the client.
+        """
+        client = self.in_service.pop(event_type[2])
+        self.servers.makeIdle(0)
+        # Total busy time of the servers - only counted from the start of the
+        # measurements for the services ongoing at the end of the warm-up
+        start = max(client.service_start, self.data.serv_busy[0]["begin_last_service"])
+        self.data.serv_busy[0]["cumulative_time"] += time - start
+        return client
+
+    def leaveSystem(self, client, time):
+        """
+        leaveSystem
+        ---
+        Final departure of a packet from the network: its handle is released
+        and the end-to-end record (from the generation time) is stored.
+        """
+        origin = self.handles.release(client.pkt_ID)
+        self.data.e2e.append(
+            client.pkt_ID, client.type, origin, client.service_start, time, self.stage
+        )
+
     def rand_pkt_type(self, fract=None):
         """
         rand_pkt_type
@@ -361,9 +465,14 @@ class Queue:
             type_pkt = "A"
         return type_pkt
 
-    def endTransient(self):
+    def endTransient(self, time=None):
         """
         endTransient
         ---
         End the transient period by setting the flag 'in_transient' to False.
+        If 'time' is given, the measurements collected during the transient are
+        discarded (see 'Measure.reset').
         """
+        self.in_transient = False
+        if time is not None:
+            self.data.reset(time, self.users)
@@ -6,7 +6,7 @@ from queue import Queue, PriorityQueue
 from sub.measurements import Measure
 from sub.client import Client
 from sub.server import Server
-import matplotlib.pyplot as plt
+from sub.rendering import plt
 import scipy.stats as st
 
 """
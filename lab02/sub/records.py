@@ -0,0 +1,225 @@
+import os
+import numpy as np
+
+"""
+Columnar per-packet records.
+
+Each record describes the visit of one packet to one stage (data center):
+integer packet id, class (0 -> 'A', 1 -> 'B'), arrival time, start of the
+service, departure time and stage index (data center, or node id of a
+'sub.network.Network', up to 65535).
+The records are kept in a growable NumPy structured array; if a spill path is
+provided, full blocks are appended to a binary file on disk and accessed
+through a memory map, so that long simulations do not keep all the records
+in memory.
+"""
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("pkt_id", "<i8"),
+        ("pkt_class", "u1"),
+        ("arrival", "<f8"),
+        ("service_start", "<f8"),
+        ("departure", "<f8"),
+        ("stage", "<u2"),
+    ]
+)
+PKT_CLASSES = {"A": 0, "B": 1}
+
+
+# ******************************************************************************
+# PacketRecords
+# ******************************************************************************
+class PacketRecords:
+    def __init__(self, capacity=1024, spill_path=None, block_size=1 << 20):
+        """
+        PacketRecords
+        ---
+        Columnar storage of per-packet records (see RECORD_DTYPE).
+
+        ### Input parameters
+        - capacity: initial number of rows of the in-memory array (doubled when
+        full, if no spill path is given)
+        - spill_path: if not None, path of the binary file where the records are
+        moved once 'block_size' rows are in memory (the file is overwritten)
+        - block_size: number of rows kept in memory before spilling
+
+        ### Attributes
+        - buffer: in-memory structured array
+        - n_buffer: number of valid rows in the buffer
+        - n_spilled: number of rows moved to the spill file
+        """
+        self.spill_path = spill_path
+        self.block_size = block_size
+        if spill_path is not None:
+            capacity = block_size
+            # Start from an empty file
+            open(spill_path, "wb").close()
+        self.buffer = np.empty(capacity, dtype=RECORD_DTYPE)
+        self.n_buffer = 0
+        self.n_spilled = 0
+
+    def __len__(self):
+        return self.n_spilled + self.n_buffer
+
+    def append(self, pkt_id, pkt_class, arrival, service_start, departure, stage=0):
+        """
+        append
+        ---
+        Add one record; 'pkt_class' is either 'A'/'B' or the integer code.
+        """
+        if self.n_buffer == len(self.buffer):
+            if self.spill_path is not None:
+                self.spill()
+            else:
+                self.buffer = np.resize(self.buffer, 2 * len(self.buffer))
+        if isinstance(pkt_class, str):
+            pkt_class = PKT_CLASSES[pkt_class]
+        self.buffer[self.n_buffer] = (
+            pkt_id,
+            pkt_class,
+            arrival,
+            service_start,
+            departure,
+            stage,
+        )
+        self.n_buffer += 1
+
+    def spill(self):
+        """
+        spill
+        ---
+        Append the in-memory rows to the spill file and empty the buffer.
+        """
+        with open(self.spill_path, "ab") as f:
+            self.buffer[: self.n_buffer].tofile(f)
+        self.n_spilled += self.n_buffer
+        self.n_buffer = 0
+
+    def truncateSpill(self):
+        """
+        truncateSpill
+        ---
+        Drop the rows of the spill file beyond the first 'n_spilled' ones (e.g.,
+        the ones written after a checkpoint, when resuming from it).
+        """
+        if self.spill_path is None:
+            return
+        size = self.n_spilled * RECORD_DTYPE.itemsize
+        if (
+            not os.path.exists(self.spill_path)
+            or os.path.getsize(self.spill_path) < size
+        ):
+            raise ValueError(f"The spill file {self.spill_path} is incomplete!")
+        os.truncate(self.spill_path, size)
+
+    def spilled(self):
+        """
+        spilled
+        ---
+        Memory map of the records already moved to the spill file.
+        """
+        if self.n_spilled == 0:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.memmap(
+            self.spill_path, dtype=RECORD_DTYPE, mode="r", shape=(self.n_spilled,)
+        )
+
+    def column(self, name):
+        """
+        column
+        ---
+        Return the array with the values of the column 'name' for all the
+        records (in order of insertion).
+        """
+        col = self.buffer[name][: self.n_buffer]
+        if self.n_spilled == 0:
+            return col.copy()
+        return np.concatenate([self.spilled()[name], col])
+
+    def table(self, pkt_class=None):
+        """
+        table
+        ---
+        Return all the records (optionally, only the ones of class 'pkt_class')
+        as a structured array.
+        """
+        if self.n_spilled == 0:
+            rec = self.buffer[: self.n_buffer].copy()
+        else:
+            rec = np.concatenate([self.spilled(), self.buffer[: self.n_buffer]])
+        if pkt_class is not None:
+            if isinstance(pkt_class, str):
+                pkt_class = PKT_CLASSES[pkt_class]
+            rec = rec[rec["pkt_class"] == pkt_class]
+        return rec
+
+    def delays(self, pkt_class=None):
+        """
+        delays
+        ---
+        Return the time spent in the stage (departure - arrival) by the packets.
+        """
+        rec = self.table(pkt_class)
+        return rec["departure"] - rec["arrival"]
+
+    def save(self, path):
+        """
+        save
+        ---
+        Save all the records as a '.npy' file.
+        """
+        np.save(path, self.table())
+
+    def remove(self):
+        """
+        remove
+        ---
+        Delete the spill file (if any).
+        """
+        if self.spill_path is not None and os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+
+
+# ******************************************************************************
+# PacketHandles
+# ******************************************************************************
+class PacketHandles:
+    def __init__(self):
+        """
+        PacketHandles
+        ---
+        Registry of the packets in flight in a network of queues. Each packet
+        receives an integer handle when it is generated; the handle travels with
+        the packet in the FES events between the stages, and it is released when
+        the packet leaves the system (or is dropped), returning the generation
+        time, so that the end-to-end delay is obtained in O(1).
+
+        ### Attributes
+        - next_handle: handle assigned to the next packet
+        - origin: dict {handle: generation time} of the packets in flight
+        """
+        self.next_handle = 0
+        self.origin = {}
+
+    def __len__(self):
+        return len(self.origin)
+
+    def register(self, time):
+        """
+        register
+        ---
+        Assign a new handle to a packet generated at 'time'.
+        """
+        handle = self.next_handle
+        self.next_handle += 1
+        self.origin[handle] = time
+        return handle
+
+    def release(self, handle):
+        """
+        release
+        ---
+        Remove the packet from the registry and return its generation time.
+        """
+        return self.origin.pop(handle)
@@ -0,0 +1,202 @@
+import os
+from multiprocessing import Pool, shared_memory
+import numpy as np
+
+"""
+Lazy access to matplotlib.
+
+'plt' can be used as 'matplotlib.pyplot', but the module is only imported
+when the first figure is drawn, so that simulation-only runs (and the worker
+processes of a pool) never load matplotlib.
+
+In batch mode (environment variable SIM_BATCH=1, or 'setBatchMode') the
+figures are rendered headless with the Agg backend: 'plt.show()' closes them
+instead of opening a window, so only the saved images are produced.
+
+'FigureJobs' renders many figures in parallel: the plotting methods of the
+source objects (e.g., 'Measure') are run in a pool of processes working in
+batch mode. The lists of numbers of the sources are converted to arrays once
+and placed in shared memory, the other attributes are pickled.
+"""
+
+BATCH = os.environ.get("SIM_BATCH", "0") not in ["", "0"]
+
+
+class LazyPyplot:
+    def __init__(self):
+        """
+        LazyPyplot
+        ---
+        Proxy of 'matplotlib.pyplot', imported at the first attribute access.
+        """
+        self.module = None
+
+    def load(self):
+        """
+        load
+        ---
+        Import pyplot (selecting the Agg backend in batch mode) and return it.
+        """
+        if self.module is None:
+            import matplotlib
+
+            if BATCH:
+                matplotlib.use("Agg")
+            import matplotlib.pyplot
+
+            self.module = matplotlib.pyplot
+        return self.module
+
+    def show(self, *args, **kwargs):
+        """
+        show
+        ---
+        Display the figures, or close them in batch mode.
+        """
+        if BATCH:
+            self.load().close("all")
+        else:
+            self.load().show(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+
+plt = LazyPyplot()
+
+
+def setBatchMode(batch=True):
+    """
+    setBatchMode
+    ---
+    Enable (or disable) the headless batch mode. If pyplot was already
+    imported, its backend is switched accordingly.
+    """
+    global BATCH
+    BATCH = batch
+    if batch and plt.module is not None:
+        plt.module.switch_backend("Agg")
+
+
+# ******************************************************************************
+# FigureJobs
+# ******************************************************************************
+class FigureJobs:
+    def __init__(self, skip=()):
+        """
+        FigureJobs
+        ---
+        Queue of figures to be rendered in parallel (in batch mode, so only
+        the figures saved to file are produced).
+
+        ### Input parameters
+        - skip: names of the attributes of the sources not needed by the plotting
+        methods (they are not sent to the workers)
+        """
+        self.skip = set(skip)
+        self.sources = []
+        self.jobs = []
+
+    def add(self, source, method, **kwargs):
+        """
+        add
+        ---
+        Schedule the call source.method(**kwargs).
+        """
+        for i, s in enumerate(self.sources):
+            if s is source:
+                break
+        else:
+            self.sources.append(source)
+            i = len(self.sources) - 1
+        self.jobs.append((i, method, kwargs))
+
+    def export(self, shms):
+        """
+        export
+        ---
+        Return the description of the sources sent to the workers: for each one,
+        the tuple (class, pickled attributes, shared arrays {name: (shared memory
+        name, shape)}). The created shared memory blocks are appended to 'shms'.
+        """
+        specs = []
+        for source in self.sources:
+            state = {}
+            arrays = {}
+            for name, value in vars(source).items():
+                if name in self.skip:
+                    continue
+                if isinstance(value, list):
+                    try:
+                        arr = np.asarray(value, dtype=float)
+                    except (TypeError, ValueError):
+                        state[name] = value
+                        continue
+                    shm = shared_memory.SharedMemory(
+                        create=True, size=max(arr.nbytes, 1)
+                    )
+                    shms.append(shm)
+                    np.ndarray(arr.shape, dtype=float, buffer=shm.buf)[...] = arr
+                    arrays[name] = (shm.name, arr.shape)
+                else:
+                    state[name] = value
+            specs.append((type(source), state, arrays))
+        return specs
+
+    def render(self, n_proc=None):
+        """
+        render
+        ---
+        Render all the scheduled figures and empty the queue; return the list
+        of the 'img_name' arguments of the jobs.
+        """
+        if n_proc is None:
+            n_proc = os.cpu_count()
+        n_proc = max(min(n_proc, len(self.jobs)), 1)
+        shms = []
+        try:
+            specs = self.export(shms)
+            with Pool(n_proc, initializer=attachSources, initargs=(specs,)) as pool:
+                out = pool.map(renderJob, self.jobs, chunksize=1)
+        finally:
+            for shm in shms:
+                shm.close()
+                shm.unlink()
+        self.sources = []
+        self.jobs = []
+        return out
+
+
+# Sources rebuilt in the worker processes (and their shared memory blocks)
+worker_sources = []
+worker_shms = []
+
+
+def attachSources(specs):
+    """
+    attachSources
+    ---
+    Initializer of the workers of 'FigureJobs': enable the batch mode and
+    rebuild the sources, the arrays being views of the shared memory.
+    """
+    setBatchMode(True)
+    for cls, state, arrays in specs:
+        source = cls.__new__(cls)
+        source.__dict__.update(state)
+        for name, (shm_name, shape) in arrays.items():
+            shm = shared_memory.SharedMemory(name=shm_name)
+            worker_shms.append(shm)
+            setattr(source, name, np.ndarray(shape, dtype=float, buffer=shm.buf))
+        worker_sources.append(source)
+
+
+def renderJob(job):
+    """
+    renderJob
+    ---
+    Run one plotting job in a worker of 'FigureJobs'.
+    """
+    i, method, kwargs = job
+    getattr(worker_sources[i], method)(**kwargs)
+    plt.close("all")
+    return kwargs.get("img_name")
@@ -0,0 +1,293 @@
+import numpy as np
+from scipy.stats import t
+
+"""
+Search procedures on simulation outputs (noisy, monotone performance curves).
+
+The performance measure is evaluated through a user-defined function
+'evaluate(x, seed)', which runs one replication of the simulation with
+parameter value x and seed 'seed' and returns a scalar (e.g., the 99th
+percentile of the delay of type A packets).
+The same seeds are used at all the parameter values (common random numbers),
+so that the comparison between two points is not masked by the noise of the
+independent runs.
+"""
+
+
+def confInt(values, conf_level=0.95):
+    """
+    confInt
+    ---
+    Sample mean and confidence interval (t-student) of a list of i.i.d. values.
+    """
+    values = np.asarray(values, dtype=float)
+    mean = np.mean(values)
+    n = len(values)
+    if n < 2:
+        return mean, (-np.inf, np.inf)
+    std_err = np.std(values, ddof=1) / np.sqrt(n)
+    if std_err == 0:
+        return mean, (mean, mean)
+    return mean, t.interval(conf_level, n - 1, mean, std_err)
+
+
+def replicationSeeds(seed, max_rep):
+    """
+    replicationSeeds
+    ---
+    Seeds of the replications (the same ones are used at every point).
+    """
+    rng = np.random.default_rng(seed)
+    return [int(s) for s in rng.integers(1, 2**31 - 1, size=max_rep)]
+
+
+def evalPoint(evaluate, x, target, seeds, n_rep, conf_level, values=None):
+    """
+    evalPoint
+    ---
+    Compare the performance measure at x with the target.
+
+    At least 'n_rep' replications are run; if the confidence interval of the
+    mean contains the target, replications are added one at a time (up to the
+    number of available seeds), after which the decision is taken on the sample
+    mean.
+
+    ### Input parameters
+    - evaluate: function (x, seed) -> value of the performance measure
+    - x: parameter value
+    - target: threshold on the performance measure
+    - seeds: seeds of the replications
+    - n_rep: minimum number of replications
+    - conf_level: confidence level of the comparison
+    - values: already available values at x (obtained with the first seeds);
+    the list is extended in place
+
+    ### Output parameters
+    - point: dict with the parameter value ('x'), the sample mean ('mean'), its
+    confidence interval ('conf_int'), the number of replications ('n_rep'),
+    the outcome of the comparison ('feasible': mean < target), whether the
+    confidence interval does not contain the target ('confident') and the
+    number of runs performed by this call ('new_runs')
+    """
+    if values is None:
+        values = []
+    n_old = len(values)
+    while len(values) < n_rep:
+        values.append(evaluate(x, seeds[len(values)]))
+    mean, conf_int = confInt(values, conf_level)
+    while conf_int[0] <= target <= conf_int[1] and len(values) < len(seeds):
+        # Not enough evidence - add one replication at a time
+        values.append(evaluate(x, seeds[len(values)]))
+        mean, conf_int = confInt(values, conf_level)
+
+    return {
+        "x": x,
+        "mean": mean,
+        "conf_int": conf_int,
+        "n_rep": len(values),
+        "feasible": mean < target,
+        "confident": not (conf_int[0] <= target <= conf_int[1]),
+        "new_runs": len(values) - n_old,
+    }
+
+
+def stochasticBisection(
+    evaluate,
+    lo,
+    hi,
+    target,
+    precision=0.01,
+    decreasing=True,
+    n_rep=5,
+    max_rep=20,
+    conf_level=0.95,
+    seed=1,
+):
+    """
+    stochasticBisection
+    ---
+    Find the smallest value of the parameter x in [lo, hi] such that the
+    performance measure is below 'target', assuming the measure to be monotone
+    in x.
+
+    At each step the middle point of the interval is evaluated with 'n_rep'
+    replications; if the confidence interval of the mean lies entirely below
+    (above) the target, the point is declared feasible (unfeasible). Otherwise
+    more replications are added, up to 'max_rep', after which the decision is
+    taken on the sample mean.
+    The search stops when the interval is narrower than 'precision'.
+
+    ### Input parameters
+    - evaluate: function (x, seed) -> value of the performance measure
+    - lo: lower end of the search interval
+    - hi: upper end of the search interval (assumed to be feasible; with
+    decreasing=False, lo is assumed to be feasible)
+    - target: threshold on the performance measure
+    - precision: width of the final interval
+    - decreasing: True if the measure decreases with x (e.g., delay vs service
+    rate), False if it increases (in this case the largest feasible x is found)
+    - n_rep: initial number of replications per point
+    - max_rep: maximum number of replications per point
+    - conf_level: confidence level of the comparisons
+    - seed: seed used to generate the seeds of the replications
+
+    ### Output parameters
+    - res: dict containing:
+      - x: the returned (feasible) value
+      - interval: final search interval (lo, hi)
+      - points: list of dicts (see 'evalPoint') with the evaluated points, in
+      the order of evaluation
+      - n_runs: total number of simulation runs
+    """
+    if lo >= hi:
+        raise ValueError("The search interval must satisfy lo < hi!")
+    if precision <= 0:
+        raise ValueError("The precision must be positive!")
+    if max_rep < n_rep:
+        raise ValueError("max_rep must be >= n_rep!")
+
+    seeds = replicationSeeds(seed, max_rep)
+
+    points = []
+    n_runs = 0
+    while hi - lo > precision:
+        mid = 0.5 * (lo + hi)
+        point = evalPoint(evaluate, mid, target, seeds, n_rep, conf_level)
+        n_runs += point["new_runs"]
+        points.append(point)
+
+        if point["feasible"] == decreasing:
+            hi = mid
+        else:
+            lo = mid
+
+    return {
+        "x": hi if decreasing else lo,
+        "interval": (lo, hi),
+        "points": points,
+        "n_runs": n_runs,
+    }
+
+
+def monotoneIntSearch(
+    evaluate,
+    target,
+    start=1,
+    stop=None,
+    decreasing=True,
+    bound=None,
+    n_rep=5,
+    max_rep=20,
+    conf_level=0.95,
+    seed=1,
+    cache=None,
+):
+    """
+    monotoneIntSearch
+    ---
+    Find the smallest integer x >= start such that the performance measure is
+    below 'target', assuming the measure to be monotone in x (e.g., delay vs
+    number of servers). With decreasing=False (measure increasing with x, e.g.,
+    delay vs buffer size) the largest feasible x is found instead.
+
+    The search gallops (x = start, start + 1, start + 3, start + 7, ...) until
+    the outcome of the comparison changes, then the last step is refined by
+    binary search; each point is compared with the target as in 'evalPoint'.
+    If an analytic lower bound of the measure is available, the values of x for
+    which the bound is already above the target are discarded without running
+    any simulation (only used when decreasing=True).
+
+    ### Input parameters
+    - evaluate: function (x, seed) -> value of the performance measure
+    - target: threshold on the performance measure
+    - start: smallest value of x to be considered
+    - stop: largest value of x to be considered (None -> no limit)
+    - decreasing: True if the measure decreases with x
+    - bound: function x -> lower bound of the measure (optional)
+    - n_rep: initial number of replications per point
+    - max_rep: maximum number of replications per point
+    - conf_level: confidence level of the comparisons
+    - seed: seed used to generate the seeds of the replications
+    - cache: dict {x: list of values} with the results of previous searches
+    obtained with the same 'evaluate' and 'seed'; it is updated in place
+
+    ### Output parameters
+    - res: dict containing:
+      - x: the returned value (None if no feasible value was found)
+      - confident: True if the comparisons at x and at its neighbor on the
+      other side of the threshold are both significant at 'conf_level'
+      - points: dict {x: point} with the evaluated points (see 'evalPoint')
+      - n_runs: number of simulation runs performed by this call
+      - n_pruned: number of values discarded thanks to the lower bound
+    """
+    if stop is not None and stop < start:
+        raise ValueError("The search interval must satisfy start <= stop!")
+    if cache is None:
+        cache = {}
+    seeds = replicationSeeds(seed, max_rep)
+
+    points = {}
+    n_runs = 0
+
+    def isGood(x):
+        # Predicate that switches from False to True as x increases
+        nonlocal n_runs
+        if x not in points:
+            points[x] = evalPoint(
+                evaluate,
+                x,
+                target,
+                seeds,
+                n_rep,
+                conf_level,
+                values=cache.setdefault(x, []),
+            )
+            n_runs += points[x]["new_runs"]
+        return points[x]["feasible"] == decreasing
+
+    n_pruned = 0
+    if bound is not None and decreasing:
+        while bound(start) >= target and (stop is None or start < stop):
+            start += 1
+            n_pruned += 1
+
+    # Galloping: find an interval (last_bad, first_good]
+    last_bad = start - 1
+    step = 1
+    x = start
+    while not isGood(x):
+        last_bad = x
+        if stop is not None and x == stop:
+            x = None
+            break
+        x += step
+        step *= 2
+        if stop is not None:
+            x = min(x, stop)
+    first_good = x
+
+    # Binary search in (last_bad, first_good]
+    if first_good is not None:
+        while first_good - last_bad > 1:
+            mid = (first_good + last_bad) // 2
+            if isGood(mid):
+                first_good = mid
+            else:
+                last_bad = mid
+
+    # Result and confidence of the two comparisons around the threshold
+    if decreasing:
+        x = first_good
+        neighbors = [first_good, last_bad]
+    else:
+        x = last_bad if last_bad >= start else None
+        neighbors = [last_bad, first_good]
+    confident = all(points[p]["confident"] for p in neighbors if p in points)
+
+    return {
+        "x": x,
+        "confident": confident,
+        "points": points,
+        "n_runs": n_runs,
+        "n_pruned": n_pruned,
+    }
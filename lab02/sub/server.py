@@ -1,6 +1,6 @@
 import numpy as np
-import random
 import warnings
+from sub.distributions import Sampler, shapeParameters
 
 
 # ******************************************************************************
@@ -8,7 +8,15 @@ import warnings
 # ******************************************************************************
 class Server(object):
     # constructor
-    def __init__(self, n_serv, serv_t, policy="first_idle", costs=False):
+    def __init__(
+        self,
+        n_serv,
+        serv_t,
+        policy="first_idle",
+        costs=False,
+        distribution="expovariate",
+        dist_params=None,
+    ):
         """
         Class used to model servers in the queuing system.
 
@@ -19,6 +27,10 @@ class Server(object):
         length must be n_serv)
         - policy: it is the policy for the choice of the server; default:
         'first_idle'
+        - costs: bool indicating whether server costs are to be used
+        - distribution: name of the service time distribution (see
+        'sub.distributions'); default: 'expovariate'
+        - dist_params: dict of shape parameters of the distribution
 
         Attributes:
         -
@@ -80,11 +92,16 @@ class Server(object):
             else:
                 self.costs = [0 for i in range(n_serv)]
 
+        # One sampler per server, bound to its mean service time
+        self.bindDistribution(distribution, dist_params)
+
         # 'current' is used to track the choice of the next server
         # NOTE: if the n. of servers is infinite (or 1), the number 'current' will always stay 0
         # (it is instantiated for simplicity)
 
         self.current = 0
+        # Number of busy servers (the only state kept for infinitely many servers)
+        self.n_busy = 0
 
     # ******************************************************************************
     # Private
@@ -130,18 +147,34 @@ class Server(object):
     # ******************************************************************************
     # Public
 
-    def evalServTime(self, type="expovariate"):
+    def bindDistribution(self, distribution, dist_params=None):
+        """
+        Bind the service time distribution to the servers: one 'Sampler' is
+        created for each server, with mean equal to its average service time.
+
+        Parameters:
+        - distribution: name of the distribution (see 'sub.distributions')
+        - dist_params: dict of shape parameters of the distribution
+        """
+        if dist_params is None:
+            dist_params = {}
+        self.distribution = distribution
+        self.dist_params = dist_params
+        self.samplers = [
+            Sampler(distribution, 1.0 / rate, **dist_params) for rate in self.serv_rates
+        ]
+
+    def evalServTime(self, type=None):
         """
         Generate an instance of the service time for the next server
 
         The method returns the value and the server id
 
         Parameters:
-        - type: distribution type
-          -> Possible values:
-          - expovariate: exponential service time
-          - constant: constant service time equal to 1/serv_rate of current server
-          - uniform: uniform in (0, 2/serv_rate) of current server
+        - type: distribution type (see 'sub.distributions'); if None (default),
+        the distribution bound at initialization is used; if different, the new
+        distribution is bound to the servers (only distributions without shape
+        parameters, the other ones must be bound with 'bindDistribution')
 
         Return values:
         - service_time: extracted random value of the service time
@@ -150,18 +183,16 @@ class Server(object):
         # Update
         self.chooseNextServer()
 
-        if type == "expovariate":
-            service_time = random.expovariate(self.serv_rates[self.current])
-        elif type == "constant":
-            # The provided "mean" time is actually the value itself...
-            # Need to re-invert the service rate to find the time
-            service_time = 1 / self.serv_rates[self.current]
-        elif type == "uniform":
-            # Uniform distribution; the mean is the specified parameter
-            # Need to re-invert the rate to get the mean
-            service_time = random.uniform(0, 2 / self.serv_rates[self.current])
-        else:
-            raise ValueError(f"Invalid distribution type '{type}'!")
+        if type is not None and type != self.distribution:
+            if shapeParameters(type):
+                # The shape parameters would silently take their default values
+                raise ValueError(
+                    f"The distribution '{type}' has shape parameters: "
+                    "use 'bindDistribution'!"
+                )
+            self.bindDistribution(type)
+
+        service_time = self.samplers[self.current]()
 
         return service_time, self.current
 
@@ -175,11 +206,13 @@ class Server(object):
         if self.n_servers is not None and serv_id < self.n_servers:
             if self.idle[serv_id]:
                 warnings.warn(f"The server {serv_id} was already idle!")
+            else:
+                self.n_busy -= 1
 
             self.idle[serv_id] = True
         elif self.n_servers is None:
-            # No need to update - infinite n. of servers
-            pass
+            # Infinite n. of servers - only count the busy ones
+            self.n_busy -= 1
         else:
             raise ValueError(
                 f"The provided ID {serv_id} exceeds the maximum number of servers {self.n_servers}"
@@ -194,11 +227,13 @@ class Server(object):
         if self.n_servers is not None and serv_id < self.n_servers:
             if not self.idle[serv_id]:
                 warnings.warn(f"The server {serv_id} was already busy!")
+            else:
+                self.n_busy += 1
 
             self.idle[serv_id] = False
         elif self.n_servers is None:
-            # No need to update - infinite n. of servers
-            pass
+            # Infinite n. of servers - only count the busy ones
+            self.n_busy += 1
         else:
             raise ValueError(
                 f"The provided ID {serv_id} exceeds the maximum number of servers {self.n_servers}"
@@ -0,0 +1,312 @@
+import random
+import heapq
+import numpy as np
+from scipy.stats import t
+
+
+# ******************************************************************************
+# Trajectory
+# ******************************************************************************
+class Trajectory:
+    def __init__(self, next_arr, next_type, weight=1.0, level=0):
+        """
+        Trajectory
+        ---
+        Complete (cloneable) state of the Micro Data Center -> Cloud Data Center
+        tandem, as needed by the splitting estimator.
+
+        ### Attributes
+        - next_arr: time of the next arrival at the micro data center
+        - next_type: type of the next arriving packet
+        - users_mdc: number of packets in the micro data center
+        - users_cdc: number of packets in the cloud data center
+        - line_mdc: types of the packets waiting in the micro data center (FIFO)
+        - dep_mdc: heap of (end-of-service time, packet type), micro data center
+        - dep_cdc: heap of end-of-service times, cloud data center
+        - in_flight: heap of (arrival time, packet type) of the packets being
+        transmitted towards the cloud data center
+        - weight: statistical weight of the trajectory (1 for the main trajectory)
+        - level: number of thresholds the trajectory has been split at
+        """
+        self.next_arr = next_arr
+        self.next_type = next_type
+        self.users_mdc = 0
+        self.users_cdc = 0
+        self.line_mdc = []
+        self.dep_mdc = []
+        self.dep_cdc = []
+        self.in_flight = []
+        self.weight = weight
+        self.level = level
+
+    def clone(self):
+        """
+        Return an independent copy of the trajectory (same state, same weight).
+        """
+        new = Trajectory(self.next_arr, self.next_type, self.weight, self.level)
+        new.users_mdc = self.users_mdc
+        new.users_cdc = self.users_cdc
+        new.line_mdc = list(self.line_mdc)
+        new.dep_mdc = list(self.dep_mdc)
+        new.dep_cdc = list(self.dep_cdc)
+        new.in_flight = list(self.in_flight)
+        return new
+
+    def isEmpty(self):
+        """
+        True if no packet is present in the system (regeneration point).
+        """
+        return self.users_mdc == 0 and self.users_cdc == 0 and len(self.in_flight) == 0
+
+
+# ******************************************************************************
+# Additional methods:
+
+
+def checkLevels(thresholds, split, min_value, max_value):
+    """
+    checkLevels
+    ---
+    Validate the splitting thresholds and return the list of splitting
+    factors (one per threshold).
+    """
+    if any(b <= a for a, b in zip(thresholds[:-1], thresholds[1:])):
+        raise ValueError("The splitting thresholds must be strictly increasing!")
+    if thresholds[0] < min_value or thresholds[-1] > max_value:
+        raise ValueError(
+            f"The splitting thresholds must be in [{min_value}, {max_value}]!"
+        )
+
+    if isinstance(split, int):
+        split = [split] * len(thresholds)
+    elif len(split) != len(thresholds):
+        raise ValueError("One splitting factor per threshold is needed!")
+    if any(r < 1 for r in split):
+        raise ValueError("The splitting factors must be >= 1!")
+
+    return list(split)
+
+
+def ratioConfInt(X, Y, conf_level):
+    """
+    ratioConfInt
+    ---
+    Evaluate the ratio estimator sum(X)/sum(Y) over i.i.d. regeneration cycles,
+    together with its confidence interval (delta method).
+    """
+    X = np.asarray(X)
+    Y = np.asarray(Y)
+    n = len(X)
+    ratio = X.sum() / Y.sum()
+    if n < 2:
+        return ratio, (np.nan, np.nan)
+
+    # Z_i = X_i - ratio * Y_i has zero mean; its std gives the std of the ratio
+    std_err = np.std(X - ratio * Y, ddof=1) / (np.mean(Y) * np.sqrt(n))
+    if std_err == 0:
+        return ratio, (ratio, ratio)
+
+    return ratio, t.interval(conf_level, n - 1, ratio, std_err)
+
+
+def cdcLossSplitting(
+    fract,
+    arr_t=10.0,
+    serv_t_1=3.0,
+    q1_len=10,
+    n_serv_1=1,
+    serv_t_2=5.0,
+    q2_len=20,
+    n_serv_2=1,
+    thresholds=None,
+    split=2,
+    propagation_time=0.2,
+    n_cycles=10000,
+    max_events=None,
+    conf_level=0.99,
+    seed=1,
+):
+    """
+    cdcLossSplitting
+    ---
+    Estimate the loss probability at the Cloud Data Center (countLosses/arr of
+    the CDC) by means of importance splitting on the number of packets in the
+    cloud data center (RESTART-like thresholds).
+
+    The system is the same as in 'run' (exponential service times, overflow of
+    the micro data center forwarded to the cloud, type B packets forwarded after
+    processing); the simulation is divided into regeneration cycles, each one
+    starting with an arrival in the empty system.
+    When a trajectory reaches the threshold 'thresholds[i]' it is cloned into
+    'split[i]' copies, each one carrying a fraction 1/split[i] of the weight; when
+    a copy goes back below the threshold it is kept with probability 1/split[i]
+    (and its weight is restored), else it is discarded (Russian roulette).
+    Losses and arrivals are counted with the weight of the trajectory, so that the
+    estimates are unbiased.
+
+    ### Input parameters
+    - fract: fraction of packets of type B
+    - arr_t: average inter-arrival time, queue 1
+    - serv_t_1: average service time, queue 1
+    - q1_len: length of queue 1
+    - n_serv_1: number of servers, queue 1
+    - serv_t_2: average service time, queue 2
+    - q2_len: length of queue 2
+    - n_serv_2: number of servers, queue 2
+    - thresholds: increasing list of occupancy levels of queue 2 at which
+    trajectories are split; default: all levels between n_serv_2 + 1 and
+    q2_len - 1
+    - split: splitting factor (int) or list of splitting factors (one per
+    threshold); a good choice is about 1/p, being p the probability to reach
+    the next threshold
+    - propagation_time: transmission time between the two data centers
+    - n_cycles: number of regeneration cycles to be simulated
+    - max_events: if not None, stop as soon as this number of events is processed
+    - conf_level: confidence level of the returned interval
+    - seed: seed of the random number generator
+
+    ### Output parameters
+    - results: dict containing the CDC loss probability estimate ('loss_prob'),
+    its confidence interval ('conf_int'), the number of CDC losses per packet
+    generated by the sensors ('loss_prob_ext'), the number of simulated cycles
+    ('n_cycles') and the number of processed events ('n_events')
+    """
+    # Same correction as the 'Queue' class
+    q1_len = max(q1_len, n_serv_1)
+    q2_len = max(q2_len, n_serv_2)
+
+    if thresholds is None:
+        thresholds = list(range(n_serv_2 + 1, q2_len))
+
+    if len(thresholds) > 0:
+        split = checkLevels(thresholds, split, 1, q2_len)
+    else:
+        split = []
+    n_levels = len(thresholds)
+
+    rng = random.Random(seed)
+    arr_rate = 1.0 / arr_t
+    serv_rate_1 = 1.0 / serv_t_1
+    serv_rate_2 = 1.0 / serv_t_2
+
+    def pktType():
+        return "B" if rng.random() < fract else "A"
+
+    X = []  # Weighted CDC losses in each cycle
+    Y = []  # Weighted CDC arrivals in each cycle
+    Z = []  # Weighted external arrivals in each cycle
+    n_events = 0
+
+    while len(X) < n_cycles and (max_events is None or n_events < max_events):
+        losses = 0.0
+        arrivals = 0.0
+        ext_arrivals = 0.0
+
+        # The cycle starts with an arrival in the empty system (time 0)
+        stack = [Trajectory(0.0, pktType())]
+        first = True
+        while stack:
+            tr = stack.pop()
+            while True:
+                # Find the next event among the pending ones
+                time = tr.next_arr
+                event = "arrival_micro"
+                if len(tr.dep_mdc) > 0 and tr.dep_mdc[0][0] < time:
+                    time = tr.dep_mdc[0][0]
+                    event = "departure_micro"
+                if len(tr.dep_cdc) > 0 and tr.dep_cdc[0] < time:
+                    time = tr.dep_cdc[0]
+                    event = "departure_cloud"
+                if len(tr.in_flight) > 0 and tr.in_flight[0][0] < time:
+                    time = tr.in_flight[0][0]
+                    event = "arrival_cloud"
+
+                if event == "arrival_micro":
+                    if tr.isEmpty() and not first:
+                        # Regeneration point - end of the cycle for this trajectory
+                        break
+                    first = False
+                    n_events += 1
+                    ext_arrivals += tr.weight
+                    pkt_type = tr.next_type
+                    tr.next_arr = time + rng.expovariate(arr_rate)
+                    tr.next_type = pktType()
+
+                    if tr.users_mdc < q1_len:
+                        tr.users_mdc += 1
+                        if tr.users_mdc <= n_serv_1:
+                            heapq.heappush(
+                                tr.dep_mdc,
+                                (time + rng.expovariate(serv_rate_1), pkt_type),
+                            )
+                        else:
+                            tr.line_mdc.append(pkt_type)
+                    else:
+                        # Full micro data center - forward to the cloud
+                        heapq.heappush(
+                            tr.in_flight, (time + propagation_time, pkt_type)
+                        )
+
+                elif event == "departure_micro":
+                    n_events += 1
+                    time, pkt_type = heapq.heappop(tr.dep_mdc)
+                    tr.users_mdc -= 1
+                    if pkt_type == "B":
+                        heapq.heappush(
+                            tr.in_flight, (time + propagation_time, pkt_type)
+                        )
+                    if len(tr.line_mdc) > 0:
+                        heapq.heappush(
+                            tr.dep_mdc,
+                            (time + rng.expovariate(serv_rate_1), tr.line_mdc.pop(0)),
+                        )
+
+                elif event == "arrival_cloud":
+                    n_events += 1
+                    heapq.heappop(tr.in_flight)
+                    arrivals += tr.weight
+
+                    if tr.users_cdc >= q2_len:
+                        losses += tr.weight
+                    else:
+                        tr.users_cdc += 1
+                        if tr.users_cdc <= n_serv_2:
+                            heapq.heappush(
+                                tr.dep_cdc, time + rng.expovariate(serv_rate_2)
+                            )
+
+                        if tr.level < n_levels and tr.users_cdc >= thresholds[tr.level]:
+                            # Split the trajectory
+                            r = split[tr.level]
+                            tr.level += 1
+                            tr.weight /= r
+                            for i in range(r - 1):
+                                stack.append(tr.clone())
+
+                else:
+                    n_events += 1
+                    heapq.heappop(tr.dep_cdc)
+                    tr.users_cdc -= 1
+                    if tr.users_cdc >= n_serv_2:
+                        heapq.heappush(tr.dep_cdc, time + rng.expovariate(serv_rate_2))
+
+                    if tr.level > 0 and tr.users_cdc < thresholds[tr.level - 1]:
+                        # Russian roulette when going back below the threshold
+                        tr.level -= 1
+                        if rng.random() * split[tr.level] >= 1:
+                            break
+                        tr.weight *= split[tr.level]
+
+        X.append(losses)
+        Y.append(arrivals)
+        Z.append(ext_arrivals)
+
+    loss_prob, conf_int = ratioConfInt(X, Y, conf_level)
+
+    return {
+        "loss_prob": loss_prob,
+        "conf_int": conf_int,
+        "loss_prob_ext": np.sum(X) / np.sum(Z),
+        "n_cycles": len(X),
+        "n_events": n_events,
+    }
@@ -0,0 +1,201 @@
+import numpy as np
+
+"""
+Trace-driven arrivals.
+
+A trace is a sequence of (timestamp, packet type) records, sorted by time,
+stored either as a '.npy' file (structured array with fields 'time' and
+'type') or as a flat binary file of records with the layout TRACE_DTYPE.
+The packet type is coded as an integer: 0 -> 'A', 1 -> 'B'.
+
+The file is never loaded as a whole: the records are read through memory maps
+covering one chunk at a time, so that the memory usage does not depend on the
+length of the trace.
+"""
+
+TRACE_DTYPE = np.dtype([("time", "<f8"), ("type", "u1")])
+PKT_TYPES = ["A", "B"]
+
+
+def writeTrace(path, times, types):
+    """
+    writeTrace
+    ---
+    Write a trace file; the format is chosen from the extension ('.npy' or flat
+    binary otherwise).
+
+    ### Input parameters
+    - path: path of the file
+    - times: arrival times (sorted)
+    - types: packet types ('A'/'B' or 0/1)
+    """
+    codes = []
+    for x in types:
+        code = PKT_TYPES.index(x) if x in PKT_TYPES else x
+        if isinstance(code, str) or not 0 <= code < len(PKT_TYPES):
+            raise ValueError(f"Invalid packet type {x!r}!")
+        codes.append(code)
+    records = np.empty(len(times), dtype=TRACE_DTYPE)
+    records["time"] = times
+    records["type"] = codes
+    if str(path).endswith(".npy"):
+        np.save(path, records)
+    else:
+        records.tofile(path)
+
+
+# ******************************************************************************
+# TraceArrivals
+# ******************************************************************************
+class TraceArrivals:
+    def __init__(
+        self, path, chunk_size=65536, start=0, start_time=None, rebase=True, dtype=None
+    ):
+        """
+        TraceArrivals
+        ---
+        Arrival process replaying a trace file (see the module documentation).
+
+        ### Input parameters
+        - path: path of the trace ('.npy' or flat binary)
+        - chunk_size: number of records mapped and read at once
+        - start: index of the first record to be replayed
+        - start_time: if not None, the replay starts from the first record with
+        timestamp >= start_time (overrides 'start')
+        - rebase: if True, the timestamps are shifted so that the replay starts at
+        time 0 (the time of the first replayed record)
+        - dtype: record layout of flat binary files (default: TRACE_DTYPE); it
+        must contain the fields 'time' and 'type'
+
+        ### Attributes
+        - n_records: number of records in the trace
+        - offset: position of the first record in the file (bytes)
+        - next_index: index of the next record to be read from the file
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.rebase = rebase
+
+        if str(path).endswith(".npy"):
+            with open(path, "rb") as f:
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    header = np.lib.format.read_array_header_1_0(f)
+                else:
+                    header = np.lib.format.read_array_header_2_0(f)
+                shape, fortran, dtype = header
+                self.offset = f.tell()
+            if fortran or len(shape) != 1:
+                raise ValueError("The trace must be a 1D structured array!")
+            self.n_records = shape[0]
+        else:
+            if dtype is None:
+                dtype = TRACE_DTYPE
+            self.offset = 0
+            with open(path, "rb") as f:
+                f.seek(0, 2)
+                size = f.tell()
+            if size % dtype.itemsize != 0:
+                raise ValueError(
+                    "The size of the trace is not a multiple of the record size!"
+                )
+            self.n_records = size // dtype.itemsize
+        if "time" not in dtype.names or "type" not in dtype.names:
+            raise ValueError("The trace records need the fields 'time' and 'type'!")
+        self.dtype = dtype
+
+        self.time_offset = 0.0
+        if start_time is not None:
+            self.seekTime(start_time)
+        else:
+            self.seek(start)
+
+    def mapRecords(self, first, n):
+        """
+        mapRecords
+        ---
+        Memory-map the records [first, first + n) of the trace.
+        """
+        n = min(n, self.n_records - first)
+        if n <= 0:
+            return np.empty(0, dtype=self.dtype)
+        return np.memmap(
+            self.path,
+            dtype=self.dtype,
+            mode="r",
+            offset=self.offset + first * self.dtype.itemsize,
+            shape=(n,),
+        )
+
+    def seek(self, index):
+        """
+        seek
+        ---
+        Restart the replay from the record 'index'.
+        """
+        if index < 0 or index > self.n_records:
+            raise ValueError(f"Invalid record index {index}!")
+        self.next_index = index
+        self.times = []
+        self.types = []
+        self.pos = 0
+        if self.rebase and index < self.n_records:
+            self.time_offset = float(self.mapRecords(index, 1)["time"][0])
+
+    def seekTime(self, start_time):
+        """
+        seekTime
+        ---
+        Restart the replay from the first record with timestamp >= start_time
+        (binary search on the mapped file).
+        """
+        lo, hi = 0, self.n_records
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.mapRecords(mid, 1)["time"][0] < start_time:
+                lo = mid + 1
+            else:
+                hi = mid
+        self.seek(lo)
+
+    def readChunk(self):
+        """
+        readChunk
+        ---
+        Read the next chunk of records (copied, so that the map is released).
+        """
+        chunk = self.mapRecords(self.next_index, self.chunk_size)
+        codes = np.array(chunk["type"])
+        invalid = np.flatnonzero((codes < 0) | (codes >= len(PKT_TYPES)))
+        if len(invalid) > 0:
+            raise ValueError(
+                f"Invalid packet type code {codes[invalid[0]]} in record "
+                f"{self.next_index + invalid[0]} of the trace!"
+            )
+        self.times = (np.array(chunk["time"]) - self.time_offset).tolist()
+        self.types = [PKT_TYPES[x] for x in codes.tolist()]
+        self.next_index += len(self.times)
+        self.pos = 0
+        del chunk
+
+    def nextPacket(self):
+        """
+        nextPacket
+        ---
+        Return the tuple (arrival time, packet type) of the next record;
+        (inf, None) at the end of the trace.
+        """
+        if self.pos >= len(self.times):
+            self.readChunk()
+            if len(self.times) == 0:
+                return np.inf, None
+        self.pos += 1
+        return self.times[self.pos - 1], self.types[self.pos - 1]
+
+    def nextArrival(self):
+        """
+        nextArrival
+        ---
+        Return the next arrival time (the packet type is discarded).
+        """
+        return self.nextPacket()[0]